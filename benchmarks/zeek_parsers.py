@@ -0,0 +1,86 @@
+"""
+Microbenchmark of the zeek parsers of slips_files/core/profilerProcess.py
+Run it from the root dir of slips: python3 -m benchmarks.zeek_parsers
+It doesn't need redis, it only measures the time it takes to parse the lines of the sample zeek files
+"""
+from slips_files.core.profilerProcess import ProfilerProcess
+from tzlocal import get_localzone
+import timeit
+import json
+import os
+
+json_zeek_dir = 'dataset/sample_zeek_files'
+tabs_zeek_dir = 'dataset/sample_zeek_files-2'
+repetitions = 20
+# how many times the lines are parsed in each repetition
+number = 10
+# files that inputProcess doesn't send to the profiler
+ignored_files = (
+    'capture_loss',
+    'loaded_scripts',
+    'packet_filter',
+    'stats',
+    'ocsp',
+    'weird',
+    'reporter',
+    'x509',
+)
+
+
+def do_nothing(*args):
+    pass
+
+
+def create_profilerProcess_instance():
+    """
+    Create an instance of profilerProcess.py without starting the db
+    only the attributes used by the parsers are set
+    """
+    profilerProcess = ProfilerProcess.__new__(ProfilerProcess)
+    profilerProcess.timeformat = None
+    profilerProcess.local_timezone = get_localzone()
+    profilerProcess.zeek_parsers = {}
+    profilerProcess.print = do_nothing
+    return profilerProcess
+
+
+def read_lines(zeek_dir: str, tabs: bool) -> list:
+    """Returns the lines of all the zeek files in the given dir in the format sent by inputProcess"""
+    lines = []
+    for file in sorted(os.listdir(zeek_dir)):
+        if file.split('.')[0] in ignored_files:
+            continue
+        path = os.path.join(zeek_dir, file)
+        with open(path) as f:
+            for line in f:
+                if tabs:
+                    if line.startswith('#'):
+                        continue
+                    lines.append({'type': path, 'data': line})
+                else:
+                    lines.append({'type': path, 'data': json.loads(line)})
+    return lines
+
+
+def benchmark(parser, lines: list) -> float:
+    """Returns the average number of lines parsed per second"""
+    def parse_all():
+        for line in lines:
+            parser(line)
+
+    seconds = min(timeit.repeat(parse_all, number=number, repeat=repetitions))
+    return len(lines) * number / seconds
+
+
+if __name__ == '__main__':
+    profilerProcess = create_profilerProcess_instance()
+    json_lines = read_lines(json_zeek_dir, tabs=False)
+    tabs_lines = read_lines(tabs_zeek_dir, tabs=True)
+    print(
+        f'zeek json: {benchmark(profilerProcess.process_zeek_input, json_lines):.0f} lines/s '
+        f'({len(json_lines)} lines)'
+    )
+    print(
+        f'zeek tabs: {benchmark(profilerProcess.process_zeek_tabs_input, tabs_lines):.0f} lines/s '
+        f'({len(tabs_lines)} lines)'
+    )
@@ -315,6 +315,7 @@ class Module(Module, multiprocessing.Process):
                 src_ips.update({srcip: json.dumps(event_info)})
 
         __database__.add_ips_to_IoC(src_ips)
+        __database__.publish_ioc_updated(self.name)
 
     def run(self):
         utils.drop_root_privs()
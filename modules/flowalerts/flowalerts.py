@@ -1,10 +1,10 @@
 # Must imports
-from slips_files.common.abstracts import Module
+from slips_files.common.abstracts import Module, ChannelsDispatcher
 import multiprocessing
 from slips_files.core.database import __database__
 from slips_files.common.slips_utils import utils
 import platform
-from .TimerThread import TimerThread
+from .timer_scheduler import TimerScheduler
 
 # Your imports
 import json
@@ -16,6 +16,7 @@ import sys
 import socket
 import validators
 from .set_evidence import Helper
+from slips_files.common.ip_ranges import IPRangesArray
 
 
 class Module(Module, multiprocessing.Process):
@@ -41,29 +42,45 @@ class Module(Module, multiprocessing.Process):
         # Retrieve the labels
         self.normal_label = __database__.normal_label
         self.malicious_label = __database__.malicious_label
-        self.c1 = __database__.subscribe('new_flow')
-        self.c2 = __database__.subscribe('new_ssh')
-        self.c3 = __database__.subscribe('new_notice')
-        self.c4 = __database__.subscribe('new_ssl')
-        self.c5 = __database__.subscribe('new_service')
-        self.c6 = __database__.subscribe('new_dns_flow')
-        self.c7 = __database__.subscribe('new_downloaded_file')
-        self.c8 = __database__.subscribe('new_smtp')
-        self.c9 = __database__.subscribe('new_software')
+        self.dispatcher = ChannelsDispatcher(
+            {
+                'new_flow': self.handle_new_flow,
+                'new_ssh': self.check_successful_ssh,
+                'new_notice': self.handle_new_notice,
+                'new_ssl': self.handle_new_ssl,
+                'new_service': self.handle_new_service,
+                'new_dns_flow': self.handle_new_dns_flow,
+                'new_downloaded_file': self.handle_new_downloaded_file,
+                'new_smtp': self.handle_new_smtp,
+                'new_software': self.handle_new_software,
+                'tw_closed': self.handle_tw_closed,
+            }
+        )
         # helper contains all functions used to set evidence
         self.helper = Helper()
-        self.timeout = 0.0000001
         self.p2p_daddrs = {}
         # get the default gateway
         self.gateway = __database__.get_default_gateway()
-        # Cache list of connections that we already checked in the timer
+        # the asn, domains and IP ranges of the well-known orgs, read from the db once
+        # {org: {'asn': set, 'domains': {TLD: [domains]}, 'IPs': IPRangesArray}}
+        self.well_known_orgs = {}
+        # reconnections of each tw, stored in the db every reconnections_flush_interval
+        # seconds and when the tw is closed {(profileid, twid): {'saddr-daddr': reconnections}}
+        self.reconnections = {}
+        # tws whose reconnections changed since they were stored in the db
+        self.modified_reconnections = set()
+        self.reconnections_flush_interval = 10
+        self.last_reconnections_flush = time.time()
+        # runs the checks that wait for more flows to arrive, it's started in run()
+        self.timer_scheduler = TimerScheduler(self.print)
+        # Cache set of connections that we already checked in the timer
         # thread (we waited for the connection of these dns resolutions)
-        self.connections_checked_in_dns_conn_timer_thread = []
-        # Cache list of connections that we already checked in the timer
+        self.connections_checked_in_dns_conn_timer_thread = set()
+        # Cache set of connections that we already checked in the timer
         # thread (we waited for the dns resolution for these connections)
-        self.connections_checked_in_conn_dns_timer_thread = []
-        # Cache list of connections that we already checked in the timer thread for ssh check
-        self.connections_checked_in_ssh_timer_thread = []
+        self.connections_checked_in_conn_dns_timer_thread = set()
+        # Cache set of connections that we already checked in the timer thread for ssh check
+        self.connections_checked_in_ssh_timer_thread = set()
         # Threshold how much time to wait when capturing in an interface, to start reporting connections without DNS
         # Usually the computer resolved DNS already, so we need to wait a little to report
         # In seconds
@@ -431,12 +448,10 @@ class Module(Module, multiprocessing.Process):
 
         flow_domain = rdns or SNI
         for org in supported_orgs:
+            org_info = self.get_well_known_org_info(org)
             if ip_asn and ip_asn != 'Unknown':
-                org_asn = json.loads(__database__.get_org_info(org, 'asn'))
-                if org.lower() in ip_asn.lower() or ip_asn in org_asn:
+                if org.lower() in ip_asn.lower() or ip_asn in org_info['asn']:
                     return True
-            # remove the asn from ram
-            org_asn = ''
 
             if flow_domain:
                 # we have the rdns or sni of this flow , now check
@@ -444,31 +459,44 @@ class Module(Module, multiprocessing.Process):
                     # self.print(f"The domain of this flow ({flow_domain}) belongs to the domains of {org}")
                     return True
 
-                org_domains = json.loads(
-                    __database__.get_org_info(org, 'domains')
-                )
-
+                # make sure the 2 domains have the same same top level domain
                 flow_TLD = flow_domain.split('.')[-1]
-
-                for org_domain in org_domains:
-                    org_domain_TLD = org_domain.split('.')[-1]
-                    # make sure the 2 domains have the same same top level domain
-                    if flow_TLD != org_domain_TLD:
-                        continue
-
+                for org_domain in org_info['domains'].get(flow_TLD, []):
                     # match subdomains too
                     # return true if org has org.com, and the flow_domain is xyz.org.com
                     # or if org has xyz.org.com, and the flow_domain is org.com return true
                     if org_domain in flow_domain or flow_domain in org_domain:
                         return True
 
-                # remove from ram
-                org_domains = ''
-
-            org_ips = json.loads(__database__.get_org_info(org, 'IPs'))
-            if ip in org_ips:
+            if ip in org_info['IPs']:
                 return True
 
+    def get_well_known_org_info(self, org) -> dict:
+        """
+        Returns the asn, domains and IP ranges of the given org.
+        they're read from the db the first time and kept in memory as long as the org has info in the db
+        """
+        if org in self.well_known_orgs:
+            return self.well_known_orgs[org]
+
+        org_asn = json.loads(__database__.get_org_info(org, 'asn'))
+        org_domains = json.loads(__database__.get_org_info(org, 'domains'))
+        org_ips = json.loads(__database__.get_org_info(org, 'IPs'))
+        # group the domains by TLD so we only compare the flow domain with the ones with the same TLD
+        domains_by_TLD = {}
+        for org_domain in org_domains:
+            domains_by_TLD.setdefault(org_domain.split('.')[-1], []).append(
+                org_domain
+            )
+        org_info = {
+            'asn': set(org_asn),
+            'domains': domains_by_TLD,
+            'IPs': IPRangesArray(org_ips),
+        }
+        if org_asn or org_domains or org_ips:
+            self.well_known_orgs[org] = org_info
+        return org_info
+
     def check_connection_without_dns_resolution(
         self, daddr, twid, profileid, timestamp, uid
     ):
@@ -506,14 +534,13 @@ class Module(Module, multiprocessing.Process):
             if uid not in self.connections_checked_in_conn_dns_timer_thread:
                 # comes here if we haven't started the timer thread for this connection before
                 # mark this connection as checked
-                self.connections_checked_in_conn_dns_timer_thread.append(uid)
+                self.connections_checked_in_conn_dns_timer_thread.add(uid)
                 params = [daddr, twid, profileid, timestamp, uid]
                 # self.print(f'Starting the timer to check on {daddr}, uid {uid}.
                 # time {datetime.datetime.now()}')
-                timer = TimerThread(
+                self.timer_scheduler.schedule(
                     15, self.check_connection_without_dns_resolution, params
                 )
-                timer.start()
             else:
                 # It means we already checked this conn with the Timer process
                 # (we waited 15 seconds for the dns to arrive after the connection was made)
@@ -533,12 +560,7 @@ class Module(Module, multiprocessing.Process):
                 )
                 # This UID will never appear again, so we can remove it and
                 # free some memory
-                try:
-                    self.connections_checked_in_conn_dns_timer_thread.remove(
-                        uid
-                    )
-                except ValueError:
-                    pass
+                self.connections_checked_in_conn_dns_timer_thread.discard(uid)
 
     def check_dns_resolution_without_connection(
             self, domain, answers, timestamp, profileid, twid, uid
@@ -612,13 +634,12 @@ class Module(Module, multiprocessing.Process):
         if uid not in self.connections_checked_in_dns_conn_timer_thread:
             # comes here if we haven't started the timer thread for this dns before
             # mark this dns as checked
-            self.connections_checked_in_dns_conn_timer_thread.append(uid)
+            self.connections_checked_in_dns_conn_timer_thread.add(uid)
             params = [domain, answers, timestamp, profileid, twid, uid]
             # self.print(f'Starting the timer to check on {domain}, uid {uid}. time {datetime.datetime.now()}')
-            timer = TimerThread(
+            self.timer_scheduler.schedule(
                 15, self.check_dns_resolution_without_connection, params
             )
-            timer.start()
         else:
             # self.print(f'Alerting on {domain}, uid {uid}. time {datetime.datetime.now()}')
             # It means we already checked this dns with the Timer process
@@ -633,10 +654,7 @@ class Module(Module, multiprocessing.Process):
             )
             # This UID will never appear again, so we can remove it and
             # free some memory
-            try:
-                self.connections_checked_in_dns_conn_timer_thread.remove(uid)
-            except ValueError:
-                pass
+            self.connections_checked_in_dns_conn_timer_thread.discard(uid)
 
     def check_successful_ssh(self, message):
         """
@@ -674,26 +692,18 @@ class Module(Module, multiprocessing.Process):
                         timestamp,
                         by='Zeek',
                     )
-                    try:
-                        self.connections_checked_in_ssh_timer_thread.remove(
-                            uid
-                        )
-                    except ValueError:
-                        pass
+                    self.connections_checked_in_ssh_timer_thread.discard(uid)
                     return True
                 elif uid not in self.connections_checked_in_ssh_timer_thread:
                     # It can happen that the original SSH flow is not in the DB yet
                     # comes here if we haven't started the timer thread for this connection before
                     # mark this connection as checked
                     # self.print(f'Starting the timer to check on {flow_dict}, uid {uid}. time {datetime.datetime.now()}')
-                    self.connections_checked_in_ssh_timer_thread.append(
-                        uid
-                    )
+                    self.connections_checked_in_ssh_timer_thread.add(uid)
                     params = [message]
-                    timer = TimerThread(
+                    self.timer_scheduler.schedule(
                         15, self.check_successful_ssh, params
                     )
-                    timer.start()
             else:
                 # Try Slips method to detect if SSH was successful.
                 original_ssh_flow = __database__.get_flow(profileid, twid, uid)
@@ -719,12 +729,7 @@ class Module(Module, multiprocessing.Process):
                             timestamp,
                             by='Slips',
                         )
-                        try:
-                            self.connections_checked_in_ssh_timer_thread.remove(
-                                uid
-                            )
-                        except ValueError:
-                            pass
+                        self.connections_checked_in_ssh_timer_thread.discard(uid)
                         return True
 
                     else:
@@ -737,14 +742,11 @@ class Module(Module, multiprocessing.Process):
                         # mark this connection as checked
                         # self.print(f'Starting the timer to check on {flow_dict}, uid {uid}.
                         # time {datetime.datetime.now()}')
-                        self.connections_checked_in_ssh_timer_thread.append(
-                            uid
-                        )
+                        self.connections_checked_in_ssh_timer_thread.add(uid)
                         params = [message]
-                        timer = TimerThread(
+                        self.timer_scheduler.schedule(
                             15, self.check_successful_ssh, params
                         )
-                        timer.start()
         except Exception as inst:
             exception_line = sys.exc_info()[2].tb_lineno
             self.print(f'Problem on check_ssh() line {exception_line}', 0, 1)
@@ -852,111 +854,223 @@ class Module(Module, multiprocessing.Process):
         )
         return True
 
+    def add_reconnection(self, profileid, twid, key) -> int:
+        """
+        Counts a reconnection attempt in the given tw without storing it in the db
+        returns the reconnections of the given saddr-daddr key in this tw
+        """
+        profileid_twid = (profileid, twid)
+        if profileid_twid not in self.reconnections:
+            # continue from the reconnections stored in the db, if any
+            self.reconnections[profileid_twid] = (
+                __database__.getReconnectionsForTW(profileid, twid)
+            )
+        reconnections = self.reconnections[profileid_twid]
+        reconnections[key] = reconnections.get(key, 0) + 1
+        self.modified_reconnections.add(profileid_twid)
+        return reconnections[key]
+
+    def store_reconnections(self, profileid, twid):
+        """Stores the reconnections of the given tw in the db"""
+        __database__.setReconnections(
+            profileid, twid, self.reconnections[(profileid, twid)]
+        )
+        self.modified_reconnections.discard((profileid, twid))
+
+    def flush_reconnections(self):
+        """Stores the reconnections of all the modified tws in the db"""
+        for profileid, twid in list(self.modified_reconnections):
+            self.store_reconnections(profileid, twid)
+        self.last_reconnections_flush = time.time()
+
+    def handle_tw_closed(self, message):
+        """Stores the reconnections of the closed tw and removes them from memory"""
+        profileid, twid = message['data'].rsplit(__database__.separator, 1)
+        if (profileid, twid) in self.modified_reconnections:
+            self.store_reconnections(profileid, twid)
+        self.reconnections.pop((profileid, twid), None)
+
     def shutdown_gracefully(self):
+        if self.timer_scheduler.is_alive():
+            # no more flows are coming, run the pending checks now
+            self.timer_scheduler.shutdown()
+            self.timer_scheduler.join()
+        self.flush_reconnections()
         __database__.publish('finished_modules', self.name)
 
-    def run(self):
-        utils.drop_root_privs()
-        # Main loop function
-        while True:
-            try:
-                # ---------------------------- new_flow channel
-                message = self.c1.get_message(timeout=self.timeout)
-                # if timewindows are not updated for a long time, Slips is stopped automatically.
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_flow'):
-
-                    data = message['data']
-                    # Convert from json to dict
-                    data = json.loads(data)
-                    profileid = data['profileid']
-                    twid = data['twid']
-                    # Get flow as a json
-                    flow = data['flow']
-                    # Convert flow to a dict
-                    flow = json.loads(flow)
-
-                    # Convert the common fields to something that can
-                    # be interpreted
-                    uid = next(iter(flow))
-                    flow_dict = json.loads(flow[uid])
-                    # Flow type is 'conn' or 'dns', etc.
-                    flow_type = flow_dict['flow_type']
-                    dur = flow_dict['dur']
-                    saddr = flow_dict['saddr']
-                    daddr = flow_dict['daddr']
-                    origstate = flow_dict['origstate']
-                    state = flow_dict['state']
-                    timestamp = data['stime']
-                    # ports are of type int
-                    sport = flow_dict['sport']
-                    dport = flow_dict.get('dport', None)
-                    proto = flow_dict.get('proto')
-                    appproto = flow_dict.get('appproto', '')
-                    if not appproto or appproto == '-':
-                        appproto = flow_dict.get('type', '')
-
-                    # stime = flow_dict['ts']
-                    # timestamp = data['stime']
-                    # pkts = flow_dict['pkts']
-                    # allbytes = flow_dict['allbytes']
-
-                    # --- Detect long Connections ---
-                    # Do not check the duration of the flow if the daddr or
-                    # saddr is multicast.
-                    if (
-                        not ipaddress.ip_address(daddr).is_multicast
-                        and not ipaddress.ip_address(saddr).is_multicast
-                    ):
-                        self.check_long_connection(
-                            dur, daddr, saddr, profileid, twid, uid, timestamp
-                        )
+    def handle_new_flow(self, message):
+        """Runs the detections of each new flow"""
+        data = utils.decode_flow_msg(message['data'])
+        profileid = data['profileid']
+        twid = data['twid']
+        uid = data['uid']
+        flow_dict = data['flow']
+        # Flow type is 'conn' or 'dns', etc.
+        flow_type = flow_dict['flow_type']
+        dur = flow_dict['dur']
+        saddr = flow_dict['saddr']
+        daddr = flow_dict['daddr']
+        origstate = flow_dict['origstate']
+        state = flow_dict['state']
+        timestamp = data['stime']
+        # ports are of type int
+        sport = flow_dict['sport']
+        dport = flow_dict.get('dport', None)
+        proto = flow_dict.get('proto')
+        appproto = flow_dict.get('appproto', '')
+        if not appproto or appproto == '-':
+            appproto = flow_dict.get('type', '')
+
+        # stime = flow_dict['ts']
+        # timestamp = data['stime']
+        # pkts = flow_dict['pkts']
+        # allbytes = flow_dict['allbytes']
+
+        # --- Detect long Connections ---
+        # Do not check the duration of the flow if the daddr or
+        # saddr is multicast.
+        if (
+            not ipaddress.ip_address(daddr).is_multicast
+            and not ipaddress.ip_address(saddr).is_multicast
+        ):
+            self.check_long_connection(
+                dur, daddr, saddr, profileid, twid, uid, timestamp
+            )
 
-                    # --- Detect unknown destination ports ---
-                    if dport:
-                        if not __database__.is_known_ports_read():
-                            self.unknown_ports_queue.append((dport, proto, daddr, profileid, twid, uid, timestamp))
-                        else:
-                            if not self.ran_once:
-                                self.check_flows_in_queue()
-                                self.ran_once = True
+        # --- Detect unknown destination ports ---
+        if dport:
+            if not __database__.is_known_ports_read():
+                self.unknown_ports_queue.append((dport, proto, daddr, profileid, twid, uid, timestamp))
+            else:
+                if not self.ran_once:
+                    self.check_flows_in_queue()
+                    self.ran_once = True
+
+                self.check_unknown_port(
+                    dport,
+                    proto.lower(),
+                    daddr,
+                    profileid,
+                    twid,
+                    uid,
+                    timestamp,
+                )
 
-                            self.check_unknown_port(
-                                dport,
-                                proto.lower(),
-                                daddr,
-                                profileid,
-                                twid,
-                                uid,
-                                timestamp,
-                            )
+        # --- Detect Multiple Reconnection attempts ---
+        key = saddr + '-' + daddr
+        if dport != 0 and origstate == 'REJ':
+
+            # add this conn to the stored number of reconnections
+            reconnections = self.add_reconnection(profileid, twid, key)
+            if reconnections >= 5:
+                ip_identification = (
+                    __database__.getIPIdentification(daddr)
+                )
+                description = (
+                    f'Multiple reconnection attempts to Destination IP: {daddr} {ip_identification} '
+                    f'from IP: {saddr} reconnections: {reconnections}'
+                )
+                self.helper.set_evidence_for_multiple_reconnection_attempts(
+                    profileid,
+                    twid,
+                    daddr,
+                    description,
+                    uid,
+                    timestamp,
+                )
 
-                    # --- Detect Multiple Reconnection attempts ---
-                    key = saddr + '-' + daddr
-                    if dport != 0 and origstate == 'REJ':
+        # --- Detect Connection to port 0 ---
+        if proto not in ('igmp', 'icmp', 'ipv6-icmp') and (
+            sport == 0 or dport == 0
+        ):
+            direction = 'source' if sport == 0 else 'destination'
+            self.helper.set_evidence_for_port_0_connection(
+                saddr,
+                daddr,
+                direction,
+                profileid,
+                twid,
+                uid,
+                timestamp,
+            )
 
-                        # add this conn to the stored number of reconnections
-                        current_reconnections = (
-                            __database__.getReconnectionsForTW(profileid, twid)
-                        )
-                        current_reconnections[key] = (
-                            current_reconnections.get(key, 0) + 1
+        # --- Detect if this is a connection without a DNS resolution ---
+        # The exceptions are:
+        # 1- Do not check for DNS requests
+        # 2- Ignore some IPs like private IPs, multicast, and broadcast
+        if (
+            flow_type == 'conn'
+            and appproto != 'dns'
+            and not self.is_ignored_ip(daddr)
+        ):
+            # To avoid false positives in case of an interface don't alert ConnectionWithoutDNS until 30 minutes has passed
+            # after starting slips because the dns may have happened before starting slips
+            start_time = __database__.get_slips_start_time()
+            internal_time = float(
+                __database__.getSlipsInternalTime()
+            )
+            internal_time = datetime.datetime.fromtimestamp(
+                internal_time
+            )
+            diff_internal = internal_time - start_time
+            diff_internal = diff_internal.seconds
+            # self.print(f'Start: {start_time}, InternalTime: {internal_time} [diff {diff_internal}]. TH: {self.conn_without_dns_interface_wait_time}')
+            if (
+                int(diff_internal)
+                >= self.conn_without_dns_interface_wait_time
+            ):
+                self.check_connection_without_dns_resolution(
+                    daddr, twid, profileid, timestamp, uid
+                )
+
+        # --- Detect Connection to multiple ports (for RAT) ---
+        if proto == 'tcp' and state == 'Established':
+            dport_name = appproto
+            if not dport_name:
+                dport_name = __database__.get_port_info(
+                    str(dport) + '/' + proto.lower()
+                )
+                if dport_name:
+                    dport_name = dport_name.upper()
+            # Consider only unknown services
+            else:
+                dport_name = dport_name.upper()
+            # Consider only unknown services
+            if not dport_name:
+                # Connection to multiple ports to the destination IP
+                if profileid.split('_')[1] == saddr:
+                    direction = 'Dst'
+                    state = 'Established'
+                    protocol = 'TCP'
+                    role = 'Client'
+                    type_data = 'IPs'
+                    dst_IPs_ports = (
+                        __database__.getDataFromProfileTW(
+                            profileid,
+                            twid,
+                            direction,
+                            state,
+                            protocol,
+                            role,
+                            type_data,
                         )
-                        __database__.setReconnections(
-                            profileid, twid, current_reconnections
+                    )
+                    # make sure we find established connections to this daddr
+                    if daddr in dst_IPs_ports:
+                        dstports = list(
+                            dst_IPs_ports[daddr]['dstports']
                         )
-
-                        if current_reconnections[key] >= 5:
+                        if len(dstports) > 1:
                             ip_identification = (
-                                __database__.getIPIdentification(daddr)
+                                __database__.getIPIdentification(
+                                    daddr
+                                )
                             )
                             description = (
-                                f'Multiple reconnection attempts to Destination IP: {daddr} {ip_identification} '
-                                f'from IP: {saddr} reconnections: {current_reconnections[key]}'
+                                f'Connection to multiple ports {dstports} of '
+                                f'Destination IP: {daddr}. {ip_identification}'
                             )
-                            self.helper.set_evidence_for_multiple_reconnection_attempts(
+                            self.helper.set_evidence_for_connection_to_multiple_ports(
                                 profileid,
                                 twid,
                                 daddr,
@@ -965,583 +1079,465 @@ class Module(Module, multiprocessing.Process):
                                 timestamp,
                             )
 
-                    # --- Detect Connection to port 0 ---
-                    if proto not in ('igmp', 'icmp', 'ipv6-icmp') and (
-                        sport == 0 or dport == 0
-                    ):
-                        direction = 'source' if sport == 0 else 'destination'
-                        self.helper.set_evidence_for_port_0_connection(
-                            saddr,
-                            daddr,
+                # Connection to multiple port to the Source IP. Happens in the mode 'all'
+                elif profileid.split('_')[1] == daddr:
+                    direction = 'Src'
+                    state = 'Established'
+                    protocol = 'TCP'
+                    role = 'Server'
+                    type_data = 'IPs'
+                    src_IPs_ports = (
+                        __database__.getDataFromProfileTW(
+                            profileid,
+                            twid,
                             direction,
+                            state,
+                            protocol,
+                            role,
+                            type_data,
+                        )
+                    )
+                    dstports = list(
+                        src_IPs_ports[saddr]['dstports']
+                    )
+                    if len(dstports) > 1:
+                        description = 'Connection to multiple ports {} of Source IP: {}'.format(
+                            dstports, saddr
+                        )
+                        self.helper.set_evidence_for_connection_to_multiple_ports(
                             profileid,
                             twid,
+                            daddr,
+                            description,
                             uid,
                             timestamp,
                         )
 
-                    # --- Detect if this is a connection without a DNS resolution ---
-                    # The exceptions are:
-                    # 1- Do not check for DNS requests
-                    # 2- Ignore some IPs like private IPs, multicast, and broadcast
-                    if (
-                        flow_type == 'conn'
-                        and appproto != 'dns'
-                        and not self.is_ignored_ip(daddr)
-                    ):
-                        # To avoid false positives in case of an interface don't alert ConnectionWithoutDNS until 30 minutes has passed
-                        # after starting slips because the dns may have happened before starting slips
-                        start_time = __database__.get_slips_start_time()
-                        internal_time = float(
-                            __database__.getSlipsInternalTime()
-                        )
-                        internal_time = datetime.datetime.fromtimestamp(
-                            internal_time
-                        )
-                        diff_internal = internal_time - start_time
-                        diff_internal = diff_internal.seconds
-                        # self.print(f'Start: {start_time}, InternalTime: {internal_time} [diff {diff_internal}]. TH: {self.conn_without_dns_interface_wait_time}')
-                        if (
-                            int(diff_internal)
-                            >= self.conn_without_dns_interface_wait_time
-                        ):
-                            self.check_connection_without_dns_resolution(
-                                daddr, twid, profileid, timestamp, uid
-                            )
+        # --- Detect Data exfiltration ---
+        # we’re looking for systems that are transferring large amount of data in 20 mins span
+        all_flows = __database__.get_all_flows_in_profileid(
+            profileid
+        )
+        if all_flows:
+            # get a list of flows without uids
+            flows_list = []
+            for flow_dict in all_flows:
+                flows_list.append(list(flow_dict.items())[0][1])
+            # sort flows by ts
+            flows_list = sorted(flows_list, key=lambda i: i['ts'])
+            # get first and last flow ts
+            time_of_first_flow = datetime.datetime.fromtimestamp(
+                flows_list[0]['ts']
+            )
+            time_of_last_flow = datetime.datetime.fromtimestamp(
+                flows_list[-1]['ts']
+            )
+            # get the difference between them in seconds
 
-                    # --- Detect Connection to multiple ports (for RAT) ---
-                    if proto == 'tcp' and state == 'Established':
-                        dport_name = appproto
-                        if not dport_name:
-                            dport_name = __database__.get_port_info(
-                                str(dport) + '/' + proto.lower()
-                            )
-                            if dport_name:
-                                dport_name = dport_name.upper()
-                        # Consider only unknown services
-                        else:
-                            dport_name = dport_name.upper()
-                        # Consider only unknown services
-                        if not dport_name:
-                            # Connection to multiple ports to the destination IP
-                            if profileid.split('_')[1] == saddr:
-                                direction = 'Dst'
-                                state = 'Established'
-                                protocol = 'TCP'
-                                role = 'Client'
-                                type_data = 'IPs'
-                                dst_IPs_ports = (
-                                    __database__.getDataFromProfileTW(
-                                        profileid,
-                                        twid,
-                                        direction,
-                                        state,
-                                        protocol,
-                                        role,
-                                        type_data,
-                                    )
-                                )
-                                # make sure we find established connections to this daddr
-                                if daddr in dst_IPs_ports:
-                                    dstports = list(
-                                        dst_IPs_ports[daddr]['dstports']
-                                    )
-                                    if len(dstports) > 1:
-                                        ip_identification = (
-                                            __database__.getIPIdentification(
-                                                daddr
-                                            )
-                                        )
-                                        description = (
-                                            f'Connection to multiple ports {dstports} of '
-                                            f'Destination IP: {daddr}. {ip_identification}'
-                                        )
-                                        self.helper.set_evidence_for_connection_to_multiple_ports(
-                                            profileid,
-                                            twid,
-                                            daddr,
-                                            description,
-                                            uid,
-                                            timestamp,
-                                        )
-
-                            # Connection to multiple port to the Source IP. Happens in the mode 'all'
-                            elif profileid.split('_')[1] == daddr:
-                                direction = 'Src'
-                                state = 'Established'
-                                protocol = 'TCP'
-                                role = 'Server'
-                                type_data = 'IPs'
-                                src_IPs_ports = (
-                                    __database__.getDataFromProfileTW(
-                                        profileid,
-                                        twid,
-                                        direction,
-                                        state,
-                                        protocol,
-                                        role,
-                                        type_data,
-                                    )
-                                )
-                                dstports = list(
-                                    src_IPs_ports[saddr]['dstports']
-                                )
-                                if len(dstports) > 1:
-                                    description = 'Connection to multiple ports {} of Source IP: {}'.format(
-                                        dstports, saddr
-                                    )
-                                    self.helper.set_evidence_for_connection_to_multiple_ports(
-                                        profileid,
-                                        twid,
-                                        daddr,
-                                        description,
-                                        uid,
-                                        timestamp,
-                                    )
-
-                    # --- Detect Data exfiltration ---
-                    # we’re looking for systems that are transferring large amount of data in 20 mins span
-                    all_flows = __database__.get_all_flows_in_profileid(
-                        profileid
+            diff = str(time_of_last_flow - time_of_first_flow)
+            # if there are days diff between the flows , diff will be something like 1 day, 17:25:57.458395
+            try:
+                # calculate the days difference
+                diff_in_days = int(
+                    diff.split(', ')[0].split(' ')[0]
+                )
+                diff = diff.split(', ')[1]
+            except (IndexError, ValueError):
+                # no days different
+                diff = diff.split(', ')[0]
+                diff_in_days = 0
+
+            diff_in_hrs = int(diff.split(':')[0])
+            diff_in_mins = int(diff.split(':')[1])
+            # total diff in mins
+            diff_in_mins = (
+                24 * diff_in_days * 60
+                + diff_in_hrs * 60
+                + diff_in_mins
+            )
+
+            # we need the flows that happend in 20 mins span
+            if diff_in_mins >= 20:
+                contacted_daddrs = {}
+                # get a dict of all contacted daddr in the past hour and how many times they were ccontacted
+                for flow in flows_list:
+                    daddr = flow['daddr']
+                    try:
+                        contacted_daddrs[daddr] = (
+                            contacted_daddrs[daddr] + 1
+                        )
+                    except:
+                        contacted_daddrs.update({daddr: 1})
+                # most of the times the default gateway will be the most contacted daddr, we don't want that
+                # remove it from the dict if it's there
+                contacted_daddrs.pop(self.gateway, None)
+
+                # get the most contacted daddr in the past hour, if there is any
+                if contacted_daddrs:
+                    most_contacted_daddr = max(
+                        contacted_daddrs, key=contacted_daddrs.get
                     )
-                    if all_flows:
-                        # get a list of flows without uids
-                        flows_list = []
+                    times_contacted = contacted_daddrs[
+                        most_contacted_daddr
+                    ]
+                    # get the sum of all bytes send to that ip in the past hour
+                    total_bytes = 0
+                    for flow in flows_list:
+                        daddr = flow['daddr']
+                        # In arp the sbytes is actually ''
+                        if flow['sbytes'] == '':
+                            sbytes = 0
+                        else:
+                            sbytes = flow['sbytes']
+                        if daddr == most_contacted_daddr:
+                            total_bytes = total_bytes + sbytes
+                    # print(f'total_bytes:{total_bytes} most_contacted_daddr: {most_contacted_daddr} times_contacted: {times_contacted} ')
+                    if (
+                        total_bytes
+                        >= self.data_exfiltration_threshold
+                        * (10**6)
+                    ):
+                        # get the first uid of these flows to use for setEvidence
                         for flow_dict in all_flows:
-                            flows_list.append(list(flow_dict.items())[0][1])
-                        # sort flows by ts
-                        flows_list = sorted(flows_list, key=lambda i: i['ts'])
-                        # get first and last flow ts
-                        time_of_first_flow = datetime.datetime.fromtimestamp(
-                            flows_list[0]['ts']
-                        )
-                        time_of_last_flow = datetime.datetime.fromtimestamp(
-                            flows_list[-1]['ts']
-                        )
-                        # get the difference between them in seconds
-
-                        diff = str(time_of_last_flow - time_of_first_flow)
-                        # if there are days diff between the flows , diff will be something like 1 day, 17:25:57.458395
-                        try:
-                            # calculate the days difference
-                            diff_in_days = int(
-                                diff.split(', ')[0].split(' ')[0]
-                            )
-                            diff = diff.split(', ')[1]
-                        except (IndexError, ValueError):
-                            # no days different
-                            diff = diff.split(', ')[0]
-                            diff_in_days = 0
-
-                        diff_in_hrs = int(diff.split(':')[0])
-                        diff_in_mins = int(diff.split(':')[1])
-                        # total diff in mins
-                        diff_in_mins = (
-                            24 * diff_in_days * 60
-                            + diff_in_hrs * 60
-                            + diff_in_mins
+                            for uid, flow in flow_dict.items():
+                                if flow['daddr'] == daddr:
+                                    break
+                        self.helper.set_evidence_data_exfiltration(
+                            most_contacted_daddr,
+                            total_bytes,
+                            times_contacted,
+                            profileid,
+                            twid,
+                            uid,
                         )
 
-                        # we need the flows that happend in 20 mins span
-                        if diff_in_mins >= 20:
-                            contacted_daddrs = {}
-                            # get a dict of all contacted daddr in the past hour and how many times they were ccontacted
-                            for flow in flows_list:
-                                daddr = flow['daddr']
-                                try:
-                                    contacted_daddrs[daddr] = (
-                                        contacted_daddrs[daddr] + 1
-                                    )
-                                except:
-                                    contacted_daddrs.update({daddr: 1})
-                            # most of the times the default gateway will be the most contacted daddr, we don't want that
-                            # remove it from the dict if it's there
-                            contacted_daddrs.pop(self.gateway, None)
-
-                            # get the most contacted daddr in the past hour, if there is any
-                            if contacted_daddrs:
-                                most_contacted_daddr = max(
-                                    contacted_daddrs, key=contacted_daddrs.get
-                                )
-                                times_contacted = contacted_daddrs[
-                                    most_contacted_daddr
-                                ]
-                                # get the sum of all bytes send to that ip in the past hour
-                                total_bytes = 0
-                                for flow in flows_list:
-                                    daddr = flow['daddr']
-                                    # In arp the sbytes is actually ''
-                                    if flow['sbytes'] == '':
-                                        sbytes = 0
-                                    else:
-                                        sbytes = flow['sbytes']
-                                    if daddr == most_contacted_daddr:
-                                        total_bytes = total_bytes + sbytes
-                                # print(f'total_bytes:{total_bytes} most_contacted_daddr: {most_contacted_daddr} times_contacted: {times_contacted} ')
-                                if (
-                                    total_bytes
-                                    >= self.data_exfiltration_threshold
-                                    * (10**6)
-                                ):
-                                    # get the first uid of these flows to use for setEvidence
-                                    for flow_dict in all_flows:
-                                        for uid, flow in flow_dict.items():
-                                            if flow['daddr'] == daddr:
-                                                break
-                                    self.helper.set_evidence_data_exfiltration(
-                                        most_contacted_daddr,
-                                        total_bytes,
-                                        times_contacted,
-                                        profileid,
-                                        twid,
-                                        uid,
-                                    )
-
-                # --- Detect successful SSH connections ---
-                message = self.c2.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_ssh'):
-                    self.check_successful_ssh(message)
-
-                # --- Detect alerts from Zeek: Self-signed certs, invalid certs, port-scans and address scans, and password guessing ---
-                message = self.c3.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_notice'):
-                    data = message['data']
-                    if type(data) == str:
-                        # Convert from json to dict
-                        data = json.loads(data)
-                        profileid = data['profileid']
-                        twid = data['twid']
-                        # Get flow as a json
-                        flow = data['flow']
-                        # Convert flow to a dict
-                        flow = json.loads(flow)
-                        timestamp = flow['stime']
-                        uid = data['uid']
-                        msg = flow['msg']
-                        note = flow['note']
-
-                        # --- Self signed CERTS ---
-                        # We're looking for self signed certs in notice.log in the 'msg' field
-                        # The self-signed certs apear in both ssl and notice log. But if we check both
-                        # we are going to have repeated evidences. So we only check the ssl log for those
-                        """
-                        if 'self signed' in msg or 'self-signed' in msg:
-                            profileid = data['profileid']
-                            twid = data['twid']
-                            ip = flow['daddr']
-                            ip_identification = __database__.getIPIdentification(ip)
-                            description = f'Self-signed certificate. Destination IP {ip}. {ip_identification}'
-                            confidence = 0.5
-                            threat_level = 'low'
-                            category = "Anomaly.Behaviour"
-                            type_detection = 'dstip'
-                            type_evidence = 'SelfSignedCertificate'
-                            detection_info = ip
-                            __database__.setEvidence(type_evidence, type_detection, detection_info,
-                                                     threat_level, confidence, description,
-                                                     timestamp, category, profileid=profileid,
-                                                     twid=twid, uid=uid)
-                        """
-
-                        # --- Detect port scans from Zeek logs ---
-                        # We're looking for port scans in notice.log in the note field
-                        if 'Port_Scan' in note:
-                            # Vertical port scan
-                            scanning_ip = flow.get('scanning_ip', '')
-                            self.helper.set_evidence_vertical_portscan(
-                                msg,
-                                scanning_ip,
-                                timestamp,
-                                profileid,
-                                twid,
-                                uid,
-                            )
+    def handle_new_notice(self, message):
+        """
+        Detects zeek alerts: self-signed certs, invalid certs,
+        port scans, address scans and password guessing
+        """
+        data = message['data']
+        if type(data) == str:
+            # Convert from json to dict
+            data = json.loads(data)
+            profileid = data['profileid']
+            twid = data['twid']
+            # Get flow as a json
+            flow = data['flow']
+            # Convert flow to a dict
+            flow = json.loads(flow)
+            timestamp = flow['stime']
+            uid = data['uid']
+            msg = flow['msg']
+            note = flow['note']
+
+            # --- Self signed CERTS ---
+            # We're looking for self signed certs in notice.log in the 'msg' field
+            # The self-signed certs apear in both ssl and notice log. But if we check both
+            # we are going to have repeated evidences. So we only check the ssl log for those
+            """
+            if 'self signed' in msg or 'self-signed' in msg:
+                profileid = data['profileid']
+                twid = data['twid']
+                ip = flow['daddr']
+                ip_identification = __database__.getIPIdentification(ip)
+                description = f'Self-signed certificate. Destination IP {ip}. {ip_identification}'
+                confidence = 0.5
+                threat_level = 'low'
+                category = "Anomaly.Behaviour"
+                type_detection = 'dstip'
+                type_evidence = 'SelfSignedCertificate'
+                detection_info = ip
+                __database__.setEvidence(type_evidence, type_detection, detection_info,
+                                         threat_level, confidence, description,
+                                         timestamp, category, profileid=profileid,
+                                         twid=twid, uid=uid)
+            """
+
+            # --- Detect port scans from Zeek logs ---
+            # We're looking for port scans in notice.log in the note field
+            if 'Port_Scan' in note:
+                # Vertical port scan
+                scanning_ip = flow.get('scanning_ip', '')
+                self.helper.set_evidence_vertical_portscan(
+                    msg,
+                    scanning_ip,
+                    timestamp,
+                    profileid,
+                    twid,
+                    uid,
+                )
 
-                        # --- Detect SSL cert validation failed ---
-                        if (
-                            'SSL certificate validation failed' in msg
-                            and 'unable to get local issuer certificate'
-                            not in msg
-                        ):
-                            ip = flow['daddr']
-                            # get the description inside parenthesis
-                            ip_identification = (
-                                __database__.getIPIdentification(ip)
-                            )
-                            description = (
-                                msg
-                                + f' Destination IP: {ip}. {ip_identification}'
-                            )
-                            self.helper.set_evidence_for_invalid_certificates(
-                                profileid,
-                                twid,
-                                ip,
-                                description,
-                                uid,
-                                timestamp,
-                            )
-                            # self.print(description, 3, 0)
-
-                        # --- Detect horizontal portscan by zeek ---
-                        if 'Address_Scan' in note:
-                            # Horizontal port scan
-                            scanned_port = flow.get('scanned_port', '')
-                            self.helper.set_evidence_horizontal_portscan(
-                                msg,
-                                scanned_port,
-                                timestamp,
-                                profileid,
-                                twid,
-                                uid,
-                            )
-                        # --- Detect password guessing by zeek ---
-                        if 'Password_Guessing' in note:
-                            self.helper.set_evidence_pw_guessing(
-                                msg, timestamp, profileid, twid, uid
-                            )
+            # --- Detect SSL cert validation failed ---
+            if (
+                'SSL certificate validation failed' in msg
+                and 'unable to get local issuer certificate'
+                not in msg
+            ):
+                ip = flow['daddr']
+                # get the description inside parenthesis
+                ip_identification = (
+                    __database__.getIPIdentification(ip)
+                )
+                description = (
+                    msg
+                    + f' Destination IP: {ip}. {ip_identification}'
+                )
+                self.helper.set_evidence_for_invalid_certificates(
+                    profileid,
+                    twid,
+                    ip,
+                    description,
+                    uid,
+                    timestamp,
+                )
+                # self.print(description, 3, 0)
+
+            # --- Detect horizontal portscan by zeek ---
+            if 'Address_Scan' in note:
+                # Horizontal port scan
+                scanned_port = flow.get('scanned_port', '')
+                self.helper.set_evidence_horizontal_portscan(
+                    msg,
+                    scanned_port,
+                    timestamp,
+                    profileid,
+                    twid,
+                    uid,
+                )
+            # --- Detect password guessing by zeek ---
+            if 'Password_Guessing' in note:
+                self.helper.set_evidence_pw_guessing(
+                    msg, timestamp, profileid, twid, uid
+                )
 
-                # --- Detect maliciuos JA3 TLS servers ---
-                message = self.c4.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_ssl'):
-                    # Check for self signed certificates in new_ssl channel (ssl.log)
-                    data = message['data']
-                    if type(data) == str:
-                        # Convert from json to dict
-                        data = json.loads(data)
-                        # Get flow as a json
-                        flow = data['flow']
-                        # Convert flow to a dict
-                        flow = json.loads(flow)
-                        uid = flow['uid']
-                        timestamp = flow['stime']
-                        ja3 = flow.get('ja3', False)
-                        ja3s = flow.get('ja3s', False)
-                        profileid = data['profileid']
-                        twid = data['twid']
-                        daddr = flow['daddr']
-                        saddr = profileid.split('_')[1]
+    def handle_new_ssl(self, message):
+        """Detects malicious JA3 TLS servers"""
+        # Check for self signed certificates in new_ssl channel (ssl.log)
+        data = message['data']
+        if type(data) == str:
+            # Convert from json to dict
+            data = json.loads(data)
+            # Get flow as a json
+            flow = data['flow']
+            # Convert flow to a dict
+            flow = json.loads(flow)
+            uid = flow['uid']
+            timestamp = flow['stime']
+            ja3 = flow.get('ja3', False)
+            ja3s = flow.get('ja3s', False)
+            profileid = data['profileid']
+            twid = data['twid']
+            daddr = flow['daddr']
+            saddr = profileid.split('_')[1]
 
-                        if 'self signed' in flow['validation_status']:
-                            ip = flow['daddr']
-                            ip_identification = (
-                                __database__.getIPIdentification(ip)
-                            )
-                            server_name = flow.get(
-                                'server_name'
-                            )   # returns None if not found
-                            # if server_name is not None or not empty
-                            if not server_name:
-                                description = f'Self-signed certificate. Destination IP: {ip}. {ip_identification}'
-                            else:
-                                description = f'Self-signed certificate. Destination IP: {ip}, SNI: {server_name}. {ip_identification}'
-                            self.helper.set_evidence_self_signed_certificates(
-                                profileid,
-                                twid,
-                                ip,
-                                description,
-                                uid,
-                                timestamp,
-                            )
-                            self.print(description, 3, 0)
-
-                        if ja3 or ja3s:
-
-                            # get the dict of malicious ja3 stored in our db
-                            malicious_ja3_dict = __database__.get_ja3_in_IoC()
-
-                            if ja3 in malicious_ja3_dict:
-                                self.helper.set_evidence_malicious_JA3(
-                                    malicious_ja3_dict,
-                                    saddr,
-                                    profileid,
-                                    twid,
-                                    uid,
-                                    timestamp,
-                                    type_='ja3',
-                                    ioc=ja3,
-                                )
+            if 'self signed' in flow['validation_status']:
+                ip = flow['daddr']
+                ip_identification = (
+                    __database__.getIPIdentification(ip)
+                )
+                server_name = flow.get(
+                    'server_name'
+                )   # returns None if not found
+                # if server_name is not None or not empty
+                if not server_name:
+                    description = f'Self-signed certificate. Destination IP: {ip}. {ip_identification}'
+                else:
+                    description = f'Self-signed certificate. Destination IP: {ip}, SNI: {server_name}. {ip_identification}'
+                self.helper.set_evidence_self_signed_certificates(
+                    profileid,
+                    twid,
+                    ip,
+                    description,
+                    uid,
+                    timestamp,
+                )
+                self.print(description, 3, 0)
 
-                            if ja3s in malicious_ja3_dict:
-                                self.helper.set_evidence_malicious_JA3(
-                                    malicious_ja3_dict,
-                                    daddr,
-                                    profileid,
-                                    twid,
-                                    uid,
-                                    timestamp,
-                                    type_='ja3s',
-                                    ioc=ja3s,
-                                )
+            if ja3 or ja3s:
 
-                # --- Learn ports that Zeek knows but Slips doesn't ---
-                message = self.c5.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_service'):
-                    data = json.loads(message['data'])
-                    # uid = data['uid']
-                    # profileid = data['profileid']
-                    # uid = data['uid']
-                    # saddr = data['saddr']
-                    port = data['port_num']
-                    proto = data['port_proto']
-                    service = data['service']
-                    port_info = __database__.get_port_info(f'{port}/{proto}')
-                    if not port_info and len(service) > 0:
-                        # zeek detected a port that we didn't know about
-                        # add to known ports
-                        __database__.set_port_info(
-                            f'{port}/{proto}', service[0]
-                        )
+                # get the dict of malicious ja3 stored in our db
+                malicious_ja3_dict = __database__.get_ja3_in_IoC()
 
-                # --- Detect DNS issues: 1) DNS resolutions without connection, 2) DGA, 3) young domains, 4) ARPA SCANs ---
-                message = self.c6.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_dns_flow'):
-                    data = json.loads(message['data'])
-                    profileid = data['profileid']
-                    twid = data['twid']
-                    uid = data['uid']
-                    flow_data = json.loads(
-                        data['flow']
-                    )   # this is a dict {'uid':json flow data}
-                    domain = flow_data.get('query', False)
-                    answers = flow_data.get('answers', False)
-                    rcode_name = flow_data.get('rcode_name', False)
-                    stime = data.get('stime', False)
-
-                    # only check dns without connection if we have answers(we're sure the query is resolved)
-                    if answers:
-                        self.check_dns_resolution_without_connection(
-                            domain, answers, stime, profileid, twid, uid
-                        )
-                    if rcode_name:
-                        self.detect_DGA(
-                            rcode_name, domain, stime, profileid, twid, uid
-                        )
-                    if domain:
-                        # TODO: not sure how to make sure IP_info is done adding domain age to the db or not
-                        self.detect_young_domains(
-                            domain, stime, profileid, twid, uid
-                        )
-                        self.check_dns_arpa_scan(
-                            domain, stime, profileid, twid, uid
-                        )
+                if ja3 in malicious_ja3_dict:
+                    self.helper.set_evidence_malicious_JA3(
+                        malicious_ja3_dict,
+                        saddr,
+                        profileid,
+                        twid,
+                        uid,
+                        timestamp,
+                        type_='ja3',
+                        ioc=ja3,
+                    )
 
-                # --- Detect malicious SSL certificates ---
-                message = self.c7.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_downloaded_file'):
-                    data = json.loads(message['data'])
-                    source = data.get('source', '')
-                    analyzers = data.get('analyzers', '')
-                    sha1 = data.get('sha1', '')
-                    if 'SSL' not in source or 'SHA1' not in analyzers:
-                        # not an ssl cert
-                        continue
-
-                    # check if we have this sha1 marked as malicious from one of our feeds
-                    ssl_info_from_db = __database__.get_ssl_info(sha1)
-                    if not ssl_info_from_db:
-                        continue
-                    self.helper.set_evidence_malicious_ssl(
-                        data, ssl_info_from_db
+                if ja3s in malicious_ja3_dict:
+                    self.helper.set_evidence_malicious_JA3(
+                        malicious_ja3_dict,
+                        daddr,
+                        profileid,
+                        twid,
+                        uid,
+                        timestamp,
+                        type_='ja3s',
+                        ioc=ja3s,
                     )
 
-                # --- Detect Bad SMTP logins ---
-                message = self.c8.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_smtp'):
-                    data = json.loads(message['data'])
-                    profileid = data['profileid']
-                    twid = data['twid']
-                    uid = data['uid']
-                    daddr = data['daddr']
-                    saddr = data['saddr']
-                    stime = data.get('ts', False)
-                    last_reply = data.get('last_reply', False)
-
-                    if 'bad smtp-auth user' in last_reply:
-                        try:
-                            self.smtp_bruteforce_cache[profileid].append(stime)
-                        except KeyError:
-                            # first time for this profileid to preform bad smtp login
-                            self.smtp_bruteforce_cache.update(
-                                {profileid: [stime]}
-                            )
-                        self.helper.set_evidence_bad_smtp_login(
-                            saddr, daddr, stime, profileid, twid, uid
-                        )
+    def handle_new_service(self, message):
+        """Learns ports that zeek knows but slips doesn't"""
+        data = json.loads(message['data'])
+        # uid = data['uid']
+        # profileid = data['profileid']
+        # uid = data['uid']
+        # saddr = data['saddr']
+        port = data['port_num']
+        proto = data['port_proto']
+        service = data['service']
+        port_info = __database__.get_port_info(f'{port}/{proto}')
+        if not port_info and len(service) > 0:
+            # zeek detected a port that we didn't know about
+            # add to known ports
+            __database__.set_port_info(
+                f'{port}/{proto}', service[0]
+            )
 
-                        # check if (3) bad login attemps happened
-                        if (
-                            len(self.smtp_bruteforce_cache[profileid])
-                            == self.smtp_bruteforce_threshold
-                        ):
-                            # check if they happened within 10 seconds or less
-                            diff = int(
-                                self.smtp_bruteforce_cache[profileid][-1]
-                            ) - int(self.smtp_bruteforce_cache[profileid][0])
-                            if diff <= 10:
-                                # remove all 3 logins that caused this alert
-                                self.smtp_bruteforce_cache[profileid] = []
-                                self.helper.set_evidence_smtp_bruteforce(
-                                    saddr,
-                                    daddr,
-                                    stime,
-                                    profileid,
-                                    twid,
-                                    uid,
-                                    self.smtp_bruteforce_threshold,
-                                )
-                            else:
-                                # remove the first element so we can check the next 3 logins
-                                self.smtp_bruteforce_cache[profileid].pop(0)
+    def handle_new_dns_flow(self, message):
+        """Detects DNS issues: resolutions without connection, DGA, young domains and ARPA scans"""
+        data = json.loads(message['data'])
+        profileid = data['profileid']
+        twid = data['twid']
+        uid = data['uid']
+        flow_data = json.loads(
+            data['flow']
+        )   # this is a dict {'uid':json flow data}
+        domain = flow_data.get('query', False)
+        answers = flow_data.get('answers', False)
+        rcode_name = flow_data.get('rcode_name', False)
+        stime = data.get('stime', False)
+
+        # only check dns without connection if we have answers(we're sure the query is resolved)
+        if answers:
+            self.check_dns_resolution_without_connection(
+                domain, answers, stime, profileid, twid, uid
+            )
+        if rcode_name:
+            self.detect_DGA(
+                rcode_name, domain, stime, profileid, twid, uid
+            )
+        if domain:
+            # TODO: not sure how to make sure IP_info is done adding domain age to the db or not
+            self.detect_young_domains(
+                domain, stime, profileid, twid, uid
+            )
+            self.check_dns_arpa_scan(
+                domain, stime, profileid, twid, uid
+            )
 
-                # --- Detect multiple used SSH versions ---
-                message = self.c9.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_software'):
-                    flow = json.loads(message['data'])
-                    starttime = flow.get('starttime', '')
-                    saddr = flow.get('saddr', '')
-                    uid = flow.get('uid', '')
-                    twid = flow.get('twid', '')
-                    software_type = flow.get('software_type', '')
-                    if 'ssh' not in software_type.lower():
-                        continue
-                    unparsed_version = flow.get('saddr', '')
-                    major_v = flow.get('version.major', '')
-                    minor_v = flow.get('version.minor', '')
-                    self.check_multiple_ssh_clients(
-                        starttime,
+    def handle_new_downloaded_file(self, message):
+        """Detects malicious SSL certificates"""
+        data = json.loads(message['data'])
+        source = data.get('source', '')
+        analyzers = data.get('analyzers', '')
+        sha1 = data.get('sha1', '')
+        if 'SSL' not in source or 'SHA1' not in analyzers:
+            # not an ssl cert
+            return
+
+        # check if we have this sha1 marked as malicious from one of our feeds
+        ssl_info_from_db = __database__.get_ssl_info(sha1)
+        if not ssl_info_from_db:
+            return
+        self.helper.set_evidence_malicious_ssl(
+            data, ssl_info_from_db
+        )
+
+    def handle_new_smtp(self, message):
+        """Detects bad SMTP logins"""
+        data = json.loads(message['data'])
+        profileid = data['profileid']
+        twid = data['twid']
+        uid = data['uid']
+        daddr = data['daddr']
+        saddr = data['saddr']
+        stime = data.get('ts', False)
+        last_reply = data.get('last_reply', False)
+
+        if 'bad smtp-auth user' in last_reply:
+            try:
+                self.smtp_bruteforce_cache[profileid].append(stime)
+            except KeyError:
+                # first time for this profileid to preform bad smtp login
+                self.smtp_bruteforce_cache.update(
+                    {profileid: [stime]}
+                )
+            self.helper.set_evidence_bad_smtp_login(
+                saddr, daddr, stime, profileid, twid, uid
+            )
+
+            # check if (3) bad login attemps happened
+            if (
+                len(self.smtp_bruteforce_cache[profileid])
+                == self.smtp_bruteforce_threshold
+            ):
+                # check if they happened within 10 seconds or less
+                diff = int(
+                    self.smtp_bruteforce_cache[profileid][-1]
+                ) - int(self.smtp_bruteforce_cache[profileid][0])
+                if diff <= 10:
+                    # remove all 3 logins that caused this alert
+                    self.smtp_bruteforce_cache[profileid] = []
+                    self.helper.set_evidence_smtp_bruteforce(
                         saddr,
-                        software_type,
-                        unparsed_version,
-                        major_v,
-                        minor_v,
+                        daddr,
+                        stime,
+                        profileid,
                         twid,
                         uid,
+                        self.smtp_bruteforce_threshold,
                     )
+                else:
+                    # remove the first element so we can check the next 3 logins
+                    self.smtp_bruteforce_cache[profileid].pop(0)
+
+    def handle_new_software(self, message):
+        """Detects multiple SSH versions used by the same host"""
+        flow = json.loads(message['data'])
+        starttime = flow.get('starttime', '')
+        saddr = flow.get('saddr', '')
+        uid = flow.get('uid', '')
+        twid = flow.get('twid', '')
+        software_type = flow.get('software_type', '')
+        if 'ssh' not in software_type.lower():
+            return
+        unparsed_version = flow.get('saddr', '')
+        major_v = flow.get('version.major', '')
+        minor_v = flow.get('version.minor', '')
+        self.check_multiple_ssh_clients(
+            starttime,
+            saddr,
+            software_type,
+            unparsed_version,
+            major_v,
+            minor_v,
+            twid,
+            uid,
+        )
 
+    def run(self):
+        utils.drop_root_privs()
+        self.timer_scheduler.start()
+        # Main loop function
+        while True:
+            try:
+                # wait for a msg in any of the channels and pass it to its handler
+                if not self.dispatcher.dispatch():
+                    self.shutdown_gracefully()
+                    return True
+                if (
+                    time.time() - self.last_reconnections_flush
+                    > self.reconnections_flush_interval
+                ):
+                    self.flush_reconnections()
             except KeyboardInterrupt:
                 self.shutdown_gracefully()
                 return True
@@ -0,0 +1,80 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class TimerScheduler(threading.Thread):
+    """
+    Thread that executes each scheduled task after its delay.
+    All the delayed checks of flowalerts run in this thread instead of starting one thread per check
+    """
+
+    def __init__(self, print):
+        """
+        :param print: print function of the module, used to report the tasks that fail
+        """
+        threading.Thread.__init__(self, daemon=True)
+        self.print = print
+        # heap of (time to run the task, counter, function, parameters),
+        # the counter keeps the order of tasks scheduled for the same time
+        self.tasks = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self._finished = False
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def schedule(self, delay, function, parameters):
+        """Executes function(*parameters) after delay seconds"""
+        with self.condition:
+            heapq.heappush(
+                self.tasks,
+                (time.monotonic() + delay, next(self.counter), function, parameters),
+            )
+            # wake up the thread in case this task is due before the one it's waiting for
+            self.condition.notify()
+
+    def shutdown(self):
+        """
+        Executes the pending tasks now without waiting for their delays and stops the thread
+        """
+        with self.condition:
+            self._finished = True
+            self.condition.notify()
+
+    def get_next_task(self):
+        """
+        Waits until the first task is due and removes it from the heap
+        returns None when the thread is shut down and there are no tasks left
+        """
+        with self.condition:
+            while True:
+                if not self.tasks:
+                    if self._finished:
+                        return None
+                    self.condition.wait()
+                    continue
+                delay = self.tasks[0][0] - time.monotonic()
+                if delay <= 0 or self._finished:
+                    return heapq.heappop(self.tasks)
+                self.condition.wait(delay)
+
+    def run(self):
+        try:
+            while task := self.get_next_task():
+                _, _, function, parameters = task
+                # the task runs without the lock so it can schedule more tasks
+                try:
+                    function(*parameters)
+                except Exception:
+                    # keep running the rest of the tasks
+                    self.print(
+                        f'Problem running {getattr(function, "__name__", function)} '
+                        f'in the timer scheduler', 0, 1,
+                    )
+                    self.print(traceback.format_exc(), 0, 1)
+        except KeyboardInterrupt:
+            return True
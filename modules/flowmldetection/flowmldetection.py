@@ -10,7 +10,6 @@ from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
 import pickle
 import pandas as pd
-import json
 import platform
 import datetime
 
@@ -461,20 +460,11 @@ class Module(Module, multiprocessing.Process):
                     return True
 
                 if utils.is_msg_intended_for(message, 'new_flow'):
-                    data = message['data']
-                    # Convert from json to dict
-                    data = json.loads(data)
+                    data = utils.decode_flow_msg(message['data'])
                     profileid = data['profileid']
                     twid = data['twid']
-                    # Get flow that is now in json format
-                    flow = data['flow']
-                    # Convert flow to a dict
-                    flow = json.loads(flow)
-                    # Convert the common fields to something that can
-                    # be interpreted
-                    # Get the uid which is the key
-                    uid = next(iter(flow))
-                    self.flow_dict = json.loads(flow[uid])
+                    uid = data['uid']
+                    self.flow_dict = data['flow']
 
                     if self.mode == 'train':
                         # We are training
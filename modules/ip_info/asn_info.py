@@ -1,5 +1,6 @@
 # Must imports
 from slips_files.core.database import __database__
+from slips_files.common.ip_ranges import IPRangesIndex
 
 # Your imports
 import time
@@ -22,27 +23,29 @@ class ASN:
         except Exception:
             # errors are printed in IP_info
             pass
+        # index of the asn ranges cached in the db {range: asn},
+        # loaded from the db the first time we look for an ip
+        self.asn_ranges = None
+
+    def load_asn_ranges(self):
+        """
+        Builds the index of asn ranges from the ones cached in the db by this
+        or previous runs, later ranges are added by cache_ip_range()
+        """
+        self.asn_ranges = IPRangesIndex()
+        # ranges cached by older versions of slips only have the last range of each asn
+        for asn, asn_range in __database__.get_asn_cache().items():
+            self.asn_ranges.add(asn_range, asn)
+        self.asn_ranges.update(__database__.get_asn_ranges_cache())
 
     def get_cached_asn(self, ip):
         """
         If this ip belongs to a cached ip range, return the cached asn info of it
         :param ip: str
         """
-        cached_asn = __database__.get_asn_cache()
-        try:
-            for asn, asn_range in cached_asn.items():
-                # convert to objects
-                ip_range = ipaddress.ip_network(asn_range)
-                try:
-                    ip = ipaddress.ip_address(ip)
-                except ValueError:
-                    # not a valid ip
-                    break
-                if ip in ip_range:
-                    return asn
-        except AttributeError:
-            # cached_asn is not found
-            return False
+        if self.asn_ranges is None:
+            self.load_asn_ranges()
+        return self.asn_ranges.lookup(ip)
 
     def update_asn(self, cached_data, update_period) -> bool:
         """
@@ -94,6 +97,8 @@ class ASN:
             asn_cidr = whois_info.get('asn_cidr', False)
             if asnorg and asn_cidr not in ('', 'NA'):
                 __database__.set_asn_cache(asnorg, asn_cidr)
+                if self.asn_ranges is not None:
+                    self.asn_ranges.add(asn_cidr, asnorg)
             return True
         except (
             ipwhois.exceptions.IPDefinedError,
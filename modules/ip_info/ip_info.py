@@ -1,5 +1,5 @@
 # Must imports
-from slips_files.common.abstracts import Module
+from slips_files.common.abstracts import Module, ChannelsDispatcher
 import multiprocessing
 from slips_files.core.database import __database__
 from slips_files.common.slips_utils import utils
@@ -40,10 +40,13 @@ class Module(Module, multiprocessing.Process):
         # Set the output queue of our database instance
         __database__.setOutputQueue(self.outputqueue)
         # To which channels do you wnat to subscribe? When a message arrives on the channel the module will wakeup
-        self.c1 = __database__.subscribe('new_ip')
-        self.c2 = __database__.subscribe('new_MAC')
-        self.c3 = __database__.subscribe('new_dns_flow')
-        self.timeout = 0.0000001
+        self.dispatcher = ChannelsDispatcher(
+            {
+                'new_ip': self.handle_new_ip,
+                'new_MAC': self.handle_new_MAC,
+                'new_dns_flow': self.handle_new_dns_flow,
+            }
+        )
         # update asn every 1 month
         self.update_period = 2592000
         # we can only getthe age of these tlds
@@ -400,81 +403,73 @@ class Module(Module, multiprocessing.Process):
         # confirm that the module is done processing
         __database__.publish('finished_modules', self.name)
 
+    def handle_new_MAC(self, message):
+        """Gets the vendor of the new MAC"""
+        data = json.loads(message['data'])
+        mac_addr = data['MAC']
+        host_name = data.get('host_name', False)
+        profileid = data['profileid']
+        self.get_vendor(mac_addr, host_name, profileid)
+
+    def handle_new_dns_flow(self, message):
+        """Gets the age of the queried domain"""
+        data = message['data']
+        data = json.loads(data)
+        profileid = data['profileid']
+        twid = data['twid']
+        uid = data['uid']
+        flow_data = json.loads(
+            data['flow']
+        )   # this is a dict {'uid':json flow data}
+        if domain := flow_data.get('query', False):
+            self.get_age(domain)
+
+    def handle_new_ip(self, message):
+        """Gets the geocountry, ASN and rDNS of the new IP"""
+        # Get the IP from the message
+        ip = message['data']
+        try:
+            # make sure its a valid ip
+            ip_addr = ipaddress.ip_address(ip)
+        except ValueError:
+            # not a valid ip skip
+            return
+
+        if not ip_addr.is_multicast:
+            # Do we have cached info about this ip in redis?
+            # If yes, load it
+            cached_ip_info = __database__.getIPData(ip)
+            if not cached_ip_info:
+                cached_ip_info = {}
+
+            # ------ GeoCountry -------
+            # Get the geocountry
+            if (
+                    cached_ip_info == {}
+                    or 'geocountry' not in cached_ip_info
+            ):
+                self.get_geocountry(ip)
+
+            # ------ ASN -------
+            # Get the ASN
+            # only update the ASN for this IP if more than 1 month
+            # passed since last ASN update on this IP
+            if update_asn := self.asn.update_asn(
+                    cached_ip_info,
+                    self.update_period
+            ):
+                self.asn.get_asn(ip, cached_ip_info)
+            self.get_rdns(ip)
+
     def run(self):
         utils.drop_root_privs()
         # Main loop function
         while True:
             try:
-                message = self.c2.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_MAC'):
-                    data = json.loads(message['data'])
-                    mac_addr = data['MAC']
-                    host_name = data.get('host_name', False)
-                    profileid = data['profileid']
-                    self.get_vendor(mac_addr, host_name, profileid)
-
-                message = self.c3.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_dns_flow'):
-                    data = message['data']
-                    data = json.loads(data)
-                    profileid = data['profileid']
-                    twid = data['twid']
-                    uid = data['uid']
-                    flow_data = json.loads(
-                        data['flow']
-                    )   # this is a dict {'uid':json flow data}
-                    if domain := flow_data.get('query', False):
-                        self.get_age(domain)
-
-                message = self.c1.get_message(timeout=self.timeout)
-                # if timewindows are not updated for a long time (see at logsProcess.py),
-                # we will stop slips automatically.The 'stop_process' line is sent from logsProcess.py.
-                if message and message['data'] == 'stop_process':
+                # wait for a msg in any of the channels and pass it to its handler
+                if not self.dispatcher.dispatch():
                     self.shutdown_gracefully()
                     return True
-
-                if utils.is_msg_intended_for(message, 'new_ip'):
-                    # Get the IP from the message
-                    ip = message['data']
-                    try:
-                        # make sure its a valid ip
-                        ip_addr = ipaddress.ip_address(ip)
-                    except ValueError:
-                        # not a valid ip skip
-                        continue
-
-                    if not ip_addr.is_multicast:
-                        # Do we have cached info about this ip in redis?
-                        # If yes, load it
-                        cached_ip_info = __database__.getIPData(ip)
-                        if not cached_ip_info:
-                            cached_ip_info = {}
-
-                        # ------ GeoCountry -------
-                        # Get the geocountry
-                        if (
-                                cached_ip_info == {}
-                                or 'geocountry' not in cached_ip_info
-                        ):
-                            self.get_geocountry(ip)
-
-                        # ------ ASN -------
-                        # Get the ASN
-                        # only update the ASN for this IP if more than 1 month
-                        # passed since last ASN update on this IP
-                        if update_asn := self.asn.update_asn(
-                                cached_ip_info,
-                                self.update_period
-                        ):
-                            self.asn.get_asn(ip, cached_ip_info)
-                        self.get_rdns(ip)
-
             except KeyboardInterrupt:
                 self.shutdown_gracefully()
                 return True
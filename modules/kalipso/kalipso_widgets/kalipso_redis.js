@@ -73,9 +73,10 @@ class Redis{
 
     /*Get evidence for specific profile and timewindow*/
     getEvidence(ip, timewindow){
-      return new Promise ((resolve, reject)=>{this.evidence_data.hget("profile_"+ip+"_"+timewindow,'Evidence',(err,reply)=>{
+      return new Promise ((resolve, reject)=>{this.evidence_data.hgetall("profile_"+ip+"_"+timewindow+"_evidence",(err,reply)=>{
         if(err){console.log("Error in getEvidence() in kalipso_redis.js. Error: ",err); reject(err);}
-        else{resolve(reply);}
+        else if(reply==null){resolve(null);}
+        else{resolve(JSON.stringify(reply));}
       });})
     }
 
@@ -103,20 +104,32 @@ class Redis{
       });})
     }
 
+    /*Get the tuples of a specific profile and timewindow as a json string {tupleid: [letters, timestamps]}.
+    The letters of each tuple are stored in their own key and the timestamps in the hash profile_ip_timewindow_direction.*/
+    getTuples(client, ip, timewindow, direction){
+      var tuples_key = "profile_"+ip+"_"+timewindow+"_"+direction
+      return new Promise ((resolve, reject)=>{client.hgetall(tuples_key,(err,timestamps)=>{
+        if(err){console.log("Error in getTuples in kalipso_redis.js. Error: ",err); reject(err); return;}
+        if(timestamps==null){resolve(null); return;}
+        var tupleids = Object.keys(timestamps)
+        client.mget(tupleids.map(tupleid=>tuples_key+"_"+tupleid),(err,letters)=>{
+          if(err){console.log("Error in getTuples in kalipso_redis.js. Error: ",err); reject(err);}
+          else{
+            var tuples = {}
+            tupleids.forEach((tupleid, index)=>{tuples[tupleid] = [letters[index], JSON.parse(timestamps[tupleid])]})
+            resolve(JSON.stringify(tuples));}
+        });
+      });})
+    }
+
     /*Get outtuples for specific profile and timewindow.*/
     getOutTuples(ip,timewindow){
-      return new Promise ((resolve, reject)=>{this.outTuples_data.hget("profile_"+ip+"_"+timewindow,'OutTuples',(err,reply)=>{
-        if(err){console.log("Error in getOutTuples in kalipso_redis.js. Error: ",err); reject(err);}
-        else{resolve(reply);}
-      });})
+      return this.getTuples(this.outTuples_data, ip, timewindow, 'OutTuples')
     }
 
     /*Get intuples for specific profile and timewindow*/
     getInTuples(ip,timewindow){
-      return new Promise ((resolve, reject)=>{this.inTuples_data.hget("profile_"+ip+"_"+timewindow,'InTuples',(err,reply)=>{
-        if(err){console.log("Error in getInTuples in kalipso_redis.js. Error: ",err); reject(err);}
-        else{resolve(reply);}
-      });})
+      return this.getTuples(this.inTuples_data, ip, timewindow, 'InTuples')
     }
 
     /*Get data for UDP established connections (dst/src ports/ips client/server) for specific profile and timewindow*/
@@ -154,9 +167,15 @@ class Redis{
     /*Get all evidence for specific profile.*/
     getAllProfileEvidences(ip){
         return new Promise(
-               (resolve,reject)=>{this.all_profile_evidences.hgetall("evidenceprofile_"+ip, (err,reply)=>{
-                   if(err){console.log("Error in getAllProfileEvidences in kalipso_redis.js. Error: ",err); reject(err);}
-                   else{resolve(reply);}
+               (resolve,reject)=>{this.all_profile_evidences.zrange("twsprofile_"+ip, 0, -1, (err,timewindows)=>{
+                   if(err){console.log("Error in getAllProfileEvidences in kalipso_redis.js. Error: ",err); reject(err); return;}
+                   Promise.all(timewindows.map(timewindow=>this.getEvidence(ip, timewindow))).then(tws_evidence=>{
+                       // {twid: evidence of the tw as json}, only for the timewindows that have evidence
+                       var all_profile_evidences = {}
+                       timewindows.forEach((timewindow, index)=>{
+                           if(tws_evidence[index]!=null){all_profile_evidences[timewindow] = tws_evidence[index]}})
+                       resolve(Object.keys(all_profile_evidences).length ? all_profile_evidences : null);
+                   }, reject)
                })}
         )
     }
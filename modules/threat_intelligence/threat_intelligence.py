@@ -1,6 +1,8 @@
 # Must imports
-from slips_files.common.abstracts import Module
+from slips_files.common.abstracts import Module, ChannelsDispatcher
 from slips_files.common.slips_utils import utils
+from slips_files.common.ip_ranges import IPRangesIndex
+from slips_files.common.bloom_filter import BloomFilter
 import multiprocessing
 from slips_files.core.database import __database__
 import platform
@@ -14,6 +16,7 @@ import json
 import traceback
 import validators
 import ast
+from collections import OrderedDict
 
 
 class Module(Module, multiprocessing.Process):
@@ -31,8 +34,26 @@ class Module(Module, multiprocessing.Process):
         __database__.start(self.config, redis_port)
         # Get a separator from the database
         self.separator = __database__.getFieldSeparator()
-        self.c1 = __database__.subscribe('give_threat_intelligence')
-        self.timeout = 0
+        # all the channels are received using 1 pubsub, so the IoCs added or deleted by the
+        # update manager are always handled before the TI requests published after them
+        self.dispatcher = ChannelsDispatcher(
+            {
+                'give_threat_intelligence': self.handle_give_threat_intelligence,
+                'new_ip_ranges': self.handle_new_ip_ranges,
+                'new_ioc_domains': self.handle_new_ioc_domains,
+                'new_ioc_ips': self.handle_new_ioc_ips,
+                'deleted_ioc_ips': self.handle_deleted_ioc_ips,
+            }
+        )
+        # longest prefix match index of the blacklisted ranges in IoC_ip_ranges
+        self.ip_ranges = IPRangesIndex()
+        # bloom filters of the ips in IoC_ips and the domains in IoC_domains. most of the ips and domains
+        # we're asked about are benign and the filters tell us that without asking the db
+        self.malicious_ips = BloomFilter(1)
+        self.malicious_domains = BloomFilter(1)
+        # the description of the blacklisted ips found recently {ip: description}
+        self.recent_malicious_ips = OrderedDict()
+        self.recent_malicious_ips_size = 1000
         self.__read_configuration()
 
     def __read_configuration(self):
@@ -317,6 +338,7 @@ class Module(Module, multiprocessing.Process):
         __database__.add_ips_to_IoC(malicious_ips_dict)
         # Add all loaded malicious domains to the database
         __database__.add_domains_to_IoC(malicious_domains_dict)
+        __database__.publish_ioc_updated(data_file_name)
         return True
 
     def __delete_old_source_IPs(self, file):
@@ -485,11 +507,194 @@ class Module(Module, multiprocessing.Process):
 
         return protocol == 'ICMP' and ip_state == 'dstip'
 
+    def build_bloom_filter(self, iocs) -> BloomFilter:
+        """Returns a bloom filter of the given IoCs with room for as many more"""
+        bloom_filter = BloomFilter(max(2 * len(iocs), 100000))
+        bloom_filter.update(iocs)
+        return bloom_filter
+
+    def add_to_bloom_filter(
+        self, bloom_filter: BloomFilter, iocs: list, get_all_iocs
+    ) -> BloomFilter:
+        """
+        Adds the given IoCs to the bloom filter, or builds a bigger one if it's full
+        :param get_all_iocs: function that returns all the IoCs of this type in the db
+        """
+        if bloom_filter.count + len(iocs) > bloom_filter.capacity:
+            # the new IoCs are already in the db
+            return self.build_bloom_filter(get_all_iocs())
+        bloom_filter.update(iocs)
+        return bloom_filter
+
+    def search_IP_in_IoC(self, ip: str):
+        """
+        Returns the description of the given IP in IoC_ips or False if it's not blacklisted
+        only asks the db if the bloom filter says the ip may be there and it wasn't found recently
+        """
+        if ip not in self.malicious_ips:
+            return False
+        try:
+            self.recent_malicious_ips.move_to_end(ip)
+            return self.recent_malicious_ips[ip]
+        except KeyError:
+            pass
+        ip_info = __database__.search_IP_in_IoC(ip)
+        if ip_info:
+            self.recent_malicious_ips[ip] = ip_info
+            if len(self.recent_malicious_ips) > self.recent_malicious_ips_size:
+                self.recent_malicious_ips.popitem(last=False)
+        return ip_info
+
+    def is_in_malicious_domains(self, domain: str) -> bool:
+        """
+        Checks if the domain or any of its parent domains may be in the bloom filter of malicious domains
+        so we only ask the db for the description of the domains that are there.
+        The filter has false positives and domains deleted from the db stay in it, so the db has the final word
+        """
+        for domain_to_check in utils.get_domain_and_parents(domain):
+            if domain_to_check in self.malicious_domains:
+                return True
+        return False
+
     def shutdown_gracefully(self):
         # Confirm that the module is done processing
         __database__.publish('finished_modules', self.name)
         return True
 
+    def handle_new_ip_ranges(self, message):
+        """Updates the index of ranges with the ranges added or removed by the update manager"""
+        for ip_range, range_info in json.loads(message['data']).items():
+            if range_info is None:
+                # the range was removed from its feed
+                self.ip_ranges.remove(ip_range)
+            else:
+                self.ip_ranges.add(ip_range, range_info)
+
+    def handle_new_ioc_domains(self, message):
+        """Adds the domains added by the update manager to the bloom filter"""
+        self.malicious_domains = self.add_to_bloom_filter(
+            self.malicious_domains,
+            json.loads(message['data']),
+            __database__.get_Domains_in_IoC,
+        )
+
+    def handle_new_ioc_ips(self, message):
+        """Adds the ips added by the update manager to the bloom filter"""
+        ips = json.loads(message['data'])
+        self.malicious_ips = self.add_to_bloom_filter(
+            self.malicious_ips, ips, __database__.get_IPs_in_IoC
+        )
+        # the feed of a recent ip may have been updated
+        self.forget_recent_malicious_ips(ips)
+
+    def handle_deleted_ioc_ips(self, message):
+        """
+        Forgets the descriptions of the ips deleted by the update manager,
+        they stay in the bloom filter but the db doesn't have them anymore
+        """
+        self.forget_recent_malicious_ips(json.loads(message['data']))
+
+    def forget_recent_malicious_ips(self, ips: list):
+        for ip in ips:
+            self.recent_malicious_ips.pop(ip, None)
+
+    def handle_give_threat_intelligence(self, message):
+        """Looks up the ip or domain of the request in the IoCs and sets evidence if it's malicious"""
+        # Data is sent in the channel as a json dict so we need to deserialize it first
+        data = json.loads(message['data'])
+        # Extract data from dict
+        profileid = data.get('profileid')
+        twid = data.get('twid')
+        timestamp = data.get('stime')
+        uid = data.get('uid')
+        protocol = data.get('proto')
+        # IP is the IP that we want the TI for. It can be a SRC or DST IP
+        ip = data.get('ip')
+        # ip_state will say if it is a srcip or if it was a dst_ip
+        ip_state = data.get('ip_state')
+        # self.print(ip)
+
+        # If given an IP, ask for it
+        # Block only if the traffic isn't outgoing ICMP port unreachable packet
+        if ip and not self.is_outgoing_icmp_packet(
+            protocol, ip_state
+        ):
+            # Search for this IP in our database of IoC
+            ip_info = self.search_IP_in_IoC(ip)
+            # check if it's a blacklisted ip
+            if (
+                ip_info != False
+            ):   # Dont change this condition. This is the only way it works
+                # If the IP is in the blacklist of IoC. Add it as Malicious
+                ip_info = json.loads(ip_info)
+                # Set the evidence on this detection
+                self.set_evidence_malicious_ip(
+                    ip,
+                    uid,
+                    timestamp,
+                    ip_info,
+                    profileid,
+                    twid,
+                    ip_state,
+                )
+
+            # check if this ip belongs to any of our blacklisted ranges
+            if range_info := self.ip_ranges.lookup(ip):
+                # ip was found in one of the blacklisted ranges
+                ip_info = json.loads(range_info)
+                # Set the evidence on this detection
+                self.set_evidence_malicious_ip(
+                    ip,
+                    uid,
+                    timestamp,
+                    ip_info,
+                    profileid,
+                    twid,
+                    ip_state,
+                )
+        else:
+            # We were not given an IP. Check if we were given a domain
+
+            # Process any type of domain. Each connection will have only of of these each time
+            domain = (
+                data.get('host')
+                or data.get('server_name')
+                or data.get('query')
+            )
+            if domain and self.is_in_malicious_domains(domain):
+                # Search for this domain in our database of IoC
+                (
+                    domain_info,
+                    is_subdomain,
+                ) = __database__.search_Domain_in_IoC(domain)
+                if (
+                    domain_info != False
+                ):   # Dont change this condition. This is the only way it works
+                    # If the domain is in the blacklist of IoC. Set an evidence
+                    domain_info = json.loads(domain_info)
+                    self.set_evidence_domain(
+                        domain,
+                        uid,
+                        timestamp,
+                        domain_info,
+                        is_subdomain,
+                        profileid,
+                        twid,
+                    )
+
+                    # mark this domain as malicious in our database
+                    domain_info = {
+                        'threatintelligence': domain_info
+                    }
+                    __database__.setInfoForDomains(
+                        domain, domain_info
+                    )
+
+                    # add this domain to our MaliciousDomains hash in the database
+                    __database__.set_malicious_domain(
+                        domain, profileid, twid
+                    )
+
     def run(self):
         try:
             utils.drop_root_privs()
@@ -502,6 +707,12 @@ class Module(Module, multiprocessing.Process):
                 self.print(
                     f'Could not load the local TI files {self.path_to_local_threat_intelligence_data}'
                 )
+            # we're already subscribed to new_ip_ranges, so no range added after this is missed
+            self.ip_ranges.update(__database__.get_malicious_ip_ranges())
+            self.malicious_ips = self.build_bloom_filter(__database__.get_IPs_in_IoC())
+            self.malicious_domains = self.build_bloom_filter(
+                __database__.get_Domains_in_IoC()
+            )
         except Exception as inst:
             exception_line = sys.exc_info()[2].tb_lineno
             self.print(f'Problem on the run() line {exception_line}', 0, 1)
@@ -514,122 +725,10 @@ class Module(Module, multiprocessing.Process):
         # Main loop function
         while True:
             try:
-                message = self.c1.get_message(timeout=self.timeout)
-                # if timewindows are not updated for a long time
-                # (see at logsProcess.py), we will stop slips automatically.
-                if message and message['data'] == 'stop_process':
+                # wait for a msg in any of the channels and pass it to its handler
+                if not self.dispatcher.dispatch():
                     self.shutdown_gracefully()
                     return True
-
-                # Check that the message is for you.
-                # The channel now can receive an IP address or a domain name
-                if utils.is_msg_intended_for(
-                    message, 'give_threat_intelligence'
-                ):
-                    # Data is sent in the channel as a json dict so we need to deserialize it first
-                    data = json.loads(message['data'])
-                    # Extract data from dict
-                    profileid = data.get('profileid')
-                    twid = data.get('twid')
-                    timestamp = data.get('stime')
-                    uid = data.get('uid')
-                    protocol = data.get('proto')
-                    # IP is the IP that we want the TI for. It can be a SRC or DST IP
-                    ip = data.get('ip')
-                    # ip_state will say if it is a srcip or if it was a dst_ip
-                    ip_state = data.get('ip_state')
-                    # self.print(ip)
-
-                    # If given an IP, ask for it
-                    # Block only if the traffic isn't outgoing ICMP port unreachable packet
-                    if ip and not self.is_outgoing_icmp_packet(
-                        protocol, ip_state
-                    ):
-                        # Search for this IP in our database of IoC
-                        ip_info = __database__.search_IP_in_IoC(ip)
-                        # check if it's a blacklisted ip
-                        if (
-                            ip_info != False
-                        ):   # Dont change this condition. This is the only way it works
-                            # If the IP is in the blacklist of IoC. Add it as Malicious
-                            ip_info = json.loads(ip_info)
-                            # Set the evidence on this detection
-                            self.set_evidence_malicious_ip(
-                                ip,
-                                uid,
-                                timestamp,
-                                ip_info,
-                                profileid,
-                                twid,
-                                ip_state,
-                            )
-
-                        # check if this ip belongs to any of our blacklisted ranges
-                        ip_ranges = __database__.get_malicious_ip_ranges()
-                        try:
-                            for range, info in ip_ranges.items():
-                                if ipaddress.ip_address(
-                                    ip
-                                ) in ipaddress.ip_network(range):
-                                    # ip was found in one of the blacklisted ranges
-                                    ip_info = json.loads(info)
-                                    # Set the evidence on this detection
-                                    self.set_evidence_malicious_ip(
-                                        ip,
-                                        uid,
-                                        timestamp,
-                                        ip_info,
-                                        profileid,
-                                        twid,
-                                        ip_state,
-                                    )
-                                    break
-                        except AttributeError:
-                            # we don't have ip_ranges in our db
-                            pass
-                    else:
-                        # We were not given an IP. Check if we were given a domain
-
-                        # Process any type of domain. Each connection will have only of of these each time
-                        domain = (
-                            data.get('host')
-                            or data.get('server_name')
-                            or data.get('query')
-                        )
-                        if domain:
-                            # Search for this domain in our database of IoC
-                            (
-                                domain_info,
-                                is_subdomain,
-                            ) = __database__.search_Domain_in_IoC(domain)
-                            if (
-                                domain_info != False
-                            ):   # Dont change this condition. This is the only way it works
-                                # If the domain is in the blacklist of IoC. Set an evidence
-                                domain_info = json.loads(domain_info)
-                                self.set_evidence_domain(
-                                    domain,
-                                    uid,
-                                    timestamp,
-                                    domain_info,
-                                    is_subdomain,
-                                    profileid,
-                                    twid,
-                                )
-
-                                # mark this domain as malicious in our database
-                                domain_info = {
-                                    'threatintelligence': domain_info
-                                }
-                                __database__.setInfoForDomains(
-                                    domain, domain_info
-                                )
-
-                                # add this domain to our MaliciousDomains hash in the database
-                                __database__.set_malicious_domain(
-                                    domain, profileid, twid
-                                )
-
             except KeyboardInterrupt:
                 self.shutdown_gracefully()
                 return True
@@ -93,16 +93,15 @@ class Module(Module, multiprocessing.Process):
             )
         return str(timestamp)
 
-    def process_flow(self, profileid, twid, flow, timestamp: float):
+    def process_flow(self, profileid, twid, uid, flow_dict, timestamp: float):
         """
         Receives a flow and it process it for this profileid and twid so its printed by the logprocess later
+        :param flow_dict: the flow as a dict
         """
         timestamp_human = self.process_timestamp(timestamp)
 
         try:
             # Convert the common fields to something that can be interpreted
-            uid = next(iter(flow))
-            flow_dict = json.loads(flow[uid])
             profile_ip = profileid.split('_')[1]
             dur = round(float(flow_dict['dur']), 3)
             stime = flow_dict['ts']
@@ -469,19 +468,14 @@ class Module(Module, multiprocessing.Process):
                     return True
 
                 if utils.is_msg_intended_for(message, 'new_flow'):
-                    mdata = message['data']
-                    # Convert from json to dict
-                    mdata = json.loads(mdata)
-                    profileid = mdata['profileid']
-                    twid = mdata['twid']
-                    # Get flow as a json
-                    flow = mdata['flow']
-                    timestamp = mdata['stime']
-                    # Convert flow to a dict
-                    flow = json.loads(flow)
+                    mdata = utils.decode_flow_msg(message['data'])
                     # Process the flow
                     return_value = self.process_flow(
-                        profileid, twid, flow, timestamp
+                        mdata['profileid'],
+                        mdata['twid'],
+                        mdata['uid'],
+                        mdata['flow'],
+                        mdata['stime'],
                     )
             except KeyboardInterrupt:
                 self.shutdown_gracefully()
@@ -11,6 +11,7 @@ import requests
 import datetime
 import sys
 import asyncio
+import multiprocessing
 from datetime import datetime
 
 class UpdateFileManager:
@@ -31,6 +32,13 @@ class UpdateFileManager:
         self.today = time.time()
         # don't store iocs older than 1 week
         self.interval = 604800
+        # amount of IoCs of a feed that we keep in memory before storing them in the db
+        self.ioc_chunk_size = 10000
+        # amount of feeds that are parsed at the same time, each one in its own process
+        self.max_parallel_feeds = os.cpu_count() or 1
+        # held by the feed that is storing its IoCs, so the feeds parsed at the same time
+        # don't overwrite each other's IoCs, see store_iocs()
+        self.iocs_lock = multiprocessing.Lock()
         self.slips_logfile = __database__.get_stdfile("stdout")
 
     def read_configuration(self):
@@ -569,10 +577,11 @@ class UpdateFileManager:
         __database__.add_ssl_sha1_to_IoC(malicious_ssl_certs)
         return True
 
-    async def update_TI_file(self, link_to_download: str, response) -> bool:
+    def update_TI_file(self, link_to_download: str, response, e_tag: str) -> bool:
         """
         Update remote TI files and JA3 feeds by downloading and parsing them
         :param response: the output of a request done with requests library
+        :param e_tag: the e-tag of the downloaded file, stored in the db once the file is parsed
         """
         try:
             file_name_to_download = link_to_download.split('/')[-1]
@@ -583,7 +592,9 @@ class UpdateFileManager:
 
             # File is updated in the server and was in our database.
             # Delete previous IPs of this file.
-            self.__delete_old_source_data_from_database(file_name_to_download)
+            # TI feeds only add and remove the IoCs that changed, see update_feed_snapshot()
+            if link_to_download not in self.url_feeds:
+                self.__delete_old_source_data_from_database(file_name_to_download)
 
             # ja3 files and ti_files are parsed differently, check which file is this
             # is it ja3 feed?
@@ -614,10 +625,13 @@ class UpdateFileManager:
                     f'aborted.', 0, 1,
                 )
                 return False
+            if link_to_download in self.url_feeds:
+                # the profilers send the ips and domains they already sent to TI again
+                __database__.publish_ioc_updated(file_name_to_download)
             # Store the new etag and time of file in the database
             self.new_update_time = time.time()
             file_info = {
-                'e-tag': self.new_e_tag,
+                'e-tag': e_tag,
                 'time': self.new_update_time
             }
             __database__.set_TI_file_info(file_name_to_download, file_info)
@@ -640,6 +654,31 @@ class UpdateFileManager:
             self.print(str(inst), 0, 1)
             return False
 
+    def start_TI_file_update(self, link_to_download: str, response):
+        """
+        Parses the given feed in a child process so independent feeds are parsed in parallel
+        returns the started process, its exit code is 0 if the feed was updated successfully
+        """
+        # self.new_e_tag is overwritten by the next call to __check_if_update
+        process = multiprocessing.Process(
+            target=self.update_TI_file_in_process,
+            args=(link_to_download, response, self.new_e_tag),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def update_TI_file_in_process(self, link_to_download: str, response, e_tag: str):
+        """Target of the processes started by start_TI_file_update"""
+        # the child process can't increment self.loaded_ti_files of the parent
+        sys.exit(0 if self.update_TI_file(link_to_download, response, e_tag) else 1)
+
+    def wait_for_TI_file_update(self, process):
+        """Waits for a process started by start_TI_file_update to finish"""
+        process.join()
+        if process.exitcode == 0:
+            self.loaded_ti_files += 1
+
     def update_riskiq_feed(self):
         """Get and parse RiskIQ feed"""
         try:
@@ -678,6 +717,7 @@ class UpdateFileManager:
                 )
                 return False
 
+            __database__.publish_ioc_updated('riskiq_domains')
             # update the timestamp in the db
             malicious_file_info = {'time': time.time()}
             __database__.set_TI_file_info(
@@ -912,7 +952,10 @@ class UpdateFileManager:
         # the new threat_level is the max of the 2
         threat_level = self.url_feeds[link_to_download]['threat_level']
         filename = ti_file_path.split('/')[-1]
+        old_iocs = self.get_feed_snapshot(filename)
         malicious_domains_dict = {}
+        # all the IoCs of this feed
+        feed_iocs = set()
         pattern = "%Y-%m-%dT%H:%M:%S"
         with open(ti_file_path) as feed:
             self.print(
@@ -940,6 +983,9 @@ class UpdateFileManager:
                 domain = ioc['DomainAddress']
                 if not validators.domain(domain):
                     continue
+                if len(malicious_domains_dict) >= self.ioc_chunk_size:
+                    feed_iocs.update(malicious_domains_dict)
+                    self.store_iocs({}, malicious_domains_dict, {}, {})
                 malicious_domains_dict[domain] = json.dumps(
                     {
                         'description': '',
@@ -949,15 +995,119 @@ class UpdateFileManager:
                     }
                 )
             # Add all loaded malicious domains to the database
-            __database__.add_domains_to_IoC(malicious_domains_dict)
+            feed_iocs.update(malicious_domains_dict)
+            self.store_iocs({}, malicious_domains_dict, {}, {})
+            self.update_feed_snapshot(filename, old_iocs, feed_iocs)
             return True
 
+    def get_feed_snapshot(self, feed: str) -> set:
+        """
+        Returns the IoCs the given feed had the last time it was updated.
+        If there's no snapshot of the feed, all its IoCs are deleted instead,
+        so they're re-added while parsing it
+        :param feed: a valid filename not a feed url
+        """
+        old_iocs = __database__.get_TI_feed_snapshot(feed)
+        if not old_iocs:
+            self.__delete_old_source_data_from_database(feed)
+        return old_iocs
+
+    def update_feed_snapshot(self, feed: str, old_iocs: set, feed_iocs: set):
+        """
+        Deletes the IoCs that the given feed had in its last update and doesn't have anymore,
+        and stores its current IoCs as its snapshot
+        :param old_iocs: the snapshot returned by get_feed_snapshot() before parsing the feed
+        :param feed_iocs: all the IoCs the feed has now
+        """
+        removed_iocs = {'ip': [], 'domain': [], 'ip_range': []}
+        for ioc in old_iocs - feed_iocs:
+            if ioc_type := self.detect_data_type(ioc):
+                removed_iocs[ioc_type].append(ioc)
+
+        delete_functions = {
+            'ip': __database__.delete_ips_from_IoC_ips,
+            'domain': __database__.delete_domains_from_IoC_domains,
+            'ip_range': __database__.delete_ip_ranges_from_IoC_ip_ranges,
+        }
+        for ioc_type, iocs in removed_iocs.items():
+            if not iocs:
+                continue
+            # don't delete the iocs that another feed added after this one
+            iocs_info = __database__.get_IoCs_info(iocs, ioc_type)
+            iocs = [
+                ioc
+                for ioc, ioc_info in zip(iocs, iocs_info)
+                if ioc_info and json.loads(ioc_info)['source'] == feed
+            ]
+            if iocs:
+                delete_functions[ioc_type](iocs)
+
+        __database__.set_TI_feed_snapshot(feed, feed_iocs)
+
+    def store_iocs(
+            self,
+            malicious_ips_dict: dict,
+            malicious_domains_dict: dict,
+            malicious_ip_ranges: dict,
+            ips_threat_levels: dict,
+    ):
+        """
+        Stores a chunk of the IoCs read by parse_ti_feed in the database and empties the given dicts.
+        IoCs that we already have with the same info aren't written again.
+        An IoC that is in more than 1 feed is stored with the info of the last of them in ti_files,
+        no matter which feed is parsed first
+        :param ips_threat_levels: {ip: threat_level} of the new ips, used for their score and confidence
+        """
+        # position of each feed in ti_files
+        feeds_order = {
+            url.split('/')[-1]: position
+            for position, url in enumerate(self.url_feeds)
+        }
+        # the feeds are parsed in parallel, the info of the IoCs can't change
+        # between checking and writing them
+        with self.iocs_lock:
+            for ioc_type, iocs in (
+                ('ip', malicious_ips_dict),
+                ('domain', malicious_domains_dict),
+                ('ip_range', malicious_ip_ranges),
+            ):
+                if not iocs:
+                    continue
+                iocs_info = __database__.get_IoCs_info(list(iocs), ioc_type)
+                for (ioc, ioc_info), stored_info in zip(list(iocs.items()), iocs_info):
+                    if ioc_info == stored_info:
+                        # this ioc didn't change since the last update of the feed
+                        del iocs[ioc]
+                        ips_threat_levels.pop(ioc, None)
+                    elif stored_info and feeds_order.get(
+                        json.loads(stored_info)['source'], -1
+                    ) > feeds_order.get(json.loads(ioc_info)['source'], -1):
+                        # a feed that comes after this one in ti_files has this ioc
+                        del iocs[ioc]
+                        ips_threat_levels.pop(ioc, None)
+
+            # Add all loaded malicious ips to the database
+            __database__.add_ips_to_IoC(malicious_ips_dict)
+            # Add all loaded malicious domains to the database
+            __database__.add_domains_to_IoC(malicious_domains_dict)
+            __database__.add_ip_range_to_IoC(malicious_ip_ranges)
+        # set the score and confidence of the ips = the same as the ones given in slips.conf
+        # todo for now the confidence is 1
+        __database__.set_score_confidence_of_ips(ips_threat_levels, 1)
+        for iocs in (
+            malicious_ips_dict,
+            malicious_domains_dict,
+            malicious_ip_ranges,
+            ips_threat_levels,
+        ):
+            iocs.clear()
+
     def parse_ti_feed(
             self, link_to_download, malicious_data_path: str
     ) -> bool:
         """
-        Read all the files holding IP addresses and a description and put the
-        info in a large dict.
+        Read all the files holding IP addresses and a description and store the
+        info in the db in chunks of self.ioc_chunk_size IoCs.
         This also helps in having unique ioc across files
         :param link_to_download: this link that has the IOCs we're currently parsing, used for getting the threat_level
         :param malicious_data_path: this is the path where the saved file from the link is downloaded
@@ -970,9 +1120,16 @@ class UpdateFileManager:
             if filesize == 0:
                 return False
 
+            # the IoCs are stored in the db in chunks of self.ioc_chunk_size IoCs
+            # instead of keeping every IoC of the feed in memory
             malicious_ips_dict = {}
             malicious_domains_dict = {}
             malicious_ip_ranges = {}
+            # {ip: threat_level} of the ips in the current chunk
+            ips_threat_levels = {}
+            # IoCs of previous chunks, to ignore them if they appear again in this feed
+            stored_iocs = set()
+            feed_name = malicious_data_path.split('/')[-1]
             with open(malicious_data_path) as feed:
                 self.print(
                     f'Reading next lines in the file {malicious_data_path} '
@@ -984,6 +1141,7 @@ class UpdateFileManager:
                         link_to_download, malicious_data_path
                     )
                     return True
+                old_iocs = self.get_feed_snapshot(feed_name)
 
                 # Remove comments and find the description column if possible
                 description_column = None
@@ -1106,6 +1264,21 @@ class UpdateFileManager:
                 feed.seek(current_file_position)
 
                 for line in feed:
+                    if (
+                        len(malicious_ips_dict)
+                        + len(malicious_domains_dict)
+                        + len(malicious_ip_ranges)
+                        >= self.ioc_chunk_size
+                    ):
+                        stored_iocs.update(malicious_ips_dict)
+                        stored_iocs.update(malicious_domains_dict)
+                        stored_iocs.update(malicious_ip_ranges)
+                        self.store_iocs(
+                            malicious_ips_dict,
+                            malicious_domains_dict,
+                            malicious_ip_ranges,
+                            ips_threat_levels,
+                        )
                     # The format of the file should be
                     # "0", "103.15.53.231","90", "Karel from our village. He is bad guy."
                     # So the second column will be used as important data with
@@ -1174,6 +1347,9 @@ class UpdateFileManager:
                             ), 0, 1,
                         )
                         continue
+                    if data in stored_iocs:
+                        # the ioc appeared twice in this feed
+                        continue
                     if data_type == 'domain':
                         try:
                             # we already have info about this domain?
@@ -1283,11 +1459,8 @@ class UpdateFileManager:
                                     ],
                                 }
                             )
-                            # set the score and confidence of this ip = the same as the ones given in slips.conf
-                            # todo for now the confidence is 1
-                            __database__.set_score_confidence(
-                                data, threat_level, 1
-                            )
+                            # the score and confidence of this ip are set when the chunk is stored
+                            ips_threat_levels[str(data)] = threat_level
 
                     elif data_type == 'ip_range':
                         # make sure we're not blacklisting a private or multicast ip range
@@ -1355,11 +1528,17 @@ class UpdateFileManager:
                                     ],
                                 }
                             )
-            # Add all loaded malicious ips to the database
-            __database__.add_ips_to_IoC(malicious_ips_dict)
-            # Add all loaded malicious domains to the database
-            __database__.add_domains_to_IoC(malicious_domains_dict)
-            __database__.add_ip_range_to_IoC(malicious_ip_ranges)
+            # Add the IoCs of the last chunk to the database
+            stored_iocs.update(malicious_ips_dict)
+            stored_iocs.update(malicious_domains_dict)
+            stored_iocs.update(malicious_ip_ranges)
+            self.store_iocs(
+                malicious_ips_dict,
+                malicious_domains_dict,
+                malicious_ip_ranges,
+                ips_threat_levels,
+            )
+            self.update_feed_snapshot(feed_name, old_iocs, stored_iocs)
             return True
 
         except Exception as inst:
@@ -1417,6 +1596,8 @@ class UpdateFileManager:
             files_to_download_dics.update(self.ja3_feeds)
             files_to_download_dics.update(self.ssl_feeds)
 
+            # processes that are parsing a feed
+            feed_updates = []
             for file_to_download in files_to_download_dics.keys():
                 file_to_download = file_to_download.strip()
                 file_to_download = self.sanitize(file_to_download)
@@ -1431,11 +1612,11 @@ class UpdateFileManager:
                 self.log(
                     f'Downloading the remote file {file_to_download}'
                 )
-                # every function call to update_TI_file is now running concurrently instead of serially
-                # so when a server's taking a while to give us the TI feed, we proceed
-                # to download the next file instead of being idle
-                task = asyncio.create_task(
-                    self.update_TI_file(file_to_download, response)
+                # every feed is parsed in its own process while we download the next one
+                if len(feed_updates) >= self.max_parallel_feeds:
+                    self.wait_for_TI_file_update(feed_updates.pop(0))
+                feed_updates.append(
+                    self.start_TI_file_update(file_to_download, response)
                 )
 
             ############### Update RiskIQ domains ################
@@ -1453,11 +1634,8 @@ class UpdateFileManager:
                     self.log(f'An error occurred while updating RiskIQ domains. Updating was aborted.')
 
             # wait for all TI files to update
-            try:
-                await task
-            except UnboundLocalError:
-                # in case all our files are updated, we don't have task defined, skip
-                pass
+            for process in feed_updates:
+                self.wait_for_TI_file_update(process)
 
             self.print(f'{self.loaded_ti_files} TI files successfully loaded.')
         except KeyboardInterrupt:
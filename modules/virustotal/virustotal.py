@@ -1,6 +1,6 @@
 # Must imports
 import configparser
-from slips_files.common.abstracts import Module
+from slips_files.common.abstracts import Module, ChannelsDispatcher
 import multiprocessing
 from slips_files.core.database import __database__
 from slips_files.common.slips_utils import utils
@@ -36,10 +36,14 @@ class Module(Module, multiprocessing.Process):
         # This line might not be needed when running SLIPS, but when VT module is run standalone, it still uses the
         # database and this line is necessary. Do not delete it, instead move it to line 21.
         __database__.start(self.config, redis_port)
-        self.c1 = __database__.subscribe('new_flow')
-        self.c2 = __database__.subscribe('new_dns_flow')
-        self.c3 = __database__.subscribe('new_url')
-        self.c4 = __database__.subscribe('new_downloaded_file')
+        self.dispatcher = ChannelsDispatcher(
+            {
+                'new_flow': self.handle_new_flow,
+                'new_dns_flow': self.handle_new_dns_flow,
+                'new_url': self.handle_new_url,
+                'new_downloaded_file': self.handle_new_downloaded_file,
+            }
+        )
 
         # Read the conf file
         self.__read_configuration()
@@ -63,7 +67,6 @@ class Module(Module, multiprocessing.Process):
         self.http = urllib3.PoolManager(
             cert_reqs='CERT_REQUIRED', ca_certs=certifi.where()
         )
-        self.timeout = 0.0000001
         self.counter = 0
         # create the queue thread
         self.api_calls_thread = threading.Thread(
@@ -647,6 +650,94 @@ class Module(Module, multiprocessing.Process):
         # Confirm that the module is done processing
         __database__.publish('finished_modules', self.name)
 
+    def handle_new_flow(self, message):
+        """Asks VT about the daddr of the flow if it is not cached or it is outdated"""
+        data = utils.decode_flow_msg(message['data'])
+        flow_data = data['flow']
+        ip = flow_data['daddr']
+        cached_data = __database__.getIPData(ip)
+        if not cached_data:
+            cached_data = {}
+
+        # return an IPv4Address or IPv6Address object depending on the IP address passed as argument.
+        ip_addr = ipaddress.ip_address(ip)
+        # if VT data of this IP (not multicast) is not in the IPInfo, ask VT.
+        # if the IP is not a multicast and 'VirusTotal' key is not in the IPInfo, proceed.
+        if (
+            'VirusTotal' not in cached_data
+            and not ip_addr.is_multicast
+            and not ip_addr.is_private
+        ):
+            self.set_vt_data_in_IPInfo(ip, cached_data)
+
+        # if VT data of this IP is in the IPInfo, check the timestamp.
+        elif 'VirusTotal' in cached_data:
+            # If VT is in data, check timestamp. Take time difference, if not valid, update vt scores.
+            if (
+                time.time()
+                - cached_data['VirusTotal']['timestamp']
+            ) > self.update_period:
+                self.set_vt_data_in_IPInfo(ip, cached_data)
+
+    def handle_new_dns_flow(self, message):
+        """Asks VT about the queried domain if it is not cached or it is outdated"""
+        data = message['data']
+        data = json.loads(data)
+        # profileid = data['profileid']
+        # twid = data['twid']
+        # uid = data['uid']
+        flow_data = json.loads(
+            data['flow']
+        )   # this is a dict {'uid':json flow data}
+        domain = flow_data.get('query', False)
+
+        cached_data = __database__.getDomainData(domain)
+        # If VT data of this domain is not in the DomainInfo, ask VT
+        # If 'Virustotal' key is not in the DomainInfo
+        if domain and (
+            not cached_data or 'VirusTotal' not in cached_data
+        ):
+            self.set_domain_data_in_DomainInfo(domain, cached_data)
+        elif (
+            domain and cached_data and 'VirusTotal' in cached_data
+        ):
+            # If VT is in data, check timestamp. Take time difference, if not valid, update vt scores.
+            if (
+                time.time()
+                - cached_data['VirusTotal']['timestamp']
+            ) > self.update_period:
+                self.set_domain_data_in_DomainInfo(
+                    domain, cached_data
+                )
+
+    def handle_new_url(self, message):
+        """Asks VT about the url if it is not cached or it is outdated"""
+        data = message['data']
+        data = json.loads(data)
+        # profileid = data['profileid']
+        # twid = data['twid']
+        flow_data = json.loads(data['flow'])
+        url = flow_data['host'] + flow_data.get('uri', '')
+        cached_data = __database__.getURLData(url)
+        # If VT data of this domain is not in the DomainInfo, ask VT
+        # If 'Virustotal' key is not in the DomainInfo
+        if not cached_data or 'VirusTotal' not in cached_data:
+            # cached data is either False or {}
+            self.set_url_data_in_URLInfo(url, cached_data)
+        elif cached_data and 'VirusTotal' in cached_data:
+            # If VT is in data, check timestamp. Take time difference, if not valid, update vt scores.
+            if (
+                time.time()
+                - cached_data['VirusTotal']['timestamp']
+            ) > self.update_period:
+                self.set_url_data_in_URLInfo(url, cached_data)
+
+    def handle_new_downloaded_file(self, message):
+        """Asks VT about the downloaded file"""
+        self.file_info = json.loads(message['data'])
+        file_info = self.file_info.copy()
+        self.scan_file(file_info)
+
     def run(self):
         utils.drop_root_privs()
         try:
@@ -668,121 +759,10 @@ class Module(Module, multiprocessing.Process):
         # Main loop function
         while True:
             try:
-                message = self.c1.get_message(timeout=self.timeout)
-
-                # if timewindows are not updated for a long time, Slips is stopped automatically.
                 # exit module if there's a problem with the API key
-                if (
-                    message and message['data'] == 'stop_process'
-                ) or self.incorrect_API_key:
-                    self.shutdown_gracefully()
-                    return True
-
-                if utils.is_msg_intended_for(message, 'new_flow'):
-                    data = message['data']
-                    data = json.loads(data)
-                    # profileid = data['profileid']
-                    # twid = data['twid']
-                    # stime = data['stime']
-                    flow = json.loads(
-                        data['flow']
-                    )   # this is a dict {'uid':json flow data}
-                    # there is only one pair key-value in the dictionary
-                    for key, value in flow.items():
-                        flow_data = json.loads(value)
-                    ip = flow_data['daddr']
-                    cached_data = __database__.getIPData(ip)
-                    if not cached_data:
-                        cached_data = {}
-
-                    # return an IPv4Address or IPv6Address object depending on the IP address passed as argument.
-                    ip_addr = ipaddress.ip_address(ip)
-                    # if VT data of this IP (not multicast) is not in the IPInfo, ask VT.
-                    # if the IP is not a multicast and 'VirusTotal' key is not in the IPInfo, proceed.
-                    if (
-                        'VirusTotal' not in cached_data
-                        and not ip_addr.is_multicast
-                        and not ip_addr.is_private
-                    ):
-                        self.set_vt_data_in_IPInfo(ip, cached_data)
-
-                    # if VT data of this IP is in the IPInfo, check the timestamp.
-                    elif 'VirusTotal' in cached_data:
-                        # If VT is in data, check timestamp. Take time difference, if not valid, update vt scores.
-                        if (
-                            time.time()
-                            - cached_data['VirusTotal']['timestamp']
-                        ) > self.update_period:
-                            self.set_vt_data_in_IPInfo(ip, cached_data)
-
-                message = self.c2.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_dns_flow'):
-                    data = message['data']
-                    data = json.loads(data)
-                    # profileid = data['profileid']
-                    # twid = data['twid']
-                    # uid = data['uid']
-                    flow_data = json.loads(
-                        data['flow']
-                    )   # this is a dict {'uid':json flow data}
-                    domain = flow_data.get('query', False)
-
-                    cached_data = __database__.getDomainData(domain)
-                    # If VT data of this domain is not in the DomainInfo, ask VT
-                    # If 'Virustotal' key is not in the DomainInfo
-                    if domain and (
-                        not cached_data or 'VirusTotal' not in cached_data
-                    ):
-                        self.set_domain_data_in_DomainInfo(domain, cached_data)
-                    elif (
-                        domain and cached_data and 'VirusTotal' in cached_data
-                    ):
-                        # If VT is in data, check timestamp. Take time difference, if not valid, update vt scores.
-                        if (
-                            time.time()
-                            - cached_data['VirusTotal']['timestamp']
-                        ) > self.update_period:
-                            self.set_domain_data_in_DomainInfo(
-                                domain, cached_data
-                            )
-
-                message = self.c3.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
+                if self.incorrect_API_key or not self.dispatcher.dispatch():
                     self.shutdown_gracefully()
                     return True
-                if utils.is_msg_intended_for(message, 'new_url'):
-                    data = message['data']
-                    data = json.loads(data)
-                    # profileid = data['profileid']
-                    # twid = data['twid']
-                    flow_data = json.loads(data['flow'])
-                    url = flow_data['host'] + flow_data.get('uri', '')
-                    cached_data = __database__.getURLData(url)
-                    # If VT data of this domain is not in the DomainInfo, ask VT
-                    # If 'Virustotal' key is not in the DomainInfo
-                    if not cached_data or 'VirusTotal' not in cached_data:
-                        # cached data is either False or {}
-                        self.set_url_data_in_URLInfo(url, cached_data)
-                    elif cached_data and 'VirusTotal' in cached_data:
-                        # If VT is in data, check timestamp. Take time difference, if not valid, update vt scores.
-                        if (
-                            time.time()
-                            - cached_data['VirusTotal']['timestamp']
-                        ) > self.update_period:
-                            self.set_url_data_in_URLInfo(url, cached_data)
-
-                message = self.c4.get_message(timeout=self.timeout)
-                if message and message['data'] == 'stop_process':
-                    self.shutdown_gracefully()
-                    return True
-                if utils.is_msg_intended_for(message, 'new_downloaded_file'):
-                    self.file_info = json.loads(message['data'])
-                    file_info = self.file_info.copy()
-                    self.scan_file(file_info)
-
             except KeyboardInterrupt:
                 self.shutdown_gracefully()
                 return True
@@ -383,9 +383,12 @@ class Main:
             slips_processes = len(list(PIDs.keys()))
 
             # Send manual stops to the processes not using channels
+            profiler_workers = [
+                process for process in PIDs if process.startswith('ProfilerProcess')
+            ]
             for process in (
                 'OutputProcess',
-                'ProfilerProcess',
+                *profiler_workers,
                 'EvidenceProcess',
                 'InputProcess',
                 'logsProcess',
@@ -504,6 +507,8 @@ class Main:
                     print(
                         f'\t\033[1;32;40m{unstopped_proc}\033[00m \tAlready stopped.'
                     )
+            # all the modules and profilers stopped, remove the ring buffers of the flows from /dev/shm
+            __database__.delete_flow_ring_buffers()
 
             # save redis database if '-s' is specified
             if self.args.save:
@@ -1393,6 +1398,10 @@ class Main:
                 f'Started output thread [PID {output_process.pid}]', 1, 0
             )
 
+            if __database__.flows_transport == 'shared_memory':
+                # the modules and profilers attach to them when they start
+                __database__.create_flow_ring_buffers()
+
             # Start each module in the folder modules
             self.print('Starting modules', 0, 1)
 
@@ -1481,25 +1490,46 @@ class Main:
             __database__.store_process_PID('slips.py', int(self.pid))
 
             # Profile thread
-            # Create the queue for the profile thread
-            profilerProcessQueue = Queue()
-            # Create the profile thread and start it
-            profiler_process = ProfilerProcess(
-                profilerProcessQueue,
-                self.outputqueue,
-                self.args.verbose,
-                self.args.debug,
-                self.config,
-                redis_port,
-            )
-            profiler_process.start()
-            self.print(
-                f'Started Profiler Process '
-                f'[PID {profiler_process.pid}]', 1, 0
-            )
-            __database__.store_process_PID(
-                'ProfilerProcess', int(profiler_process.pid)
-            )
+            # the profiles are split between profiler_workers processes,
+            # each one has its own queue
+            try:
+                profiler_workers = int(
+                    self.read_configuration(
+                        self.config, 'parameters', 'profiler_workers'
+                    )
+                )
+            except (TypeError, ValueError):
+                profiler_workers = 1
+            profiler_workers = max(profiler_workers, 1)
+            if profiler_workers > __database__.profiler_workers:
+                self.print(
+                    'profiler_workers > 1 is not supported with analysis_direction = all. '
+                    'Using 1 profiler.', 0, 1
+                )
+                profiler_workers = __database__.profiler_workers
+            profiler_queues = []
+            for worker_id in range(profiler_workers):
+                # Create the queue for the profile thread
+                profilerProcessQueue = Queue()
+                profiler_queues.append(profilerProcessQueue)
+                # Create the profile thread and start it
+                profiler_process = ProfilerProcess(
+                    profilerProcessQueue,
+                    self.outputqueue,
+                    self.args.verbose,
+                    self.args.debug,
+                    self.config,
+                    redis_port,
+                    worker_id=worker_id,
+                )
+                profiler_process.start()
+                self.print(
+                    f'Started Profiler Process '
+                    f'[PID {profiler_process.pid}]', 1, 0
+                )
+                __database__.store_process_PID(
+                    profiler_process.process_name, int(profiler_process.pid)
+                )
 
             self.c1 = __database__.subscribe('finished_modules')
 
@@ -1507,7 +1537,7 @@ class Main:
             # Create the input process and start it
             inputProcess = InputProcess(
                 self.outputqueue,
-                profilerProcessQueue,
+                profiler_queues,
                 self.input_type,
                 self.input_information,
                 self.config,
@@ -1,4 +1,6 @@
 # File containing some abstract definitions for slips
+from slips_files.core.database import __database__
+from slips_files.common.slips_utils import utils
 
 
 # This is the abstract Module class to check against. Do not modify
@@ -22,3 +24,36 @@ class Module(object):
             print('test')
         except ArgumentErrorCallback as e:
             print('error')
+
+
+class ChannelsDispatcher(object):
+    """
+    Receives the msgs of all the channels of a module using one pubsub
+    and passes each one to the handler of its channel.
+    The module blocks until there's a msg in any of its channels instead of
+    polling every channel with a tiny timeout
+    """
+
+    def __init__(self, handlers: dict):
+        """
+        :param handlers: {channel: function that receives the msgs of this channel}
+        """
+        self.handlers = handlers
+        self.pubsub = __database__.subscribe_to_channels(list(handlers))
+
+    def dispatch(self, timeout: float = 1) -> bool:
+        """
+        Waits up to timeout seconds for a msg and passes it to its handler
+        returns False when slips asks the module to stop
+        """
+        message = self.pubsub.get_message(timeout=timeout)
+        if not message:
+            return True
+        if message['data'] == 'stop_process':
+            return False
+        channel = message['channel']
+        if channel in self.handlers and utils.is_msg_intended_for(
+            message, channel
+        ):
+            self.handlers[channel](message)
+        return True
@@ -0,0 +1,51 @@
+import hashlib
+import math
+
+
+class BloomFilter(object):
+    """
+    Set of strings that may have false positives but never false negatives,
+    using about 10 bits per item for a 1% false positive rate instead of storing the items.
+    Items can't be removed, so it should be rebuilt when it's full or when many items were removed
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = math.ceil(
+            -self.capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray(math.ceil(self.size / 8))
+        # amount of items added
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def is_full(self) -> bool:
+        """After this many items the false positive rate is higher than the one given"""
+        return self.count > self.capacity
+
+    def get_positions(self, item: str):
+        """Returns the positions of the bits of the given item using double hashing"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self.get_positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for position in self.get_positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
@@ -0,0 +1,133 @@
+import json
+
+
+# (key stored in the db, column of the flow) of each field of the flows in the order they're stored.
+# fields without a column aren't part of the parsed flow, they're given to flow_to_db_json()
+netflow_db_fields = (
+    ('ts', None),
+    ('dur', 'dur'),
+    ('saddr', 'saddr'),
+    ('sport', 'sport'),
+    ('daddr', 'daddr'),
+    ('dport', 'dport'),
+    ('proto', 'proto'),
+    ('origstate', 'state'),
+    ('state', None),
+    ('pkts', 'pkts'),
+    ('allbytes', 'bytes'),
+    ('spkts', 'spkts'),
+    ('sbytes', 'sbytes'),
+    ('appproto', 'appproto'),
+    ('label', None),
+    ('flow_type', 'type'),
+    ('module_labels', None),
+)
+dns_db_fields = (
+    ('uid', 'uid'),
+    ('type', 'type'),
+    ('query', 'query'),
+    ('qclass_name', 'qclass_name'),
+    ('qtype_name', 'qtype_name'),
+    ('rcode_name', 'rcode_name'),
+    ('answers', 'answers'),
+    ('ttls', 'TTLs'),
+    ('stime', None),
+)
+http_db_fields = (
+    ('uid', 'uid'),
+    ('type', 'type'),
+    ('method', 'method'),
+    ('host', 'host'),
+    ('uri', 'uri'),
+    ('version', 'httpversion'),
+    ('user_agent', 'user_agent'),
+    ('request_body_len', 'request_body_len'),
+    ('response_body_len', 'response_body_len'),
+    ('status_code', 'status_code'),
+    ('status_msg', 'status_msg'),
+    ('resp_mime_types', 'resp_mime_types'),
+    ('resp_fuids', 'resp_fuids'),
+    ('stime', None),
+)
+ssl_db_fields = (
+    ('uid', 'uid'),
+    ('type', 'type'),
+    ('version', 'sslversion'),
+    ('cipher', 'cipher'),
+    ('resumed', 'resumed'),
+    ('established', 'established'),
+    ('cert_chain_fuids', 'cert_chain_fuids'),
+    ('client_cert_chain_fuids', 'client_cert_chain_fuids'),
+    ('subject', 'subject'),
+    ('issuer', 'issuer'),
+    ('validation_status', 'validation_status'),
+    ('curve', 'curve'),
+    ('server_name', 'server_name'),
+    ('daddr', 'daddr'),
+    ('dport', 'dport'),
+    ('stime', None),
+    ('ja3', 'ja3'),
+    ('ja3s', 'ja3s'),
+    ('is_DoH', 'is_DoH'),
+)
+ssh_db_fields = (
+    ('uid', 'uid'),
+    ('type', 'type'),
+    ('version', 'version'),
+    ('auth_attempts', 'auth_attempts'),
+    ('auth_success', 'auth_success'),
+    ('client', 'client'),
+    ('server', 'server'),
+    ('cipher_alg', 'cipher_alg'),
+    ('mac_alg', 'mac_alg'),
+    ('compression_alg', 'compression_alg'),
+    ('kex_alg', 'kex_alg'),
+    ('host_key_alg', 'host_key_alg'),
+    ('host_key', 'host_key'),
+    ('stime', None),
+)
+notice_db_fields = (
+    ('type', 'type'),
+    ('daddr', 'daddr'),
+    ('sport', 'sport'),
+    ('dport', 'dport'),
+    ('note', 'note'),
+    ('msg', 'msg'),
+    ('scanned_port', 'scanned_port'),
+    ('scanning_ip', 'scanning_ip'),
+    ('stime', None),
+)
+
+
+# the fields stored in the db for each type of flow, arp flows are stored like netflows
+db_fields = {
+    'conn': netflow_db_fields,
+    'flow': netflow_db_fields,
+    'argus': netflow_db_fields,
+    'nfdump': netflow_db_fields,
+    'arp': netflow_db_fields,
+    'dns': dns_db_fields,
+    'http': http_db_fields,
+    'ssl': ssl_db_fields,
+    'ssh': ssh_db_fields,
+    'notice': notice_db_fields,
+}
+
+
+def flow_to_db_json(flow: dict, **fields) -> str:
+    """
+    Returns the json of a flow parsed by the profiler in the format it's stored in the db
+    and published to the modules. It's the only place where the flows are serialized for that
+    :param flow: the column_values dict of the profiler
+    :param fields: values stored instead of the ones of the flow, by their key in the db.
+        used for the fields that aren't columns of the flow, like the ts or the label
+    """
+    stored = {}
+    for key, column in db_fields[flow['type']]:
+        if key in fields:
+            stored[key] = fields[key]
+        elif column:
+            stored[key] = flow.get(column, '')
+        else:
+            stored[key] = ''
+    return json.dumps(stored)
@@ -0,0 +1,315 @@
+import struct
+import time
+from multiprocessing import shared_memory, current_process
+
+
+class FlowRingBuffer(object):
+    """
+    Ring buffer of str messages in shared memory, written by one process and read by many.
+    Used to send the flows from a profiler to the modules without going through redis.
+
+    The shared memory starts with the write position, followed by one slot per reader
+    with its read position, and then the messages, each one stored as its length followed by its bytes.
+    Positions are the amount of bytes written or read since the start,
+    so the offset of a position in the buffer is position % capacity.
+    The writer never overwrites messages that an active reader didn't read yet,
+    it waits for them to read, readers that don't read anything for max_wait seconds are deactivated
+    and skip the messages they lost the next time they read.
+    """
+
+    max_readers = 64
+    # the header stores 8 bytes ints. positions are stored twice, the second copy is written
+    # after the first one, so a process that reads both and finds them equal knows the value isn't half written
+    position_size = 16
+    # active, read position, read position
+    reader_slot_size = 24
+    length = struct.Struct('<I')
+
+    def __init__(self, name: str, size: int = 0, create: bool = False, max_wait: float = 10):
+        """
+        :param name: name of the shared memory, the same for the writer and the readers
+        :param size: size of the buffer in bytes, only used when creating it
+        :param create: True to create the shared memory, False to attach to an existing one
+        :param max_wait: seconds to wait for a reader that doesn't read before deactivating it
+        """
+        self.header_size = (
+            self.position_size + self.max_readers * self.reader_slot_size
+        )
+        if create:
+            self.shm = shared_memory.SharedMemory(
+                name=name, create=True, size=self.header_size + size
+            )
+            self.shm.buf[: self.header_size] = bytes(self.header_size)
+        else:
+            # all slips processes share the resource tracker of slips.py,
+            # so attaching doesn't make it unlink the memory when this process exits
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = name
+        self.buf = self.shm.buf
+        self.capacity = self.shm.size - self.header_size
+        self.max_wait = max_wait
+        # the writer can write up to this position without checking the readers again
+        self.writable_until = 0
+
+    def get_int(self, offset: int) -> int:
+        return int.from_bytes(self.buf[offset : offset + 8], 'little')
+
+    def set_int(self, offset: int, value: int):
+        # struct.pack_into() zeroes the bytes before writing them, so other
+        # processes could read a 0, copying the bytes doesn't
+        self.buf[offset : offset + 8] = value.to_bytes(8, 'little')
+
+    def read_position(self, offset: int) -> int:
+        """Reads a position stored twice at the given offset of the header"""
+        while True:
+            second = self.get_int(offset + 8)
+            first = self.get_int(offset)
+            if first == second:
+                return first
+
+    def write_position(self, offset: int, position: int):
+        """Stores a position twice at the given offset of the header"""
+        self.set_int(offset, position)
+        self.set_int(offset + 8, position)
+
+    def get_write_position(self) -> int:
+        return self.read_position(0)
+
+    def get_slot_offset(self, slot: int) -> int:
+        return self.position_size + slot * self.reader_slot_size
+
+    def get_reader(self, slot: int):
+        """
+        Returns (active, read position) of the reader in the given slot
+        """
+        offset = self.get_slot_offset(slot)
+        return self.get_int(offset), self.read_position(offset + 8)
+
+    def set_reader(self, slot: int, active: bool, position: int):
+        offset = self.get_slot_offset(slot)
+        self.set_int(offset, int(active))
+        self.write_position(offset + 8, position)
+
+    def deactivate_reader(self, slot: int):
+        """The writer stops waiting for this reader, its position is left as it is"""
+        self.set_int(self.get_slot_offset(slot), 0)
+
+    def copy_to(self, position: int, data: bytes):
+        """Copies the given bytes to the buffer starting at the given position, wrapping around the end"""
+        offset = position % self.capacity
+        first_part = min(len(data), self.capacity - offset)
+        start = self.header_size + offset
+        self.buf[start : start + first_part] = data[:first_part]
+        if first_part < len(data):
+            start = self.header_size
+            self.buf[start : start + len(data) - first_part] = data[first_part:]
+
+    def copy_from(self, position: int, size: int) -> bytes:
+        """Returns size bytes of the buffer starting at the given position, wrapping around the end"""
+        offset = position % self.capacity
+        first_part = min(size, self.capacity - offset)
+        start = self.header_size + offset
+        data = bytes(self.buf[start : start + first_part])
+        if first_part < size:
+            start = self.header_size
+            data += bytes(self.buf[start : start + size - first_part])
+        return data
+
+    def get_slowest_reader(self):
+        """
+        Returns the slot and read position of the active reader that has read less,
+        or (None, None) if there are no active readers
+        """
+        slowest, slowest_position = None, None
+        for slot in range(self.max_readers):
+            active, read_position = self.get_reader(slot)
+            if active and (
+                slowest_position is None or read_position < slowest_position
+            ):
+                slowest, slowest_position = slot, read_position
+        return slowest, slowest_position
+
+    def wait_for_space(self, write_position: int, size: int):
+        """
+        Waits until all the active readers have read enough for size bytes to fit in the buffer
+        """
+        if write_position + size <= self.writable_until:
+            # the readers had already read enough the last time we checked
+            return
+        # read position of the slowest reader the last time it read something
+        last_position, since = None, time.time()
+        while True:
+            slowest, read_position = self.get_slowest_reader()
+            if slowest is None:
+                self.writable_until = write_position + self.capacity
+            else:
+                self.writable_until = read_position + self.capacity
+            if write_position + size <= self.writable_until:
+                return
+
+            if read_position != last_position:
+                # it's reading, keep waiting for it
+                last_position, since = read_position, time.time()
+            elif time.time() - since > self.max_wait:
+                # the reader is stuck or dead, stop waiting for it
+                self.deactivate_reader(slowest)
+                last_position, since = None, time.time()
+                continue
+            time.sleep(0.001)
+
+    def write(self, msg: str):
+        """
+        Adds a message to the buffer
+        raises ValueError if the message doesn't fit in the buffer
+        """
+        data = msg.encode()
+        data = self.length.pack(len(data)) + data
+        if len(data) > self.capacity:
+            raise ValueError(
+                f'Message of {len(data)} bytes is bigger than the ring buffer {self.name}'
+            )
+        write_position = self.get_write_position()
+        self.wait_for_space(write_position, len(data))
+        self.copy_to(write_position, data)
+        self.write_position(0, write_position + len(data))
+
+    def register_reader(self, slot: int):
+        """Activates the given reader slot, it will read the messages written from now on"""
+        self.set_reader(slot, True, self.get_write_position())
+
+    def unregister_reader(self, slot: int):
+        """The writer stops waiting for this reader"""
+        self.deactivate_reader(slot)
+
+    def read(self, slot: int):
+        """
+        Returns the next message of the reader in the given slot or None if there are no new messages
+        returns False if the reader was deactivated by the writer, it'll continue reading
+        from the latest message
+        """
+        active, read_position = self.get_reader(slot)
+        write_position = self.get_write_position()
+        if not active:
+            self.register_reader(slot)
+            return False
+        if read_position == write_position:
+            return None
+
+        size = self.length.unpack(
+            self.copy_from(read_position, self.length.size)
+        )[0]
+        data = self.copy_from(read_position + self.length.size, size)
+        if not self.get_reader(slot)[0]:
+            # the writer deactivated this reader while reading,
+            # the message may have been overwritten
+            self.register_reader(slot)
+            return False
+        # only the position is updated, if the writer deactivates this reader now
+        # it'll notice the next time it reads
+        self.write_position(
+            self.get_slot_offset(slot) + 8,
+            read_position + self.length.size + size,
+        )
+        return data.decode()
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+class FlowRingBufferSubscriber(object):
+    """
+    Used instead of a redis pubsub by the modules subscribed to the new_flow channel when
+    the flows are sent using shared memory. It has the same get_message() as the pubsub, the flows
+    are read from the ring buffers of all the profilers and control messages like stop_process
+    are still read from the redis channel, only when there are no flows left to read.
+    """
+
+    def __init__(
+        self, channel: str, pubsub, ring_buffers: list, slot: int, print=None
+    ):
+        """
+        :param pubsub: redis pubsub subscribed to the channel
+        :param ring_buffers: FlowRingBuffer of each profiler
+        :param slot: the reader slot of this subscriber in all the ring buffers
+        :param print: print function of slips used to report the flows lost by this subscriber
+        """
+        self.channel = channel
+        self.pubsub = pubsub
+        self.ring_buffers = ring_buffers
+        self.slot = slot
+        self.print = print
+        # amount of times the writer stopped waiting for this subscriber and it lost flows
+        self.lost = 0
+        for ring_buffer in ring_buffers:
+            ring_buffer.register_reader(slot)
+        # the ring buffer to read from next, so no profiler starves the others
+        self.next_ring_buffer = 0
+        # seconds to wait for a msg in the channel when there are no flows to read. it's doubled every time
+        # there are still no flows, up to max_idle_wait, so an idle module doesn't wake up every ms
+        self.min_idle_wait = 0.001
+        self.max_idle_wait = 0.1
+        self.idle_wait = self.min_idle_wait
+
+    def read_flow(self):
+        """Returns the next flow of any of the ring buffers or None"""
+        for _ in range(len(self.ring_buffers)):
+            ring_buffer = self.ring_buffers[self.next_ring_buffer]
+            self.next_ring_buffer = (self.next_ring_buffer + 1) % len(
+                self.ring_buffers
+            )
+            msg = ring_buffer.read(self.slot)
+            if msg is False:
+                self.lost += 1
+                self.report_lost_flows(ring_buffer)
+                continue
+            if msg is not None:
+                return msg
+        return None
+
+    def report_lost_flows(self, ring_buffer: FlowRingBuffer):
+        if not self.print:
+            return
+        # the subscriber is created by the module that reads the flows, so the process is named after it
+        self.print(
+            f'{current_process().name} was too slow reading the flows of {ring_buffer.name} '
+            f'and lost some of them ({self.lost} times so far). Increase flow_ring_buffer_max_wait '
+            f'in slips.conf to wait longer for it.', 0, 1,
+        )
+
+    def get_message(self, timeout=0.0, **kwargs):
+        """
+        Returns the next message in the same format as redis pubsub get_message()
+        :param timeout: seconds to wait for a message, None to wait until there is one
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            msg = self.read_flow()
+            if msg is not None:
+                self.idle_wait = self.min_idle_wait
+                return {
+                    'type': 'message',
+                    'pattern': None,
+                    'channel': self.channel,
+                    'data': msg,
+                }
+            # no flows, block on the channel until the flows are read again
+            wait = self.idle_wait
+            if deadline is not None:
+                wait = max(min(wait, deadline - time.time()), 0)
+            message = self.pubsub.get_message(timeout=wait)
+            if message:
+                return message
+            self.idle_wait = min(self.idle_wait * 2, self.max_idle_wait)
+            if deadline is not None and time.time() >= deadline:
+                return None
+
+    def close(self):
+        for ring_buffer in self.ring_buffers:
+            ring_buffer.unregister_reader(self.slot)
+            ring_buffer.close()
+        self.pubsub.close()
@@ -0,0 +1,183 @@
+import ipaddress
+import numpy as np
+
+
+class IPRangesIndex(object):
+    """
+    Longest prefix match index of IPv4 and IPv6 ranges.
+    The ranges are stored in one dict per prefix length, {prefixlen: {network as int: value}},
+    so finding the most specific range of an IP takes at most one dict lookup
+    per prefix length, 32 for IPv4 and 128 for IPv6, no matter how many ranges there are.
+    """
+
+    def __init__(self):
+        # {ip version: {prefixlen: {network as int: value}}}
+        self.ranges = {4: {}, 6: {}}
+        # the prefix lengths we have ranges for, most specific first
+        self.prefixlens = {4: [], 6: []}
+        self.max_prefixlen = {4: 32, 6: 128}
+
+    def __len__(self):
+        return sum(
+            len(networks)
+            for ranges in self.ranges.values()
+            for networks in ranges.values()
+        )
+
+    def add(self, ip_range: str, value) -> bool:
+        """
+        Adds the given range to the index, replacing the value of the range if it was there
+        returns False if it's not a valid range
+        """
+        try:
+            network = ipaddress.ip_network(ip_range.strip(), strict=False)
+        except ValueError:
+            return False
+        version, prefixlen = network.version, network.prefixlen
+        ranges = self.ranges[version]
+        if prefixlen not in ranges:
+            ranges[prefixlen] = {}
+            self.prefixlens[version] = sorted(ranges, reverse=True)
+        shift = self.max_prefixlen[version] - prefixlen
+        ranges[prefixlen][int(network.network_address) >> shift] = value
+        return True
+
+    def update(self, ranges: dict):
+        """Adds all the ranges of the given dict {range: value} to the index"""
+        for ip_range, value in ranges.items():
+            self.add(ip_range, value)
+
+    def remove(self, ip_range: str):
+        """Removes the given range from the index if it's there"""
+        try:
+            network = ipaddress.ip_network(ip_range.strip(), strict=False)
+        except ValueError:
+            return
+        version, prefixlen = network.version, network.prefixlen
+        networks = self.ranges[version].get(prefixlen, {})
+        shift = self.max_prefixlen[version] - prefixlen
+        networks.pop(int(network.network_address) >> shift, None)
+        if not networks and prefixlen in self.ranges[version]:
+            del self.ranges[version][prefixlen]
+            self.prefixlens[version].remove(prefixlen)
+
+    def lookup(self, ip):
+        """
+        Returns the value of the most specific range that has the given IP,
+        or None if it's not in any range
+        :param ip: str or an ipaddress object
+        """
+        try:
+            ip = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        version = ip.version
+        ranges = self.ranges[version]
+        max_prefixlen = self.max_prefixlen[version]
+        ip = int(ip)
+        for prefixlen in self.prefixlens[version]:
+            value = ranges[prefixlen].get(ip >> (max_prefixlen - prefixlen))
+            if value is not None:
+                return value
+        return None
+
+
+class IPRangesArray(object):
+    """
+    Set of IPv4 and IPv6 ranges stored as sorted numpy arrays of the first and last IP of each range.
+    Overlapping and adjacent ranges are merged when the arrays are built, so checking if an IP
+    is in any of the ranges is one binary search, and many IPs can be checked at once with contains()
+    IPv6 addresses don't fit in numpy ints, so they're stored as python ints in object arrays
+    """
+
+    def __init__(self, ranges=()):
+        # {ip version: (sorted first IPs, last IPs)}
+        self.ranges = {
+            4: (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)),
+            6: (np.empty(0, dtype=object), np.empty(0, dtype=object)),
+        }
+        self.update(ranges)
+
+    def __len__(self):
+        """Returns the amount of ranges after merging"""
+        return sum(len(starts) for starts, _ in self.ranges.values())
+
+    def update(self, ranges):
+        """
+        Adds the given ranges and rebuilds the arrays,
+        invalid ranges are ignored
+        :param ranges: iterable of ranges like '34.64.0.0/10'
+        """
+        intervals = {4: [], 6: []}
+        for ip_range in ranges:
+            try:
+                network = ipaddress.ip_network(ip_range.strip(), strict=False)
+            except (ValueError, AttributeError):
+                continue
+            intervals[network.version].append(
+                (
+                    int(network.network_address),
+                    int(network.broadcast_address),
+                )
+            )
+
+        for version, new_intervals in intervals.items():
+            if not new_intervals:
+                continue
+            starts, ends = self.ranges[version]
+            new_intervals.extend(zip(starts.tolist(), ends.tolist()))
+            new_intervals.sort()
+            merged = [list(new_intervals[0])]
+            for start, end in new_intervals[1:]:
+                if start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            dtype = starts.dtype
+            self.ranges[version] = (
+                np.array([start for start, _ in merged], dtype=dtype),
+                np.array([end for _, end in merged], dtype=dtype),
+            )
+
+    def __contains__(self, ip) -> bool:
+        """
+        :param ip: str or an ipaddress object
+        """
+        try:
+            ip = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        starts, ends = self.ranges[ip.version]
+        ip = int(ip)
+        # the last range that starts before or at this ip
+        index = np.searchsorted(starts, ip, side='right') - 1
+        return bool(index >= 0 and ip <= ends[index])
+
+    def contains(self, ips) -> np.ndarray:
+        """
+        Checks many IPs at once
+        :param ips: list of str or ipaddress objects
+        returns a bool array, True for each of the given IPs that is in any of the ranges
+        """
+        found = np.zeros(len(ips), dtype=bool)
+        # {ip version: ([positions of the ips of this version in the given list], [ips as int])}
+        ips_by_version = {4: ([], []), 6: ([], [])}
+        for position, ip in enumerate(ips):
+            try:
+                ip = ipaddress.ip_address(ip)
+            except ValueError:
+                continue
+            positions, ints = ips_by_version[ip.version]
+            positions.append(position)
+            ints.append(int(ip))
+
+        for version, (positions, ints) in ips_by_version.items():
+            starts, ends = self.ranges[version]
+            if not positions or not len(starts):
+                continue
+            ints = np.array(ints, dtype=starts.dtype)
+            indices = np.searchsorted(starts, ints, side='right') - 1
+            found[positions] = (indices >= 0) & (
+                ints <= ends[np.maximum(indices, 0)]
+            )
+        return found
@@ -31,6 +31,8 @@ class Utils(object):
             'high': 0.8,
             'critical': 1,
         }
+        # version of the format of the messages sent in the new_flow channel
+        self.flow_msg_version = 1
 
     def drop_root_privs(self):
         """
@@ -169,6 +171,46 @@ class Utils(object):
                 fb = f.read(BLOCK_SIZE)
         return file_hash.hexdigest()
 
+    def get_domain_and_parents(self, domain: str) -> list:
+        """
+        Returns the given domain followed by all its parent domains
+        e.g. images.google.com -> ['images.google.com', 'google.com', 'com']
+        """
+        labels = domain.strip('.').split('.')
+        return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+    def encode_flow_msg(self, profileid, twid, stime, uid, flow: str) -> str:
+        """
+        Builds the message sent in the new_flow channel.
+        The first line is a json list with the version of the format and the
+        profileid, twid, stime and uid of the flow, the second line is the flow
+        as it's stored in the db, so the flow is only serialized once
+        :param flow: the flow serialized as json
+        """
+        header = json.dumps([self.flow_msg_version, profileid, twid, stime, uid])
+        return f'{header}\n{flow}'
+
+    def decode_flow_msg(self, msg: str) -> dict:
+        """
+        Parses a message sent in the new_flow channel by encode_flow_msg()
+        returns a dict with the profileid, twid, stime, uid and the flow as a dict
+        """
+        # json.dumps() escapes new lines, so the first one is always the end of the header
+        header, _, flow = msg.partition('\n')
+        header = json.loads(header)
+        if header[0] != self.flow_msg_version:
+            raise ValueError(
+                f'Unsupported new_flow message version: {header[0]}'
+            )
+        _, profileid, twid, stime, uid = header
+        return {
+            'profileid': profileid,
+            'twid': twid,
+            'stime': stime,
+            'uid': uid,
+            'flow': json.loads(flow),
+        }
+
     def is_msg_intended_for(self, message, channel):
         """
         Function to check
@@ -0,0 +1,138 @@
+"""
+The zeek logs supported by slips and the field each one stores the IP of its profile in.
+Shared by the input process, that sends the lines of each profile to the same profiler,
+and the profiler, that parses them
+"""
+from re import split
+
+# (file name, log type) of the supported zeek files, in the order they're matched against the name of the file.
+# the profiler parses each log type with process_zeek_<log_type>() or process_zeek_tabs_<log_type>() if there's one
+zeek_json_log_types = (
+    ('conn', 'conn'),
+    ('dns', 'dns'),
+    ('http', 'http'),
+    ('ssl', 'ssl'),
+    ('ssh', 'ssh'),
+    ('irc', 'irc'),
+    ('long', 'long'),
+    ('dhcp', 'dhcp'),
+    ('dce_rpc', 'dce_rpc'),
+    ('dnp3', 'dnp3'),
+    ('ftp', 'ftp'),
+    ('kerberos', 'kerberos'),
+    ('mysql', 'mysql'),
+    ('modbus', 'modbus'),
+    ('ntlm', 'ntlm'),
+    ('rdp', 'rdp'),
+    ('sip', 'sip'),
+    ('smb_cmd', 'smb_cmd'),
+    ('smb_files', 'smb_files'),
+    ('smb_mapping', 'smb_mapping'),
+    ('smtp', 'smtp'),
+    ('socks', 'socks'),
+    ('syslog', 'syslog'),
+    ('tunnel', 'tunnel'),
+    ('notice', 'notice'),
+    ('files.log', 'files'),
+    ('arp', 'arp'),
+    ('known_services', 'known_services'),
+    ('software', 'software'),
+)
+zeek_tabs_log_types = (
+    ('conn.log', 'conn'),
+    ('dns.log', 'dns'),
+    ('http.log', 'http'),
+    ('ssl.log', 'ssl'),
+    ('ssh.log', 'ssh'),
+    ('irc', 'irc'),
+    ('long', 'long'),
+    ('dhcp.log', 'dhcp'),
+    ('dce_rpc', 'dce_rpc'),
+    ('dnp3', 'dnp3'),
+    ('ftp', 'ftp'),
+    ('kerberos', 'kerberos'),
+    ('mysql', 'mysql'),
+    ('modbus', 'modbus'),
+    ('ntlm', 'ntlm'),
+    ('rdp', 'rdp'),
+    ('sip', 'sip'),
+    ('smb_cmd', 'smb_cmd'),
+    ('smb_files', 'smb_files'),
+    ('smb_mapping', 'smb_mapping'),
+    ('smtp.log', 'smtp'),
+    ('socks.log', 'socks'),
+    ('syslog.log', 'syslog'),
+    ('tunnel.log', 'tunnel'),
+    ('notice.log', 'notice'),
+    ('files.log', 'files'),
+    ('arp.log', 'arp'),
+)
+
+
+def get_zeek_log_type(file_type: str, tabs=False):
+    """
+    Returns the zeek log type of the given file or False if slips doesn't support it
+    :param file_type: the name of the zeek file the line was read from
+    """
+    if tabs:
+        log_types, file_name = zeek_tabs_log_types, file_type
+    else:
+        log_types = zeek_json_log_types
+        # if the zeek dir given to slips has 'conn' in it's name,
+        # slips thinks it's reading a conn file
+        # because we use the file path as the file 'type'
+        # to fix this, only use the file name as file 'type'
+        file_name = file_type.split('/')[-1]
+    for name, log_type in log_types:
+        if name in file_name:
+            return log_type
+    return False
+
+
+def split_zeek_tabs_line(line: str) -> list:
+    """Returns the fields of a zeek tab separated line"""
+    line = line.rstrip('\n')
+    # the data is either \t separated or space separated
+    if '\t' in line:
+        return line.split('\t')
+    # zeek files that are space separated are either separated by 2 or 3 spaces so we can't use python's split()
+    # using regex split, split line when you encounter more than 2 spaces in a row
+    return split(r'\s{2,}', line)
+
+
+def get_zeek_profile_ip(log_type, line) -> str:
+    """
+    Returns the IP of the profile the given zeek line belongs to, the id.orig_h field in most logs
+    :param log_type: returned by get_zeek_log_type()
+    :param line: dict of a json line or list of fields of a tab separated line
+    """
+    if type(line) == dict:
+        if log_type == 'dhcp':
+            # Some zeek flow don't have saddr or daddr, seen in dhcp.log, use the mac address instead
+            if (
+                not line.get('client_addr', '')
+                and not line.get('server_addr', '')
+                and line.get('mac', False)
+            ):
+                return line['mac']
+            return line.get('client_addr', '')
+        if log_type == 'notice':
+            # portscan notices don't have id.orig_h or id.resp_h fields, instead they have src and dst
+            return line.get('id.orig_h', '') or line.get('src', '')
+        if log_type == 'files':
+            return (line.get('tx_hosts') or [''])[0]
+        if log_type == 'arp':
+            return line.get('orig_h', '')
+        if log_type in ('known_services', 'software'):
+            return line.get('host', '')
+        return line.get('id.orig_h', '')
+
+    try:
+        if log_type == 'arp':
+            return line[4]
+        if log_type == 'notice' and line[2] == '-' and len(line) > 13:
+            # src field
+            return line[13]
+        return line[2]
+    except IndexError:
+        return ''
@@ -14,7 +14,13 @@ import platform
 import re
 import ast
 from uuid import uuid4
+from collections import OrderedDict
 from slips_files.common.slips_utils import utils
+from slips_files.common.flow import flow_to_db_json
+from slips_files.common.flow_ring_buffer import (
+    FlowRingBuffer,
+    FlowRingBufferSubscriber,
+)
 
 def timing(f):
     """Function to measure the time another function takes."""
@@ -62,6 +68,12 @@ class Database(object):
         'new_software',
         'p2p_data_request',
         'remove_old_files',
+        'new_ip_ranges',
+        'new_ioc_domains',
+        'new_ioc_ips',
+        'deleted_ioc_ips',
+        'ioc_updated',
+        'dns_resolution_updated',
     }
 
     """ Database object management """
@@ -79,6 +91,45 @@ class Database(object):
         self.sudo = 'sudo '
         if self.running_in_docker:
             self.sudo = ''
+        # used by the profiler to send all the writes of a flow to redis at once
+        self.pipe = None
+        # the values written to the pipeline but not sent to redis yet, {(key, field): value}
+        self.pending_writes = {}
+        # set when a tw is marked as modified while the pipeline is active
+        self.pending_tw_check = False
+        # the letters and the last two timestamps of the tuples recently added by this process, so the profiler
+        # doesn't have to read them from redis for every flow. {(tuples_key, tupleid): [letters, previous_two_timestamps]}
+        # each tuple is only added by the profiler that handles its src IP, so no other process changes them
+        self.tuples_cache = OrderedDict()
+        # the least recently used tuples are removed from the cache after this many
+        self.tuples_cache_size = 10000
+        # the ips and domains sent to the threat intelligence module by this process,
+        # {(profileid, twid, ioc, ioc_type): None}. each one is only sent once per tw
+        self.ti_requests_sent = OrderedDict()
+        # the least recently sent are forgotten after this many, so they may be sent again
+        self.ti_requests_sent_size = 100000
+        # subscription to ioc_updated and the pid of the process that made it,
+        # the requests sent are forgotten when IoCs are added, so they're checked again with the new IoCs
+        self.ioc_updates = None
+        self.ioc_updates_pid = None
+        # the DNS resolutions read by this process, {ip: (resolution or {} if it has none, expiry time)}
+        # the ones changed by other processes are removed when they publish to dns_resolution_updated
+        self.dns_resolutions_cache = OrderedDict()
+        # the least recently used resolutions are removed from the cache after this many
+        self.dns_resolutions_cache_size = 10000
+        # seconds, in case an update is missed the resolution isn't used for longer than this
+        self.dns_resolutions_cache_ttl = 60
+        # subscription to dns_resolution_updated and the pid of the process that made it
+        self.dns_resolution_updates = None
+        self.dns_resolution_updates_pid = None
+        # the shared memory ring buffers used to send the flows to the modules when
+        # flows_transport = shared_memory in slips.conf, one per profiler. created by slips.py
+        self.flow_ring_buffers = []
+        # the ring buffer this profiler writes its flows to
+        self.flow_ring_buffer_writer = None
+        # flows published while the pipeline is active, they're written to the
+        # ring buffer after the pipeline so they arrive after the writes about them, like in redis
+        self.pending_flow_ring_buffer_msgs = []
 
     def connect_to_redis_server(self, port: str):
         """Connects to the given port and Sets r and rcache"""
@@ -196,9 +247,79 @@ class Database(object):
             # There is a conf, but there is no option, or no section or no configuration file specified
             self.home_network = utils.home_network_ranges
 
+        try:
+            self.flows_transport = self.config.get(
+                'parameters', 'flows_transport'
+            ).lower()
+        except (
+            configparser.NoOptionError,
+            configparser.NoSectionError,
+            NameError,
+        ):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.flows_transport = 'redis'
+
+        try:
+            # MBs
+            self.flow_ring_buffer_size = int(
+                self.config.get('parameters', 'flow_ring_buffer_size')
+            )
+        except (
+            configparser.NoOptionError,
+            configparser.NoSectionError,
+            NameError,
+            ValueError,
+        ):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.flow_ring_buffer_size = 16
+
+        try:
+            # seconds
+            self.flow_ring_buffer_max_wait = float(
+                self.config.get('parameters', 'flow_ring_buffer_max_wait')
+            )
+        except (
+            configparser.NoOptionError,
+            configparser.NoSectionError,
+            NameError,
+            ValueError,
+        ):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.flow_ring_buffer_max_wait = 10
+
+        try:
+            self.profiler_workers = max(
+                int(self.config.get('parameters', 'profiler_workers')), 1
+            )
+        except (
+            configparser.NoOptionError,
+            configparser.NoSectionError,
+            NameError,
+            ValueError,
+        ):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.profiler_workers = 1
+
+        try:
+            analysis_direction = self.config.get(
+                'parameters', 'analysis_direction'
+            )
+        except (
+            configparser.NoOptionError,
+            configparser.NoSectionError,
+            NameError,
+        ):
+            # the profilers analyze all the traffic by default
+            analysis_direction = 'all'
+        if analysis_direction == 'all':
+            # the profilers create the tws of the profiles of the daddrs too, so 2 profilers
+            # would create tws of the same profile at the same time and mess up their ids
+            self.profiler_workers = 1
+
     def start(self, config, redis_port):
         """Start the DB. Allow it to read the conf"""
         self.config = config
+        self.redis_port = redis_port
         self.read_configuration()
         # Read values from the configuration file
         try:
@@ -647,21 +768,118 @@ class Database(object):
         """
         return self.r.hget(profileid + self.separator + twid, 'DstIPs')
 
+    def start_pipeline(self):
+        """
+        Starts collecting the writes of the profile tws in a redis pipeline.
+        They are sent to redis at once when execute_pipeline() is called,
+        reads of the fields written to the pipeline are served from self.pending_writes
+        """
+        self.pipe = self.r.pipeline(transaction=False)
+        self.pending_writes = {}
+
+    def execute_pipeline(self) -> list:
+        """
+        Sends the pending writes to redis and stops the pipeline
+        :return: the replies of the commands in the pipeline
+        """
+        if not self.pipe:
+            return []
+        pipe = self.pipe
+        self.pipe = None
+        self.pending_writes = {}
+        replies = pipe.execute()
+        for msg in self.pending_flow_ring_buffer_msgs:
+            self.write_to_flow_ring_buffer(msg)
+        self.pending_flow_ring_buffer_msgs = []
+        if self.pending_tw_check:
+            # checking once for all the tws modified in this pipeline is enough
+            self.pending_tw_check = False
+            self.check_TW_to_close()
+        return replies
+
+    def hset_profile_tw(self, key: str, field: str, value):
+        """Sets the field of the given hash using the pipeline if there's one"""
+        if not self.pipe:
+            return self.r.hset(key, field, value)
+        self.pipe.hset(key, field, value)
+        self.pending_writes[(key, field)] = value
+
+    def hget_profile_tw(self, key: str, field: str):
+        """Gets the field of the given hash, including the values pending in the pipeline"""
+        try:
+            return self.pending_writes[(key, field)]
+        except KeyError:
+            return self.r.hget(key, field)
+
+    def append_profile_tw(self, key: str, value: str, new_value: str):
+        """
+        Appends value to the given str key using the pipeline if there's one
+        :param new_value: the value of the key after appending, served to the reads of this key until the pipeline is executed
+        """
+        if not self.pipe:
+            return self.r.append(key, value)
+        self.pipe.append(key, value)
+        self.pending_writes[(key, None)] = new_value
+
+    def get_profile_tw_str(self, key: str):
+        """Gets the given str key, including the value pending in the pipeline"""
+        try:
+            return self.pending_writes[(key, None)]
+        except KeyError:
+            return self.r.get(key)
+
+    def is_new_ti_request(self, profileid, twid, ioc: str, ioc_type: str) -> bool:
+        """
+        Returns True the first time the given ip or domain is going to be sent to the threat intelligence
+        module for the given profile and tw, and False if it was already sent recently.
+        The evidence TI sets for an ioc is the same for every flow in a tw, so asking once is enough
+        :param ioc_type: srcip, dstip, host, server_name or query
+        """
+        self.handle_ioc_updates()
+        request = (profileid, twid, ioc, ioc_type)
+        if request in self.ti_requests_sent:
+            self.ti_requests_sent.move_to_end(request)
+            return False
+        self.ti_requests_sent[request] = None
+        if len(self.ti_requests_sent) > self.ti_requests_sent_size:
+            self.ti_requests_sent.popitem(last=False)
+        return True
+
+    def handle_ioc_updates(self):
+        """
+        Forgets the TI requests sent by this process when a feed finishes adding its IoCs,
+        otherwise the ips and domains already sent in a tw would never be matched with them.
+        Subscribes to ioc_updated the first time it's called in a process
+        """
+        if self.ioc_updates_pid != os.getpid():
+            # first call in this process, the subscription of the parent process can't be used after forking
+            self.ti_requests_sent.clear()
+            self.ioc_updates = self.r.pubsub()
+            # only the name of the feed is published here, the IoCs are
+            # published in new_ioc_ips, new_ioc_domains and new_ip_ranges for the TI module
+            self.ioc_updates.subscribe('ioc_updated')
+            self.ioc_updates_pid = os.getpid()
+            return
+
+        while message := self.ioc_updates.get_message():
+            if message['type'] == 'message':
+                self.ti_requests_sent.clear()
+
     def getT2ForProfileTW(self, profileid, twid, tupleid, tuple_key: str):
         """
         Get T1 and the previous_time for this previous_time, twid and tupleid
         """
         try:
-            hash_id = profileid + self.separator + twid
-            data = self.r.hget(hash_id, tuple_key)
-            if not data:
-                return False, False
-            data = json.loads(data)
+            tuples_key = f'{profileid}{self.separator}{twid}{self.separator}{tuple_key}'
             try:
-                (_, previous_two_timestamps) = data[tupleid]
-                return previous_two_timestamps
+                return self.tuples_cache[(tuples_key, tupleid)][1]
             except KeyError:
+                # not added recently by this process
+                pass
+            previous_two_timestamps = self.hget_profile_tw(tuples_key, tupleid)
+            if not previous_two_timestamps:
                 return False, False
+            return json.loads(previous_two_timestamps)
         except Exception as e:
             exception_line = sys.exc_info()[2].tb_lineno
             self.outputqueue.put(
@@ -901,6 +1119,12 @@ class Database(object):
         data = {
             f'{profileid}{self.separator}{twid}': float(timestamp)
         }
+        if self.pipe:
+            self.pipe.zadd('ModifiedTW', data)
+            self.publish('tw_modified', f'{profileid}:{twid}')
+            # the tws are checked once the pipeline is executed
+            self.pending_tw_check = True
+            return
         self.r.zadd('ModifiedTW', data)
         self.publish(
             'tw_modified',
@@ -988,7 +1212,9 @@ class Database(object):
             # Check destination ip
 
             # BUT don't check if the state is OTH, since it means that we didnt see the true src ip and dst ip
-            if columns['state'] != 'OTH':
+            if columns['state'] != 'OTH' and self.is_new_ti_request(
+                profileid, twid, str(daddr), 'dstip'
+            ):
                 data_to_send = {
                     'ip': str(daddr),
                     'profileid': str(profileid),
@@ -1006,6 +1232,9 @@ class Database(object):
                 data_to_send.update({'cache_age': cache_age})
                 self.publish('p2p_data_request', json.dumps(data_to_send))
 
+            if columns['state'] != 'OTH' and self.is_new_ti_request(
+                profileid, twid, str(saddr), 'srcip'
+            ):
                 # Check source ip
                 data_to_send = {
                     'ip': str(saddr),
@@ -1049,7 +1278,7 @@ class Database(object):
             hash_id = profileid + self.separator + twid
             # Get the DstIPs data for this tw in this profile
             # The format is data['1.1.1.1'] = 3
-            data = self.r.hget(hash_id, type_host_key + 'IPs')
+            data = self.hget_profile_tw(hash_id, type_host_key + 'IPs')
             if not data:
                 data = {}
             try:
@@ -1079,7 +1308,7 @@ class Database(object):
                 # Convet the dictionary to json
                 data = json.dumps(data)
             # Store the dstips in the dB
-            self.r.hset(hash_id, type_host_key + 'IPs', str(data))
+            self.hset_profile_tw(hash_id, type_host_key + 'IPs', str(data))
             #############
             # 2- Store, for each ip:
             # - Update how many times each individual DstPort was contacted
@@ -1156,7 +1385,9 @@ class Database(object):
                 type_host_key + 'IPs' + role + proto.upper() + summaryState
             )
             # Store this data in the profile hash
-            self.r.hset(profileid + self.separator + twid, key_name, str(data))
+            self.hset_profile_tw(
+                profileid + self.separator + twid, key_name, str(data)
+            )
             # Mark the tw as modified
             self.markProfileTWAsModified(profileid, twid, starttime)
             return True
@@ -1184,6 +1415,10 @@ class Database(object):
     ):
         """
         Add the tuple going in or out for this profile
+        The letters of each tuple are stored in their own key profileid_twid_OutTuples_tupleid,
+        and the last two timestamps of all the tuples of the tw in the hash profileid_twid_OutTuples
+        so adding a flow doesn't need to read the rest of the tuples of the tw.
+        The tuples added recently are also kept in self.tuples_cache so they're not read from redis at all
         :param tupleid: daddr:dport:proto
         role: 'Client' or 'Server'
         """
@@ -1200,39 +1435,35 @@ class Database(object):
                 3,
                 0,
             )
-            # Get all the InTuples or OutTuples for this profileid in this TW
             profileid_twid = f'{profileid}{self.separator}{twid}'
-            tuples = self.r.hget(profileid_twid, direction)
+            tuples_key = f'{profileid_twid}{self.separator}{direction}'
+            letters_key = f'{tuples_key}{self.separator}{tupleid}'
             # Separate the symbold to add and the previous data
             (symbol_to_add, previous_two_timestamps) = data_tuple
-            if not tuples:
-                # Must be str so we can convert later
-                tuples = '{}'
-            # Convert the json str to a dictionary
-            tuples = json.loads(tuples)
+            cache_key = (tuples_key, tupleid)
+            # Get the last symbols of letters, from the DB if this tuple isn't cached.
+            # it's removed from the cache and added again at the end to keep the least recently used first
             try:
-                stored_tuple = tuples[tupleid]
-                # Disasemble the input
+                prev_symbols = self.tuples_cache.pop(cache_key)[0]
+            except KeyError:
+                prev_symbols = self.get_profile_tw_str(letters_key)
+            if prev_symbols:
                 self.print(
                     'Not the first time for tuple {} as an {} for {} in TW {}. '
-                    'Add the symbol: {}. Store previous_times: {}. Prev Data: {}'.format(
+                    'Add the symbol: {}. Store previous_times: {}. Prev letters: {}'.format(
                         tupleid,
                         direction,
                         profileid,
                         twid,
                         symbol_to_add,
                         previous_two_timestamps,
-                        tuples,
+                        prev_symbols,
                     ),
                     3,
                     0,
                 )
-                # Get the last symbols of letters in the DB
-                prev_symbols = tuples[tupleid][0]
                 # Add it to form the string of letters
                 new_symbol = f'{prev_symbols}{symbol_to_add}'
-                # Bundle the data together
-                new_data = (new_symbol, previous_two_timestamps)
                 # analyze behavioral model with lstm model if the length is divided by 3 -
                 # so we send when there is 3 more characters added
                 if len(new_symbol) % 3 == 0:
@@ -1246,7 +1477,6 @@ class Database(object):
                     }
                     to_send = json.dumps(to_send)
                     self.publish('new_letters', to_send)
-                tuples[tupleid] = new_data
                 self.print(
                     '\tLetters so far for tuple {}: {}'.format(
                         tupleid, new_symbol
@@ -1254,9 +1484,7 @@ class Database(object):
                     3,
                     0,
                 )
-                tuples = json.dumps(tuples)
-            except (TypeError, KeyError):
-                # TODO check that this condition is triggered correctly only for the first case and not the rest after...
+            else:
                 # There was no previous data stored in the DB
                 self.print(
                     'First time for tuple {} as an {} for {} in TW {}'.format(
@@ -1265,13 +1493,15 @@ class Database(object):
                     3,
                     0,
                 )
-                # Here get the info from the ipinfo key
-                new_data = (symbol_to_add, previous_two_timestamps)
-                tuples[tupleid] = new_data
-                # Convet the dictionary to json
-                tuples = json.dumps(tuples)
+                new_symbol = symbol_to_add
             # Store the new data on the db
-            self.r.hset(profileid_twid, direction, str(tuples))
+            self.append_profile_tw(letters_key, symbol_to_add, new_symbol)
+            self.hset_profile_tw(
+                tuples_key, tupleid, json.dumps(previous_two_timestamps)
+            )
+            self.tuples_cache[cache_key] = [new_symbol, previous_two_timestamps]
+            if len(self.tuples_cache) > self.tuples_cache_size:
+                self.tuples_cache.popitem(last=False)
             # Mark the tw as modified
             self.markProfileTWAsModified(profileid, twid, starttime)
         except Exception as inst:
@@ -1287,6 +1517,68 @@ class Database(object):
                 '01|database|[DB] {}'.format(traceback.format_exc())
             )
 
+    def get_tuples_from_profile_tw(self, profileid, twid, direction):
+        """
+        Returns the tuples of the given tw as a json str of {tupleid: [letters, previous_two_timestamps]}
+        :param direction: 'OutTuples' or 'InTuples'
+        """
+        tuples_key = f'{profileid}{self.separator}{twid}{self.separator}{direction}'
+        timestamps = self.r.hgetall(tuples_key)
+        if not timestamps:
+            return None
+        tupleids = list(timestamps.keys())
+        letters = self.r.mget(
+            [f'{tuples_key}{self.separator}{tupleid}' for tupleid in tupleids]
+        )
+        tuples = {
+            tupleid: (symbols, json.loads(timestamps[tupleid]))
+            for tupleid, symbols in zip(tupleids, letters)
+        }
+        return json.dumps(tuples)
+
+    def migrate_evidence(self):
+        """
+        Backups saved by older versions of slips store all the evidence of a tw as a json str
+        in the Evidence field of the profileid_twid hash and in the evidence<profileid> hash.
+        This function moves them to the hashes used by setEvidence()
+        """
+        for key in self.r.scan_iter(match='evidenceprofile*'):
+            profileid = key.replace('evidence', '', 1)
+            for twid, tw_evidence in self.r.hgetall(key).items():
+                tw_evidence = json.loads(tw_evidence)
+                if tw_evidence:
+                    self.r.hset(
+                        self.get_evidence_key(profileid, twid), mapping=tw_evidence
+                    )
+                self.r.hdel(f'{profileid}{self.separator}{twid}', 'Evidence')
+            self.r.delete(key)
+
+    def migrate_tuples(self):
+        """
+        Backups saved by older versions of slips store all the tuples of a tw as a json str
+        in the OutTuples and InTuples fields of the profileid_twid hash.
+        This function moves them to the per tuple keys used by add_tuple()
+        """
+        for key in self.r.scan_iter(match='profile*timewindow*'):
+            if not key.split(self.separator)[-1].startswith('timewindow'):
+                # not a profileid_twid hash
+                continue
+            for direction in ('OutTuples', 'InTuples'):
+                tuples = self.r.hget(key, direction)
+                if not tuples:
+                    continue
+                tuples_key = f'{key}{self.separator}{direction}'
+                pipe = self.r.pipeline(transaction=False)
+                for tupleid, (symbols, previous_two_timestamps) in json.loads(
+                    tuples
+                ).items():
+                    pipe.set(f'{tuples_key}{self.separator}{tupleid}', symbols)
+                    pipe.hset(
+                        tuples_key, tupleid, json.dumps(previous_two_timestamps)
+                    )
+                pipe.hdel(key, direction)
+                pipe.execute()
+
     def add_port(
         self,
         profileid: str,
@@ -1390,7 +1682,7 @@ class Database(object):
             )
             # Store this data in the profile hash
             hash_key = profileid + self.separator + twid
-            self.r.hset(hash_key, key_name, str(data))
+            self.hset_profile_tw(hash_key, key_name, str(data))
             # Mark the tw as modified
             self.markProfileTWAsModified(profileid, twid, starttime)
         except Exception as inst:
@@ -1427,13 +1719,11 @@ class Database(object):
 
     def getOutTuplesfromProfileTW(self, profileid, twid):
         """Get the out tuples"""
-        data = self.r.hget(profileid + self.separator + twid, 'OutTuples')
-        return data
+        return self.get_tuples_from_profile_tw(profileid, twid, 'OutTuples')
 
     def getInTuplesfromProfileTW(self, profileid, twid):
         """Get the in tuples"""
-        data = self.r.hget(profileid + self.separator + twid, 'InTuples')
-        return data
+        return self.get_tuples_from_profile_tw(profileid, twid, 'InTuples')
 
     def getFinalStateFromFlags(self, state, pkts):
         """
@@ -1615,15 +1905,19 @@ class Database(object):
         else:
             return False
 
-    def get_evidence_by_ID(self, profileid, twid, ID):
+    def get_evidence_key(self, profileid, twid) -> str:
+        """
+        Returns the key of the hash that has the evidence of the given tw,
+        the fields are the descriptions of the evidence and the values are the evidence as json
+        """
+        return f'{profileid}{self.separator}{twid}{self.separator}evidence'
 
-        evidence = self.getEvidenceForTW(profileid, twid)
-        if not evidence:
-            return False
+    def get_evidence_by_ID(self, profileid, twid, ID):
 
-        evidence: dict = json.loads(evidence)
         # loop through each evidence in this tw
-        for description, evidence_details in evidence.items():
+        for evidence_details in self.r.hvals(
+            self.get_evidence_key(profileid, twid)
+        ):
             evidence_details = json.loads(evidence_details)
             if evidence_details.get('ID') == ID:
                 # found an evidence that has a matching ID
@@ -1687,12 +1981,6 @@ class Database(object):
 
         if not twid:
             twid = ''
-        # Check if we have and get the current evidence stored in the DB fot this profileid in this twid
-        current_evidence = self.getEvidenceForTW(profileid, twid)
-        if current_evidence:
-            current_evidence = json.loads(current_evidence)
-        else:
-            current_evidence = {}
 
         # every evidence should have an ID according to the IDEA format
         evidence_ID = str(uuid4())
@@ -1730,21 +2018,15 @@ class Database(object):
             evidence_to_send.update({'proto': proto})
 
         evidence_to_send = json.dumps(evidence_to_send)
+        # Set evidence in the database. the description is used as the key
+        # hset returns 0 if the description was already there
+        is_new_evidence = self.r.hset(
+            self.get_evidence_key(profileid, twid), description, evidence_to_send
+        )
         # This is done to ignore repetition of the same evidence sent.
-        if description not in current_evidence.keys():
+        if is_new_evidence:
             self.publish('evidence_added', evidence_to_send)
 
-        # update our current evidence for this profileid and twid. now the description is used as the key
-        current_evidence.update({description: evidence_to_send})
-
-        # Set evidence in the database.
-        current_evidence = json.dumps(current_evidence)
-
-        self.r.hset(
-            profileid + self.separator + twid, 'Evidence', current_evidence
-        )
-        self.r.hset('evidence' + profileid, twid, current_evidence)
-
         # an alert is generated for this profile,
         # change the score to = 1, and confidence = 1
         if type_detection in ('sip', 'srcip'):
@@ -1763,13 +2045,12 @@ class Database(object):
         :param evidence_type: PortScan, ThreatIntelligence, C&C channels detection etc..
         """
         count = 0
-        evidence = self.getEvidenceForTW(profileid, twid)
+        evidence = self.r.hvals(self.get_evidence_key(profileid, twid))
         if not evidence:
             return False
 
-        evidence: dict = json.loads(evidence)
         # loop through each evidence in this tw
-        for description, evidence_details in evidence.items():
+        for evidence_details in evidence:
             evidence_details = json.loads(evidence_details)
             if evidence_type in evidence_details['type_evidence']:
                 count += 1
@@ -1780,28 +2061,17 @@ class Database(object):
         Delete evidence from the database
         :param description: teh description of the evidence
         """
-
-        current_evidence = self.getEvidenceForTW(profileid, twid)
-        if current_evidence:
-            current_evidence = json.loads(current_evidence)
-        else:
-            current_evidence = {}
-
-        # Delete the key regardless of whether it is in the dictionary
-        current_evidence.pop(description, None)
-        current_evidence_json = json.dumps(current_evidence)
-
-        self.r.hset(
-            profileid + self.separator + twid,
-            'Evidence',
-            str(current_evidence_json),
-        )
-        self.r.hset('evidence' + profileid, twid, current_evidence_json)
+        self.r.hdel(self.get_evidence_key(profileid, twid), description)
 
     def getEvidenceForTW(self, profileid, twid):
-        """Get the evidence for this TW for this Profile"""
-        data = self.r.hget(profileid + self.separator + twid, 'Evidence')
-        return data
+        """
+        Get the evidence for this TW for this Profile
+        :return: a json str of {description: evidence as json} or None if there's no evidence
+        """
+        evidence = self.r.hgetall(self.get_evidence_key(profileid, twid))
+        if not evidence:
+            return None
+        return json.dumps(evidence)
 
     def getEvidenceForProfileid(self, profileid):
         profile_evidence = {}
@@ -2228,12 +2498,140 @@ class Database(object):
         self.pubsub.subscribe(
             channel, ignore_subscribe_messages=ignore_subscribe_messages
         )
+        if channel == 'new_flow' and self.flows_transport == 'shared_memory':
+            # the flows are read from the ring buffers of the profilers,
+            # and the rest of the msgs like stop_process from the channel
+            return self.subscribe_to_flow_ring_buffers(channel) or self.pubsub
         return self.pubsub
 
+    def subscribe_to_channels(self, channels: list):
+        """
+        Subscribes to all the given channels using one pubsub,
+        msgs of all channels are received in the order they were published
+        """
+        channels = [
+            channel for channel in channels if channel in self.supported_channels
+        ]
+        self.pubsub = self.r.pubsub()
+        self.pubsub.subscribe(*channels)
+        if 'new_flow' in channels and self.flows_transport == 'shared_memory':
+            # the flows are read from the ring buffers of the profilers,
+            # and the msgs of the rest of the channels from the pubsub
+            return self.subscribe_to_flow_ring_buffers('new_flow') or self.pubsub
+        return self.pubsub
+
+    def get_flow_ring_buffer_name(self, worker_id: int) -> str:
+        return f'slips_flows_{self.redis_port}_{worker_id}'
+
+    def create_flow_ring_buffers(self):
+        """
+        Creates the shared memory ring buffers of all the profilers, they should be created
+        by slips.py before starting the modules and the profilers
+        """
+        # the reader slots and the fallback of a previous run using the same redis port
+        self.r.delete('flow_ring_buffer_readers', 'flow_ring_buffers_fallback')
+        for worker_id in range(self.profiler_workers):
+            name = self.get_flow_ring_buffer_name(worker_id)
+            size = self.flow_ring_buffer_size * 1024 * 1024
+            try:
+                ring_buffer = FlowRingBuffer(name, size=size, create=True)
+            except FileExistsError:
+                # left in /dev/shm by a slips that was killed before deleting it
+                FlowRingBuffer(name).unlink()
+                ring_buffer = FlowRingBuffer(name, size=size, create=True)
+            self.flow_ring_buffers.append(ring_buffer)
+
+    def delete_flow_ring_buffers(self):
+        """Deletes the ring buffers created by create_flow_ring_buffers()"""
+        for ring_buffer in self.flow_ring_buffers:
+            ring_buffer.unlink()
+        self.flow_ring_buffers = []
+
+    def open_flow_ring_buffer_writer(self, worker_id: int):
+        """
+        Called by each profiler to write the flows it publishes to its ring buffer
+        instead of the new_flow channel when flows_transport = shared_memory
+        """
+        if self.flows_transport != 'shared_memory':
+            return
+        if self.r.get('flow_ring_buffers_fallback'):
+            # a module couldn't read the ring buffers, it only receives the flows
+            # published in the new_flow channel. the modules subscribe before the profilers start
+            self.print(
+                'A module is not reading the ring buffers of the flows. '
+                'Sending the flows using redis.', 0, 1,
+            )
+            return
+        try:
+            self.flow_ring_buffer_writer = FlowRingBuffer(
+                self.get_flow_ring_buffer_name(worker_id),
+                max_wait=self.flow_ring_buffer_max_wait,
+            )
+        except (FileNotFoundError, PermissionError):
+            self.print(
+                'The ring buffers of the flows were not created. '
+                'Sending the flows using redis.', 0, 1,
+            )
+
+    def subscribe_to_flow_ring_buffers(self, channel: str):
+        """
+        returns a FlowRingBufferSubscriber that reads the flows from the ring buffers of
+        all the profilers, or False if it can't read them. In that case the profilers
+        send all the flows using redis, see open_flow_ring_buffer_writer()
+        """
+        # each subscriber has the same reader slot in all the ring buffers
+        slot = self.r.incr('flow_ring_buffer_readers') - 1
+        if slot >= FlowRingBuffer.max_readers:
+            self.print(
+                f'Too many subscribers to the ring buffers of the flows, '
+                f'max is {FlowRingBuffer.max_readers}. Sending the flows using redis.', 0, 1,
+            )
+            self.r.set('flow_ring_buffers_fallback', 1)
+            return False
+        try:
+            ring_buffers = [
+                FlowRingBuffer(self.get_flow_ring_buffer_name(worker_id))
+                for worker_id in range(self.profiler_workers)
+            ]
+        except (FileNotFoundError, PermissionError):
+            self.print(
+                'The ring buffers of the flows were not created. '
+                'Sending the flows using redis.', 0, 1,
+            )
+            self.r.set('flow_ring_buffers_fallback', 1)
+            return False
+        return FlowRingBufferSubscriber(
+            channel, self.pubsub, ring_buffers, slot, print=self.print
+        )
+
+    def write_to_flow_ring_buffer(self, msg: str):
+        try:
+            self.flow_ring_buffer_writer.write(msg)
+        except ValueError:
+            # too big for the ring buffer
+            self.r.publish('new_flow', msg)
+
     def publish(self, channel, data):
         """Publish something"""
+        if channel == 'new_flow' and self.flow_ring_buffer_writer:
+            if self.pipe:
+                self.pending_flow_ring_buffer_msgs.append(data)
+            else:
+                self.write_to_flow_ring_buffer(data)
+            return
+        if self.pipe:
+            # keep the order of the writes and the msgs about them
+            self.pipe.publish(channel, data)
+            return
         self.r.publish(channel, data)
 
+    def publish_ioc_updated(self, source: str):
+        """
+        Tells the processes that send TI requests that the given feed or file finished adding its IoCs
+        so they send the ips and domains they already sent again, see handle_ioc_updates()
+        """
+        self.publish('ioc_updated', source)
+
     def publish_stop(self):
         """Publish stop command to terminate slips"""
         all_channels_list = self.r.pubsub_channels()
@@ -2329,61 +2727,36 @@ class Database(object):
         """
         return self.r.zrange('labels', 0, -1, withscores=True)
 
-    def add_flow(
-        self,
-        profileid='',
-        twid='',
-        stime='',
-        dur='',
-        saddr='',
-        sport='',
-        daddr='',
-        dport='',
-        proto='',
-        state='',
-        pkts='',
-        allbytes='',
-        spkts='',
-        sbytes='',
-        appproto='',
-        uid='',
-        label='',
-        flow_type='',
-    ):
+    def add_flow(self, flow, profileid, twid, stime, label='', **fields):
         """
         Function to add a flow by interpreting the data. The flow is added to the correct TW for this profile.
         The profileid is the main profile that this flow is related too.
+        :param flow: the column_values dict of the profiler
+        :param fields: values stored instead of the ones of the flow, see flow_to_db_json()
         """
-        summaryState = __database__.getFinalStateFromFlags(state, pkts)
-        data = {
-            'ts': stime,
-            'dur': dur,
-            'saddr': saddr,
-            'sport': sport,
-            'daddr': daddr,
-            'dport': dport,
-            'proto': proto,
-            'origstate': state,
-            'state': summaryState,
-            'pkts': pkts,
-            'allbytes': allbytes,
-            'spkts': spkts,
-            'sbytes': sbytes,
-            'appproto': appproto,
-            'label': label,
-            'flow_type': flow_type,
-            'module_labels': {},
-        }
+        summaryState = __database__.getFinalStateFromFlags(
+            flow.get('state', ''), flow.get('pkts', '')
+        )
         # when adding a flow, there are still no labels ftom other modules, so the values is empty dictionary
-
-        # Convert to json string
-        data = json.dumps(data)
-        # Store in the hash 10.0.0.1_timewindow1_flows, a key uid, with data
-        value = self.r.hset(
-            f'{profileid}{self.separator}{twid}{self.separator}flows',
-            uid,
-            data,
+        data = flow_to_db_json(
+            flow,
+            ts=stime,
+            state=summaryState,
+            label=label,
+            module_labels={},
+            **fields,
         )
+        uid = flow['uid']
+        # Store in the hash 10.0.0.1_timewindow1_flows, a key uid, with data
+        flows_key = f'{profileid}{self.separator}{twid}{self.separator}flows'
+        if self.pipe:
+            # we need the reply of hset to know if the flow is duplicated,
+            # send it together with the rest of the writes of this flow
+            self.pipe.hset(flows_key, uid, data)
+            value = self.execute_pipeline()[-1]
+            self.start_pipeline()
+        else:
+            value = self.r.hset(flows_key, uid, data)
         if not value:
             # duplicate flow
             return False
@@ -2391,74 +2764,27 @@ class Database(object):
         # The key was not there before. So this flow is not repeated
         # Store the label in our uniq set, and increment it by 1
         if label:
-            self.r.zincrby('labels', 1, label)
-        # We can publish the flow directly without asking for it, but its good to maintain the format given by the get_flow() function.
-        flow = self.get_flow(profileid, twid, uid)
-        # Get the dictionary and convert to json string
-        flow = json.dumps(flow)
-        # Prepare the data to publish.
-        to_send = {}
-        to_send['profileid'] = profileid
-        to_send['twid'] = twid
-        to_send['flow'] = flow
-        to_send['stime'] = stime
-        to_send = json.dumps(to_send)
+            if self.pipe:
+                self.pipe.zincrby('labels', 1, label)
+            else:
+                self.r.zincrby('labels', 1, label)
+        # Publish the flow as it's stored, without serializing it again
+        to_send = utils.encode_flow_msg(profileid, twid, stime, uid, data)
         self.publish('new_flow', to_send)
         return True
 
-    def add_out_ssl(
-        self,
-        profileid,
-        twid,
-        stime,
-        daddr_as_obj,
-        dport,
-        flowtype,
-        uid,
-        version,
-        cipher,
-        resumed,
-        established,
-        cert_chain_fuids,
-        client_cert_chain_fuids,
-        subject,
-        issuer,
-        validation_status,
-        curve,
-        server_name,
-        ja3,
-        ja3s,
-        is_DoH,
-    ):
+    def add_out_ssl(self, flow, profileid, twid, stime):
         """
         Store in the DB an ssl request
         All the type of flows that are not netflows are stored in a separate hash ordered by uid.
         The idea is that from the uid of a netflow, you can access which other type of info is related to that uid
         """
-        data = {
-            'uid': uid,
-            'type': flowtype,
-            'version': version,
-            'cipher': cipher,
-            'resumed': resumed,
-            'established': established,
-            'cert_chain_fuids': cert_chain_fuids,
-            'client_cert_chain_fuids': client_cert_chain_fuids,
-            'subject': subject,
-            'issuer': issuer,
-            'validation_status': validation_status,
-            'curve': curve,
-            'server_name': server_name,
-            'daddr': str(daddr_as_obj),
-            'dport': dport,
-            'stime': stime,
-            'ja3': ja3,
-            'ja3s': ja3s,
-            'is_DoH': is_DoH,
-        }
+        uid = flow['uid']
+        daddr = flow['daddr']
+        dport = flow['dport']
+        server_name = flow['server_name']
         # TODO do something with is_doh
-        # Convert to json string
-        data = json.dumps(data)
+        data = flow_to_db_json(flow, stime=stime)
         self.r.hset(
             f'{profileid}{self.separator}{twid}{self.separator}altflows',
             uid,
@@ -2479,7 +2805,7 @@ class Database(object):
             return False
 
         # Save new server name in the IPInfo. There might be several server_name per IP.
-        ipdata = self.getIPData(str(daddr_as_obj))
+        ipdata = self.getIPData(daddr)
         if ipdata:
             sni_ipdata = ipdata.get('SNI', [])
         else:
@@ -2497,11 +2823,11 @@ class Database(object):
                     if SNI_port['server_name'] in resolution['domains']:
                         # add SNI to our db as it has a DNS resolution
                         sni_ipdata.append(SNI_port)
-                        self.setInfoForIPs(
-                            str(daddr_as_obj), {'SNI': sni_ipdata}
-                        )
+                        self.setInfoForIPs(daddr, {'SNI': sni_ipdata})
                         break
         # We are giving only new server_name to the threat_intelligence module.
+        if not self.is_new_ti_request(profileid, twid, server_name, 'server_name'):
+            return
         data_to_send = {
             'server_name': server_name,
             'profileid': str(profileid),
@@ -2512,48 +2838,15 @@ class Database(object):
         data_to_send = json.dumps(data_to_send)
         self.publish('give_threat_intelligence', data_to_send)
 
-    def add_out_http(
-        self,
-        profileid,
-        twid,
-        stime,
-        flowtype,
-        uid,
-        method,
-        host,
-        uri,
-        version,
-        user_agent,
-        request_body_len,
-        response_body_len,
-        status_code,
-        status_msg,
-        resp_mime_types,
-        resp_fuids,
-    ):
+    def add_out_http(self, flow, profileid, twid, stime):
         """
         Store in the DB a http request
         All the type of flows that are not netflows are stored in a separate hash ordered by uid.
         The idea is that from the uid of a netflow, you can access which other type of info is related to that uid
         """
-        data = {
-            'uid': uid,
-            'type': flowtype,
-            'method': method,
-            'host': host,
-            'uri': uri,
-            'version': version,
-            'user_agent': user_agent,
-            'request_body_len': request_body_len,
-            'response_body_len': response_body_len,
-            'status_code': status_code,
-            'status_msg': status_msg,
-            'resp_mime_types': resp_mime_types,
-            'resp_fuids': resp_fuids,
-            'stime': stime,
-        }
-        # Convert to json string
-        data = json.dumps(data)
+        uid = flow['uid']
+        host = flow['host']
+        data = flow_to_db_json(flow, stime=stime)
 
         self.r.hset(
             f'{profileid}{ self.separator }{twid}{ self.separator }altflows',
@@ -2572,6 +2865,8 @@ class Database(object):
 
         self.print('Adding HTTP flow to DB: {}'.format(data), 3, 0)
         # Check if the host domain is detected by the threat intelligence. Empty field in the end, cause we have extrafield for the IP.
+        if not self.is_new_ti_request(profileid, twid, host, 'host'):
+            return
         data_to_send = {
             'host': host,
             'profileid': str(profileid),
@@ -2582,25 +2877,7 @@ class Database(object):
         data_to_send = json.dumps(data_to_send)
         self.publish('give_threat_intelligence', data_to_send)
 
-    def add_out_ssh(
-        self,
-        profileid,
-        twid,
-        stime,
-        flowtype,
-        uid,
-        ssh_version,
-        auth_attempts,
-        auth_success,
-        client,
-        server,
-        cipher_alg,
-        mac_alg,
-        compression_alg,
-        kex_alg,
-        host_key_alg,
-        host_key,
-    ):
+    def add_out_ssh(self, flow, profileid, twid, stime):
         """
         Store in the DB a SSH request
         All the type of flows that are not netflows are stored in a
@@ -2609,24 +2886,8 @@ class Database(object):
         other type of info is related to that uid
         """
         #  {"client":"SSH-2.0-OpenSSH_8.1","server":"SSH-2.0-OpenSSH_7.5p1 Debian-5","cipher_alg":"chacha20-pol y1305@openssh.com","mac_alg":"umac-64-etm@openssh.com","compression_alg":"zlib@openssh.com","kex_alg":"curve25519-sha256","host_key_alg":"ecdsa-sha2-nistp256","host_key":"de:04:98:42:1e:2a:06:86:5b:f0:5b:e3:65:9f:9d:aa"}
-        data = {
-            'uid': uid,
-            'type': flowtype,
-            'version': ssh_version,
-            'auth_attempts': auth_attempts,
-            'auth_success': auth_success,
-            'client': client,
-            'server': server,
-            'cipher_alg': cipher_alg,
-            'mac_alg': mac_alg,
-            'compression_alg': compression_alg,
-            'kex_alg': kex_alg,
-            'host_key_alg': host_key_alg,
-            'host_key': host_key,
-            'stime': stime,
-        }
-        # Convert to json string
-        data = json.dumps(data)
+        uid = flow['uid']
+        data = flow_to_db_json(flow, stime=stime)
         # Set the dns as alternative flow
         self.r.hset(
             f'{profileid}{self.separator}{twid}{self.separator}altflows',
@@ -2647,35 +2908,11 @@ class Database(object):
         self.print('Adding SSH flow to DB: {}'.format(data), 3, 0)
         # Check if the dns is detected by the threat intelligence. Empty field in the end, cause we have extrafield for the IP.
 
-    def add_out_notice(
-        self,
-        profileid,
-        twid,
-        stime,
-        daddr,
-        sport,
-        dport,
-        note,
-        msg,
-        scanned_port,
-        scanning_ip,
-        uid,
-    ):
+    def add_out_notice(self, flow, profileid, twid, stime):
         """ " Send notice.log data to new_notice channel to look for self-signed certificates"""
-        data = {
-            'type': 'notice',
-            'daddr': daddr,
-            'sport': sport,
-            'dport': dport,
-            'note': note,
-            'msg': msg,
-            'scanned_port': scanned_port,
-            'scanning_ip': scanning_ip,
-            'stime': stime,
-        }
-        data = json.dumps(
-            data
-        )   # this is going to be sent insidethe to_send dict
+        uid = flow['uid']
+        # this is going to be sent insidethe to_send dict
+        data = flow_to_db_json(flow, stime=stime)
         to_send = {
             'profileid': profileid,
             'twid': twid,
@@ -2692,46 +2929,25 @@ class Database(object):
         self.publish('new_notice', to_send)
         self.print('Adding notice flow to DB: {}'.format(data), 3, 0)
 
-    def add_out_dns(
-        self,
-        profileid,
-        twid,
-        stime,
-        flowtype,
-        uid,
-        query,
-        qclass_name,
-        qtype_name,
-        rcode_name,
-        answers,
-        ttls,
-    ):
+    def add_out_dns(self, flow, profileid, twid, stime):
         """
         Store in the DB a DNS request
         All the type of flows that are not netflows are stored in a separate hash ordered by uid.
         The idea is that from the uid of a netflow, you can access which other type of info is related to that uid
         """
-        data = {
-            'uid': uid,
-            'type': flowtype,
-            'query': query,
-            'qclass_name': qclass_name,
-            'qtype_name': qtype_name,
-            'rcode_name': rcode_name,
-            'answers': answers,
-            'ttls': ttls,
-            'stime': stime,
-        }
+        uid = flow['uid']
+        query = flow['query']
+        answers = flow['answers']
+        rcode_name = flow['rcode_name']
 
         # Add DNS resolution to the db if there are answers for the query
         if answers:
             srcip = profileid.split('_')[1]
 
             self.set_dns_resolution(
-                query, answers, stime, uid, qtype_name, srcip
+                query, answers, stime, uid, flow['qtype_name'], srcip
             )
-        # Convert to json string
-        data = json.dumps(data)
+        data = flow_to_db_json(flow, stime=stime)
         # Set the dns as alternative flow
         self.r.hset(
             f'{profileid}{self.separator}{twid}{self.separator}altflows',
@@ -2753,6 +2969,8 @@ class Database(object):
         self.publish('new_dns_flow', to_send)
         self.print('Adding DNS flow to DB: {}'.format(data), 3, 0)
         # Check if the dns is detected by the threat intelligence. Empty field in the end, cause we have extrafield for the IP.
+        if not self.is_new_ti_request(profileid, twid, str(query), 'query'):
+            return
         data_to_send = {
             'query': str(query),
             'profileid': str(profileid),
@@ -2973,6 +3191,8 @@ class Database(object):
         Delete old IPs from IoC
         """
         self.rcache.hdel('IoC_ips', *ips)
+        # the threat intelligence module forgets the descriptions of these ips
+        self.publish('deleted_ioc_ips', json.dumps(list(ips)))
 
     def delete_domains_from_IoC_domains(self, domains):
         """
@@ -2980,6 +3200,45 @@ class Database(object):
         """
         self.rcache.hdel('IoC_domains', *domains)
 
+    def delete_ip_ranges_from_IoC_ip_ranges(self, ip_ranges):
+        """
+        Delete old ip ranges from IoC
+        """
+        self.rcache.hdel('IoC_ip_ranges', *ip_ranges)
+        # the threat intelligence module removes the ranges with no description from its index
+        self.publish('new_ip_ranges', json.dumps(dict.fromkeys(ip_ranges)))
+
+    def get_IoCs_info(self, iocs: list, ioc_type: str) -> list:
+        """
+        Returns the description of each of the given IoCs, None for the ones we don't have
+        :param ioc_type: ip, domain or ip_range
+        """
+        IoC_hashes = {
+            'ip': 'IoC_ips',
+            'domain': 'IoC_domains',
+            'ip_range': 'IoC_ip_ranges',
+        }
+        return self.rcache.hmget(IoC_hashes[ioc_type], iocs)
+
+    def get_TI_feed_snapshot(self, feed: str) -> set:
+        """
+        Returns the IoCs that the given feed had the last time it was updated
+        :param feed: a valid filename not a feed url
+        """
+        return self.rcache.smembers(f'TI_feed_snapshot_{feed}')
+
+    def set_TI_feed_snapshot(self, feed: str, iocs: set):
+        """
+        Replaces the IoCs stored as the snapshot of the given feed
+        :param feed: a valid filename not a feed url
+        """
+        key = f'TI_feed_snapshot_{feed}'
+        pipe = self.rcache.pipeline()
+        pipe.delete(key)
+        if iocs:
+            pipe.sadd(key, *iocs)
+        pipe.execute()
+
     def add_ips_to_IoC(self, ips_and_description: dict) -> None:
         """
         Store a group of IPs in the db as they were obtained from an IoC source
@@ -2989,6 +3248,8 @@ class Database(object):
         """
         if ips_and_description:
             self.rcache.hmset('IoC_ips', ips_and_description)
+            # the threat intelligence module adds them to its bloom filter of malicious ips
+            self.publish('new_ioc_ips', json.dumps(list(ips_and_description)))
 
     def add_domains_to_IoC(self, domains_and_description: dict) -> None:
         """
@@ -2999,6 +3260,8 @@ class Database(object):
         """
         if domains_and_description:
             self.rcache.hmset('IoC_domains', domains_and_description)
+            # the threat intelligence module adds them to its bloom filter of malicious domains
+            self.publish('new_ioc_domains', json.dumps(list(domains_and_description)))
 
     def add_ip_range_to_IoC(self, malicious_ip_ranges: dict) -> None:
         """
@@ -3008,6 +3271,8 @@ class Database(object):
         """
         if malicious_ip_ranges:
             self.rcache.hmset('IoC_ip_ranges', malicious_ip_ranges)
+            # the threat intelligence module adds them to its index of ranges
+            self.publish('new_ip_ranges', json.dumps(malicious_ip_ranges))
 
     def add_ja3_to_IoC(self, ja3_dict) -> None:
         """
@@ -3032,6 +3297,7 @@ class Database(object):
         Store in the DB 1 IP we read from an IoC source  with its description
         """
         self.rcache.hset('IoC_ips', ip, description)
+        self.publish('new_ioc_ips', json.dumps([ip]))
 
     def add_domain_to_IoC(self, domain: str, description: str) -> None:
         """
@@ -3039,6 +3305,7 @@ class Database(object):
         with its description
         """
         self.rcache.hset('IoC_domains', domain, description)
+        self.publish('new_ioc_domains', json.dumps([domain]))
 
     def get_malicious_ip_ranges(self) -> dict:
         """
@@ -3177,11 +3444,12 @@ class Database(object):
                 else:
                     # we have info about this domain in DNSresolution in the db
                     # keep track of all srcips that resolved this domain
-                    resolved_by = ip_info_from_db.get('resolved-by', [])
+                    # copy the lists, ip_info_from_db is cached
+                    resolved_by = list(ip_info_from_db.get('resolved-by', []))
                     if srcip not in resolved_by:
                         resolved_by.append(srcip)
                     # we'll be appending the current answer to these cached domains
-                    domains = ip_info_from_db.get('domains', [])
+                    domains = list(ip_info_from_db.get('domains', []))
 
                 # if the domain(query) we have isn't already in DNSresolution in the db, add it
                 if query not in domains:
@@ -3194,6 +3462,7 @@ class Database(object):
                     'domains': domains,
                     'resolved-by': resolved_by,
                 }
+                self.cache_dns_resolution(answer, ip_info)
                 ip_info = json.dumps(ip_info)
                 # we store ALL dns resolutions seen since starting slips in DNSresolution
                 self.r.hset('DNSresolution', answer, ip_info)
@@ -3201,6 +3470,8 @@ class Database(object):
                 ips_to_add.append(answer)
 
             if ips_to_add:
+                # other processes remove these ips from their cache of resolutions
+                self.publish('dns_resolution_updated', json.dumps(ips_to_add))
                 domaindata = {}
                 domaindata['IPs'] = ips_to_add
 
@@ -3223,13 +3494,57 @@ class Database(object):
                             'resolved-by':.. } of this IP or {}
 
         this function is called for every IP in the timeline of kalipso
+        the returned dict is cached, don't modify it
         """
+        self.handle_dns_resolution_updates()
+        try:
+            ip_info, expiry = self.dns_resolutions_cache[ip]
+            if expiry > time.time():
+                self.dns_resolutions_cache.move_to_end(ip)
+                return ip_info
+        except KeyError:
+            pass
+
         ip_info = self.r.hget('DNSresolution', ip)
         if ip_info:
             ip_info = json.loads(ip_info)
-            # return a dict with 'ts' 'uid' 'domains' about this IP
-            return ip_info
-        return {}
+        else:
+            ip_info = {}
+        self.cache_dns_resolution(ip, ip_info)
+        # return a dict with 'ts' 'uid' 'domains' about this IP
+        return ip_info
+
+    def cache_dns_resolution(self, ip, ip_info: dict):
+        """Stores the resolution of the given ip in the cache of this process"""
+        self.dns_resolutions_cache[ip] = (
+            ip_info,
+            time.time() + self.dns_resolutions_cache_ttl,
+        )
+        self.dns_resolutions_cache.move_to_end(ip)
+        if len(self.dns_resolutions_cache) > self.dns_resolutions_cache_size:
+            self.dns_resolutions_cache.popitem(last=False)
+
+    def handle_dns_resolution_updates(self):
+        """
+        Removes the resolutions changed by other processes from the cache of this process.
+        Subscribes to dns_resolution_updated the first time it's called in a process,
+        the cache is only used after subscribing so no update is missed
+        """
+        if self.dns_resolution_updates_pid != os.getpid():
+            # first call in this process, the subscription and the cache
+            # of the parent process can't be used after forking
+            self.dns_resolutions_cache.clear()
+            self.dns_resolution_updates = self.r.pubsub()
+            self.dns_resolution_updates.subscribe('dns_resolution_updated')
+            self.dns_resolution_updates_pid = os.getpid()
+            return
+
+        while message := self.dns_resolution_updates.get_message():
+            if not utils.is_msg_intended_for(message, 'dns_resolution_updated'):
+                # subscribe confirmation
+                continue
+            for ip in json.loads(message['data']):
+                self.dns_resolutions_cache.pop(ip, None)
 
     def get_all_dns_resolutions(self):
         dns_resolutions = self.r.hgetall('DNSresolution')
@@ -3352,19 +3667,16 @@ class Database(object):
         description if we found a match
         returns a tuple (description, is_subdomain)
         description: description of the subdomain if found
-        bool: True if we found a match for exactly the given domain False if we matched a subdomain
-        """
-        domain_description = self.rcache.hget('IoC_domains', domain)
-        if domain_description == None:
-            # try to match subdomain
-            ioc_domains = self.rcache.hgetall('IoC_domains')
-            for malicious_domain, description in ioc_domains.items():
-                #  if the we contacted images.google.com and we have google.com in our blacklists, we find a match
-                if malicious_domain in domain:
-                    return description, True
-            return False, False
-        else:
-            return domain_description, False
+        bool: False if we found a match for exactly the given domain True if we matched a parent domain of it
+        """
+        # if the we contacted images.google.com and we have google.com in our blacklists, we find a match
+        # check the domain and all its parents at once, the most specific first
+        domains = utils.get_domain_and_parents(domain)
+        descriptions = self.rcache.hmget('IoC_domains', domains)
+        for idx, description in enumerate(descriptions):
+            if description:
+                return description, idx > 0
+        return False, False
 
     def getDataFromProfileTW(
         self,
@@ -3408,7 +3720,7 @@ class Database(object):
             )
             key = direction + type_data + role + protocol + state
             # self.print('Asked Key: {}'.format(key))
-            data = self.r.hget(profileid + self.separator + twid, key)
+            data = self.hget_profile_tw(profileid + self.separator + twid, key)
             value = {}
             if data:
                 self.print(
@@ -3513,10 +3825,13 @@ class Database(object):
     def set_asn_cache(self, asn, asn_range) -> None:
         """
         Stores the range of asn in cached_asn hash
+        and the asn of the range in cached_asn_ranges hash
         :param asn: str
         :param asn_range: str
         """
         self.rcache.hset('cached_asn', asn, asn_range)
+        # cached_asn only keeps the last range of each asn, this one keeps all of them
+        self.rcache.hset('cached_asn_ranges', asn_range, asn)
 
     def get_asn_cache(self):
         """
@@ -3524,6 +3839,12 @@ class Database(object):
         """
         return self.rcache.hgetall('cached_asn')
 
+    def get_asn_ranges_cache(self) -> dict:
+        """
+        Returns all the cached ranges and their asn {range: asn}
+        """
+        return self.rcache.hgetall('cached_asn_ranges')
+
     def store_process_PID(self, process, pid):
         """
         Stores each started process or module with it's PID
@@ -3673,6 +3994,16 @@ class Database(object):
             # Start the server again
             # os.system(self.sudo + 'service redis-server start')
             os.system('redis-server --daemonize yes > /dev/null 2>&1')
+            # wait for the server to load the db
+            for _ in range(10):
+                try:
+                    self.r.ping()
+                    break
+                except (redis.exceptions.ConnectionError, redis.exceptions.BusyLoadingError):
+                    time.sleep(1)
+            # backups of older versions store the tuples and evidence in the old format
+            self.migrate_tuples()
+            self.migrate_evidence()
             return True
         except:
             self.print(
@@ -3686,6 +4017,7 @@ class Database(object):
         """
         # get the feed name from the given url
         feed_to_delete = url.split('/')[-1]
+        self.rcache.delete(f'TI_feed_snapshot_{feed_to_delete}')
         # get all domains that are read from TI files in our db
         IoC_domains = self.rcache.hgetall('IoC_domains')
         for domain, domain_description in IoC_domains.items():
@@ -3696,11 +4028,14 @@ class Database(object):
 
         # get all IPs that are read from TI files in our db
         IoC_ips = self.rcache.hgetall('IoC_ips')
-        for ip, ip_description in IoC_ips.items():
-            ip_description = json.loads(ip_description)
-            if feed_to_delete in ip_description['source']:
-                # this entry has the given feed as source, delete it
-                self.rcache.hdel('IoC_ips', ip)
+        ips_to_delete = [
+            ip
+            for ip, ip_description in IoC_ips.items()
+            # this entry has the given feed as source, delete it
+            if feed_to_delete in json.loads(ip_description)['source']
+        ]
+        if ips_to_delete:
+            self.delete_ips_from_IoC_ips(ips_to_delete)
 
     def set_last_warden_poll_time(self, time):
         """
@@ -3762,6 +4097,25 @@ class Database(object):
             cached_ip_data.update(score_confidence)
             self.rcache.hset('IPsInfo', ip, json.dumps(cached_ip_data))
 
+    def set_score_confidence_of_ips(self, ips_threat_levels: dict, confidence):
+        """
+        Same as set_score_confidence but for a group of ips,
+        reads and writes all of them with one command instead of 2 commands per ip
+        :param ips_threat_levels: {ip: threat_level}
+        """
+        if not ips_threat_levels:
+            return
+        ips = list(ips_threat_levels)
+        cached_ips_data = self.rcache.hmget('IPsInfo', ips)
+        ips_data = {}
+        for ip, cached_ip_data in zip(ips, cached_ips_data):
+            score = utils.threat_levels[ips_threat_levels[ip].lower()]
+            ip_data = json.loads(cached_ip_data) if cached_ip_data else {}
+            # append the score and conf. to the already existing data
+            ip_data.update({'score': score, 'confidence': confidence})
+            ips_data[ip] = json.dumps(ip_data)
+        self.rcache.hmset('IPsInfo', ips_data)
+
     def store_zeek_path(self, path):
         """used to store the path of zeek log files slips is currently using"""
         self.r.set('zeek_path', path)
@@ -28,10 +28,14 @@ from slips_files.common.slips_utils import utils
 class FileEventHandler(RegexMatchingEventHandler):
     REGEX = [r'.*\.log$', r'.*\.conf$']
 
-    def __init__(self, config, redis_port, monitored_zeek_files):
+    def __init__(
+        self, config, redis_port, monitored_zeek_files, zeek_files_changed=None
+    ):
         super().__init__(self.REGEX)
         self.config = config
         self.monitored_zeek_files = monitored_zeek_files
+        # threading.Event used to tell inputProcess to refresh its list of zeek files
+        self.zeek_files_changed = zeek_files_changed
         # Start the DB
         __database__.start(self.config, redis_port)
         utils.drop_root_privs()
@@ -40,6 +44,8 @@ class FileEventHandler(RegexMatchingEventHandler):
         filename, ext = os.path.splitext(event.src_path)
         if 'log' in ext:
             __database__.add_zeek_file(filename + ext)
+            if self.zeek_files_changed:
+                self.zeek_files_changed.set()
 
     def on_moved(self, event):
         """this will be triggered everytime zeek renames all log files"""
@@ -16,6 +16,11 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 # Contact: eldraco@gmail.com, sebastian.garcia@agents.fel.cvut.cz, stratosphere@aic.fel.cvut.cz
 from slips_files.common.slips_utils import utils
+from slips_files.common.zeek_logs import (
+    get_zeek_log_type,
+    get_zeek_profile_ip,
+    split_zeek_tabs_line,
+)
 import multiprocessing
 import sys
 import os
@@ -30,6 +35,8 @@ import traceback
 import threading
 import subprocess
 import shutil
+import heapq
+import zlib
 
 
 # Input Process
@@ -51,7 +58,11 @@ class InputProcess(multiprocessing.Process):
         multiprocessing.Process.__init__(self)
         self.name = 'InputProcess'
         self.outputqueue = outputqueue
-        self.profilerqueue = profilerqueue
+        # one queue per profiler worker. the flows of each profile always go to the same worker
+        if type(profilerqueue) != list:
+            profilerqueue = [profilerqueue]
+        self.profiler_queues = profilerqueue
+        self.profilerqueue = profilerqueue[0]
         self.config = config
         # Start the DB
         __database__.start(self.config, redis_port)
@@ -92,8 +103,25 @@ class InputProcess(multiprocessing.Process):
             target=self.remove_old_zeek_files, daemon=True
         )
         self.open_file_handlers = {}
+        # set by filemonitor when zeek creates a new log file
+        self.zeek_files_changed = threading.Event()
+        # how often to check the db for new zeek files, in seconds.
+        # in case we missed an event from filemonitor
+        self.zeek_files_update_interval = 5
         self.c1 = __database__.subscribe('remove_old_files')
         self.timeout = None
+        # lines waiting to be sent to each profiler worker in one batch
+        self.lines_batches = [[] for _ in self.profiler_queues]
+        self.batch_start_times = [0] * len(self.profiler_queues)
+        # index of the src addr column in argus files, set when the header is read
+        self.argus_saddr_idx = None
+        # {(zeek file, tabs): log type}, used for finding the profile ip of zeek lines
+        self.zeek_log_types = {}
+        self.batch_lock = threading.Lock()
+        # create the thread that sends incomplete batches after flush_interval
+        self.batch_flusher_thread = threading.Thread(
+            target=self.flush_old_batches, daemon=True
+        )
 
     def read_configuration(self):
         """Read the configuration file for what we need"""
@@ -135,6 +163,38 @@ class InputProcess(multiprocessing.Process):
             # There is a conf, but there is no option, or no section or no configuration file specified
             self.rotation = True
 
+        try:
+            # how many lines to send to the profiler at once
+            self.batch_size = int(
+                self.config.get('parameters', 'profiler_batch_size')
+            )
+        except (
+                configparser.NoOptionError,
+                configparser.NoSectionError,
+                NameError,
+                ValueError,
+        ):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            # send the lines one by one
+            self.batch_size = 1
+
+        try:
+            # max time (in ms) a line can wait in an incomplete batch before being sent
+            self.flush_interval = (
+                float(
+                    self.config.get('parameters', 'profiler_batch_flush_interval')
+                )
+                / 1000
+            )
+        except (
+                configparser.NoOptionError,
+                configparser.NoSectionError,
+                NameError,
+                ValueError,
+        ):
+            # There is a conf, but there is no option, or no section or no configuration file specified
+            self.flush_interval = 0.1
+
     def print(self, text, verbose=1, debug=0):
         """
         Function to use to print text using the outputqueue of slips.
@@ -155,17 +215,129 @@ class InputProcess(multiprocessing.Process):
         levels = f'{verbose}{debug}'
         self.outputqueue.put(f'{levels}|{self.name}|{text}')
 
+    def get_profile_ip(self, line: dict) -> str:
+        """
+        Returns the source address of the given line without fully parsing it,
+        used for choosing the profiler worker that handles this line's profile
+        """
+        data = line['data']
+        # lines read from stdin have the type given by the user in line_type
+        line_type = line.get('line_type') or line['type']
+        try:
+            if type(data) == dict:
+                # zeek json
+                return get_zeek_profile_ip(self.get_zeek_log_type(line), data)
+            if line_type == 'suricata':
+                return json.loads(data).get('src_ip', '')
+            if line_type == 'nfdump':
+                return data.split(',')[3]
+            if line_type in ('argus', 'argus-tabs'):
+                separator = '\t' if '\t' in data else ','
+                return data.split(separator)[self.argus_saddr_idx]
+            # zeek tabs, parsed the same way the profiler parses them
+            return get_zeek_profile_ip(
+                self.get_zeek_log_type(line, tabs=True), split_zeek_tabs_line(data)
+            )
+        except (IndexError, TypeError, AttributeError, json.decoder.JSONDecodeError):
+            return ''
+
+    def get_zeek_log_type(self, line: dict, tabs=False):
+        """Returns the zeek log type of the file the given line was read from"""
+        try:
+            return self.zeek_log_types[(line['type'], tabs)]
+        except KeyError:
+            log_type = get_zeek_log_type(line['type'], tabs=tabs)
+            self.zeek_log_types[(line['type'], tabs)] = log_type
+            return log_type
+
+    def set_argus_saddr_idx(self, header: str, separator: str):
+        """Finds the index of the src addr column in the given argus header line"""
+        for idx, field in enumerate(header.strip().split(separator)):
+            if 'srcaddr' in field.lower():
+                self.argus_saddr_idx = idx
+                return
+        # use the default argus column order
+        self.argus_saddr_idx = 3
+
+    def get_worker_for_line(self, line: dict) -> int:
+        """Returns the index of the profiler worker that should process the given line"""
+        if len(self.profiler_queues) == 1:
+            return 0
+        profile_ip = self.get_profile_ip(line)
+        return zlib.crc32(profile_ip.encode()) % len(self.profiler_queues)
+
+    def send_line_to_profiler(self, line: dict, to_all_workers=False):
+        """
+        Sends the given line to the profiler worker that handles its profile.
+        If profiler_batch_size is > 1 in slips.conf, lines are sent in lists of profiler_batch_size lines,
+        incomplete batches are sent by the batch flusher thread after profiler_batch_flush_interval ms
+        :param to_all_workers: used for header lines that every worker needs to see
+        """
+        if to_all_workers:
+            workers = range(len(self.profiler_queues))
+        else:
+            workers = (self.get_worker_for_line(line),)
+
+        for worker in workers:
+            if self.batch_size <= 1:
+                self.profiler_queues[worker].put(line)
+                continue
+
+            # some handlers reuse the same dict for every line, so store a copy of it
+            with self.batch_lock:
+                batch = self.lines_batches[worker]
+                if not batch:
+                    self.batch_start_times[worker] = time.time()
+                batch.append(dict(line))
+                if len(batch) >= self.batch_size:
+                    self.profiler_queues[worker].put(batch)
+                    self.lines_batches[worker] = []
+
+    def flush_lines_batch(self, worker=None):
+        """
+        Sends the lines waiting in the current batch to the profiler
+        :param worker: index of the worker to flush, flushes all of them if not given
+        """
+        if worker is None:
+            workers = range(len(self.profiler_queues))
+        else:
+            workers = (worker,)
+
+        with self.batch_lock:
+            for worker in workers:
+                if self.lines_batches[worker]:
+                    self.profiler_queues[worker].put(self.lines_batches[worker])
+                    self.lines_batches[worker] = []
+
+    def flush_old_batches(self):
+        """
+        This thread makes sure lines don't wait in an incomplete batch
+        for more than flush_interval when no new lines are arriving
+        """
+        while True:
+            time.sleep(self.flush_interval)
+            now = time.time()
+            for worker, batch in enumerate(self.lines_batches):
+                if (
+                    batch
+                    and now - self.batch_start_times[worker] >= self.flush_interval
+                ):
+                    self.flush_lines_batch(worker)
+
     def stop_queues(self):
         """Stops the profiler and output queues"""
-
-        self.profilerqueue.put('stop')
+        # send the remaining lines before telling the profiler to stop
+        self.flush_lines_batch()
+        for queue in self.profiler_queues:
+            queue.put('stop')
         self.outputqueue.put(
             '02|input|[In] No more input. Stopping input process. Sent {} lines ({}).\n'.format(
                 self.lines, datetime.now().strftime('%Y-%m-%d--%H:%M:%S')
             )
         )
         self.outputqueue.close()
-        self.profilerqueue.close()
+        for queue in self.profiler_queues:
+            queue.close()
 
     def read_nfdump_output(self) -> int:
         try:
@@ -189,167 +361,198 @@ class InputProcess(multiprocessing.Process):
                         # TODO: What is this valid line check?? explain
                         continue
                     line['data'] = nfdump_line
-                    self.profilerqueue.put(line)
+                    self.send_line_to_profiler(line)
+                self.flush_lines_batch()
 
             return lines
         except KeyboardInterrupt:
             return True
 
+    def get_file_handle(self, filename):
+        """
+        Returns the open handle of the given zeek log file,
+        opens it the first time we see it
+        """
+        # Update which files we know about
+        try:
+            # We already opened this file
+            return self.open_file_handlers[filename]
+        except KeyError:
+            # First time opening this file.
+            try:
+                file_handler = open(filename, 'r')
+                lock = threading.Lock()
+                lock.acquire()
+                self.open_file_handlers[filename] = file_handler
+                lock.release()
+                # now that we replaced the old handle with the newly created file handle
+                # delete the old .log file, they have a timestamp in their name.
+                return file_handler
+            except FileNotFoundError:
+                # for example dns.log
+                # zeek changes the dns.log file name every 1h, it adds a timestamp to it
+                # it doesn't create the new dns.log until a new dns request occurs
+                # if slips tries to read from the old dns.log now it won't find it
+                # because it's been renamed and the new one isn't created yet
+                # simply continue until the new log file is created and added to the zeek_files list
+                return False
+
+    def read_next_zeek_line(self, filename):
+        """
+        Reads lines from the given zeek file until we find one we can send
+        :return: a tuple (timestamp, line), False if the file has no new lines for now
+                or None if the file was rotated or deleted
+        """
+        file_handler = self.get_file_handle(filename)
+        if not file_handler:
+            return None
+
+        while True:
+            try:
+                zeek_line = file_handler.readline()
+            except ValueError:
+                # remover thread just finished closing all old handles.
+                # comes here if I/O operation failed due to a closed file.
+                # the handle will be reopened the next time we read from this file
+                return False if os.path.exists(filename) else None
+
+            # self.print(f'Reading from file {filename}, the line {zeek_line}', 0, 6)
+            # Did the file end?
+            if not zeek_line:
+                # We reached the end of one of the files that we were reading. Wait for more data to come
+                return False if os.path.exists(filename) else None
+
+            # Since we actually read something form any file, update the last time of read
+            self.last_updated_file_time = datetime.now()
+            try:
+                nline = json.loads(zeek_line)
+                line = {'type': filename, 'data': nline}
+
+                # All bro files have a field 'ts' with the timestamp.
+                # So we are safe here not checking the type of line
+                # In some Zeek files there may not be a ts field
+                # Like in some weird smb files
+                timestamp = nline.get('ts', 0)
+
+            except json.decoder.JSONDecodeError:
+                # It is not JSON format. It is tab format line.
+                nline = zeek_line
+                # Ignore comments at the beginning of the file.
+                if not nline or nline[0] == '#':
+                    continue
+
+                line = {'type': filename, 'data': nline}
+                timestamp = nline.split('\t')[0]
+
+            try:
+                return float(timestamp), line
+            except ValueError:
+                # this ts doesnt repr a float value, ignore it
+                continue
+
+    def get_zeek_files_to_read(self) -> set:
+        """
+        Returns the set of zeek log files we should be reading from.
+        Filenames are the log file name with .log extension in case of interface or pcap
+        and without the ext in case of zeek files
+        """
+        zeek_files = set()
+        for filename in __database__.get_all_zeek_file():
+            if not filename.endswith('.log'):
+                filename += '.log'
+            # Ignore the files that do not contain data. These are the zeek log files that we don't use
+            filename_without_ext = filename.split('/')[-1].split('.')[0]
+            if filename_without_ext in self.ignored_files:
+                continue
+            zeek_files.add(filename)
+        return zeek_files
+
     def read_zeek_files(self) -> int:
+        """
+        Merges the lines of all the zeek log files and sends them
+        to the profiler sorted by timestamp.
+        Every file has at most 1 line waiting in a heap ordered by ts,
+        the line with the smallest timestamp is always the one sent first.
+        """
         try:
-            # Get the zeek files in the folder now
-            zeek_files = __database__.get_all_zeek_file()
             self.open_file_handlers = {}
-            file_time = {}
-            cache_lines = {}
+            # Get the zeek files in the folder now
+            zeek_files = self.get_zeek_files_to_read()
+            last_zeek_files_update = time.time()
+            # heap of (ts, priority, filename, line). 1 line per file at most
+            earliest_lines = []
+            # files that don't have a line in the heap,
+            # either because their line was just sent or because they have nothing to read yet
+            files_to_read = set(zeek_files)
             # Try to keep track of when was the last update so we stop this reading
-            last_updated_file_time = datetime.now()
+            self.last_updated_file_time = datetime.now()
             lines = 0
             while True:
-                # Go to all the files generated by Zeek and read them
-                for filename in zeek_files:
-
-                    # filename is the log file name with .log extension in case of interface or pcap
-                    # and without the ext in case of zeek files
-                    if not filename.endswith('.log'):
-                        filename += '.log'
-                    # Ignore the files that do not contain data. These are the zeek log files that we don't use
-                    filename_without_ext = filename.split('/')[-1].split('.')[
-                        0
-                    ]
-                    if filename_without_ext in self.ignored_files:
-                        continue
-
-                    # Update which files we know about
-                    try:
-                        # We already opened this file
-                        file_handler = self.open_file_handlers[filename]
-                    except KeyError:
-                        # First time opening this file.
-                        try:
-                            file_handler = open(filename, 'r')
-                            lock = threading.Lock()
-                            lock.acquire()
-                            self.open_file_handlers[filename] = file_handler
-                            lock.release()
-                            # now that we replaced the old handle with the newly created file handle
-                            # delete the old .log file, they have a timestamp in their name.
-                        except FileNotFoundError:
-                            # for example dns.log
-                            # zeek changes the dns.log file name every 1h, it adds a timestamp to it
-                            # it doesn't create the new dns.log until a new dns request occurs
-                            # if slips tries to read from the old dns.log now it won't find it
-                            # because it's been renamed and the new one isn't created yet
-                            # simply continue until the new log file is created and added to the zeek_files list
-                            continue
-
-                    # Only read the next line if the previous line was sent
-                    try:
-                        _ = cache_lines[filename]
-                        # We have still something to send, do not read the next line from this file
-                    except KeyError:
-                        # We don't have any waiting line for this file, so proceed
-                        try:
-                            zeek_line = file_handler.readline()
-                        except ValueError:
-                            # remover thread just finished closing all old handles.
-                            # comes here if I/O operation failed due to a closed file.
-                            # to get the new dict of open handles.
-                            continue
-
-                        # self.print(f'Reading from file {filename}, the line {zeek_line}', 0, 6)
-                        # Did the file end?
-                        if not zeek_line:
-                            # We reached the end of one of the files that we were reading. Wait for more data to come
-                            continue
-
-                        # Since we actually read something form any file, update the last time of read
-                        last_updated_file_time = datetime.now()
-                        try:
-                            nline = json.loads(zeek_line)
-                            line = {'type': filename, 'data': nline}
-
-                            # All bro files have a field 'ts' with the timestamp.
-                            # So we are safe here not checking the type of line
-                            # In some Zeek files there may not be a ts field
-                            # Like in some weird smb files
-                            timestamp = nline.get('ts', 0)
-
-                        except json.decoder.JSONDecodeError:
-                            # It is not JSON format. It is tab format line.
-                            nline = zeek_line
-                            # Ignore comments at the beginning of the file.
-                            if not nline or nline[0] == '#':
-                                continue
-
-                            line = {'type': filename, 'data': nline}
-                            timestamp = nline.split('\t')[0]
-
-                        try:
-
-                            # is a dict with {'filename': ts, ...}
-                            file_time[filename] = float(timestamp)
-                            # self.print(f'File {filename}. TS: {timestamp}')
-                            # Store the line in the cache
-                            # self.print(f'Adding cache and time of {filename}')
-                            cache_lines[filename] = line
-                        except ValueError:
-                            # this ts doesnt repr a float value, ignore it
-                            pass
+                # Only ask the db for the list of files when filemonitor tells us zeek
+                # created a new one, or every once in a while in case we missed it
+                now = time.time()
+                if (
+                    self.zeek_files_changed.is_set()
+                    or now - last_zeek_files_update >= self.zeek_files_update_interval
+                ):
+                    self.zeek_files_changed.clear()
+                    last_zeek_files_update = now
+                    zeek_files = self.get_zeek_files_to_read()
+                    # read the files that exist now and don't have a line in the heap.
+                    # files that were rotated or deleted are read again once zeek creates them
+                    files_in_heap = {line[2] for line in earliest_lines}
+                    files_to_read = {
+                        filename
+                        for filename in zeek_files
+                        if filename not in files_in_heap and os.path.exists(filename)
+                    }
+
+                # Only read the next line of a file if the previous line was sent
+                for filename in list(files_to_read):
+                    if next_line := self.read_next_zeek_line(filename):
+                        timestamp, line = next_line
+                        # to fix the problem of evidence being generated BEFORE their corresponding flows are added to our db
+                        # when 2 lines have the same ts, send the dns.log line first
+                        # (make it a priority to avoid FP connection without dns resolution alerts)
+                        priority = 0 if 'dns' in filename.split('/')[-1] else 1
+                        heapq.heappush(
+                            earliest_lines,
+                            (timestamp, priority, filename, line),
+                        )
+                        files_to_read.discard(filename)
+                    elif next_line is None:
+                        # the file was rotated or deleted, it's read again
+                        # when the list of files is refreshed
+                        files_to_read.discard(filename)
 
                 ###################################################################################
                 # Out of the for that check each Zeek file one by one
-                # self.print('Cached lines: {}'.format(str(cache_lines)))
-
-                # If we don't have any cached lines to send, it may mean that new lines are not arriving. Check
-                if not cache_lines:
+                if not earliest_lines:
+                    # If we don't have any lines to send, it may mean that new lines are not arriving.
                     # Verify that we didn't have any new lines in the
                     # last 10 seconds. Seems enough for any network to have ANY traffic
-                    now = datetime.now()
-                    diff = now - last_updated_file_time
-                    diff = diff.seconds
-                    if diff >= self.bro_timeout:
+                    diff = datetime.now() - self.last_updated_file_time
+                    if diff.seconds >= self.bro_timeout:
                         # It has been 10 seconds without any file
                         # being updated. So stop Zeek
                         break
-
-                # Now read lines in order. The line with the smallest timestamp first
-                files_sorted_by_ts = sorted(file_time, key=file_time.get)
-                # self.print('Sorted times: {}'.format(str(files_sorted_by_ts)))
-                try:
-                    # get the file that has the earliest flow
-                    file_with_earliest_flow = files_sorted_by_ts[0]
-                except IndexError:
-                    # No more sorted keys. Just loop waiting for more lines
+                    # Just loop waiting for more lines
                     # It may happen that we check all the files in the folder, and there is still no file for us.
                     # To cover this case, just refresh the list of files
-                    zeek_files = __database__.get_all_zeek_file()
+                    self.zeek_files_changed.set()
                     time.sleep(1)
                     continue
 
-                # to fix the problem of evidence being generated BEFORE their corresponding flows are added to our db
-                # make sure we read flows in the following order:
-                # dns.log  (make it a priority to avoid FP connection without dns resolution alerts)
-                # conn.log
-                # any other flow
-                # for key in cache_lines:
-                #     if 'dns' in key:
-                #         file_with_earliest_flow = key
-                #         break
-                # comes here if we're done with all conn.log flows and it's time to process other files
-                line_to_send = cache_lines[file_with_earliest_flow]
-
-                # self.print('Line to send from file {}. {}'.format(file_with_earliest_flow, line_to_send))
+                # Now send the line with the smallest timestamp
+                (_, _, file_with_earliest_flow, line_to_send) = heapq.heappop(
+                    earliest_lines
+                )
                 self.print('	> Sent Line: {}'.format(line_to_send), 0, 3)
-                self.profilerqueue.put(line_to_send)
+                self.send_line_to_profiler(line_to_send)
                 # Count the read lines
                 lines += 1
-                # Delete this line from the cache and the time list
-                # self.print('Deleting cache and time of {}'.format(earliest_flow))
-                del cache_lines[file_with_earliest_flow]
-                del file_time[file_with_earliest_flow]
-                # Get the new list of files. Since new files may have been created by Zeek while we were processing them.
-                zeek_files = __database__.get_all_zeek_file()
+                # read the next line of this file in the next iteration
+                files_to_read.add(file_with_earliest_flow)
 
             ################
             # Out of the while
@@ -410,7 +613,13 @@ class InputProcess(multiprocessing.Process):
 
             line_info['data'] = line
             self.print(f'	> Sent Line: {line_info}', 0, 3)
-            self.profilerqueue.put(line_info)
+            if 'argus' in self.line_type and self.argus_saddr_idx is None:
+                # this is the header line, all profiler workers need it to define the columns
+                separator = '\t' if '\t' in line else ','
+                self.set_argus_saddr_idx(line, separator)
+                self.send_line_to_profiler(line_info, to_all_workers=True)
+            else:
+                self.send_line_to_profiler(line_info)
             self.lines += 1
 
         self.stop_queues()
@@ -431,8 +640,12 @@ class InputProcess(multiprocessing.Process):
                 if '\t' in t_line:
                     # this is the header line
                     line['type'] = 'argus-tabs'
+                    self.set_argus_saddr_idx(t_line, '\t')
+                else:
+                    self.set_argus_saddr_idx(t_line, ',')
                 line['data'] = t_line
-                self.profilerqueue.put(line)
+                # all profiler workers need the header to define the columns
+                self.send_line_to_profiler(line, to_all_workers=True)
                 self.lines += 1
 
                 # go through the rest of the file
@@ -441,7 +654,7 @@ class InputProcess(multiprocessing.Process):
                     line['data'] = t_line
                     # argus files are either tab separated orr comma separated
                     if len(t_line.strip()) != 0:
-                        self.profilerqueue.put(line)
+                        self.send_line_to_profiler(line)
                     self.lines += 1
 
             self.stop_queues()
@@ -459,7 +672,7 @@ class InputProcess(multiprocessing.Process):
                     line['data'] = t_line
                     self.print(f'	> Sent Line: {line}', 0, 3)
                     if len(t_line.strip()) != 0:
-                        self.profilerqueue.put(line)
+                        self.send_line_to_profiler(line)
                     self.lines += 1
             self.stop_queues()
             return True
@@ -512,7 +725,12 @@ class InputProcess(multiprocessing.Process):
             # some process to tell us which files to read in real time when they appear
             # Get the file eventhandler
             # We have to set event_handler and event_observer before running zeek.
-            self.event_handler = FileEventHandler(self.config, self.redis_port, self.zeek_folder)
+            self.event_handler = FileEventHandler(
+                self.config,
+                self.redis_port,
+                self.zeek_folder,
+                zeek_files_changed=self.zeek_files_changed,
+            )
             # Create an observer
             self.event_observer = Observer()
             # Schedule the observer with the callback on the file handler
@@ -643,6 +861,8 @@ class InputProcess(multiprocessing.Process):
         # any changes made to the shared variables in inputprocess will not appear in the thread
         if '-i' in sys.argv:
             self.remover_thread.start()
+        if self.batch_size > 1:
+            self.batch_flusher_thread.start()
         try:
             # Process the file that was given
             # If the type of file is 'file (-f) and the name of the file is '-' then read from stdin
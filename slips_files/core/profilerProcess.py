@@ -24,14 +24,20 @@ from .database import __database__
 from slips_files.common.slips_utils import utils
 import ipaddress
 import traceback
+import bisect
+from collections import OrderedDict
 import requests
 import os
 import binascii
 import base64
 import validators
-from re import split
 from tzlocal import get_localzone
 from .whitelist import Whitelist
+from slips_files.common.zeek_logs import (
+    get_zeek_log_type,
+    get_zeek_profile_ip,
+    split_zeek_tabs_line,
+)
 
 
 # Profiler Process
@@ -39,10 +45,16 @@ class ProfilerProcess(multiprocessing.Process):
     """A class to create the profiles for IPs and the rest of data"""
 
     def __init__(
-        self, inputqueue, outputqueue, verbose, debug, config, redis_port
+        self, inputqueue, outputqueue, verbose, debug, config, redis_port, worker_id=0
     ):
         self.name = 'ProfilerProcess'
         multiprocessing.Process.__init__(self)
+        # when profiler_workers is > 1 in slips.conf, each worker gets the flows of a part of the profiles
+        self.worker_id = worker_id
+        # the name used for storing the PID of this worker and for confirming that it's done in finished_modules
+        self.process_name = (
+            'ProfilerProcess' if worker_id == 0 else f'ProfilerProcess_{worker_id}'
+        )
         self.inputqueue = inputqueue
         self.outputqueue = outputqueue
         self.config = config
@@ -69,6 +81,13 @@ class ProfilerProcess(multiprocessing.Process):
         # there has to be a timeout or it will wait forever and never receive a new line
         self.timeout = 0.0000001
         self.c1 = __database__.subscribe('reload_whitelist')
+        # {(zeek file, is tab separated): (log_type, parser)}
+        self.zeek_parsers = {}
+        # the TWs of each profile seen by this profiler, used to find the TW of a flow without asking redis
+        # {profileid: ([sorted start times], [twids])}
+        self.tws_index = OrderedDict()
+        # the least recently used profiles are removed from the index after this many
+        self.tws_index_size = 10000
         self.separators = {
             'zeek': '',
             'suricata': '',
@@ -656,19 +675,32 @@ class ProfilerProcess(multiprocessing.Process):
         # pass
         return defined_datetime
 
+    def get_zeek_parser(self, file_type: str, tabs=False) -> tuple:
+        """
+        Returns the zeek log type of the given file and the function that parses its lines.
+        The parser is chosen the first time we see a file and cached in self.zeek_parsers
+        :param file_type: the name of the zeek file the line was read from
+        :return: (log_type, parser). parser is None if we only set the type of this log.
+            log_type is False if slips doesn't support this file
+        """
+        try:
+            return self.zeek_parsers[(file_type, tabs)]
+        except KeyError:
+            pass
+
+        prefix = 'process_zeek_tabs_' if tabs else 'process_zeek_'
+        parser = (False, None)
+        if log_type := get_zeek_log_type(file_type, tabs=tabs):
+            parser = (log_type, getattr(self, prefix + log_type, None))
+        self.zeek_parsers[(file_type, tabs)] = parser
+        return parser
+
     def process_zeek_tabs_input(self, new_line: str) -> None:
         """
         Process the tab line from zeek.
         """
-        line = new_line['data']
-        line = line.rstrip('\n')
-        # the data is either \t separated or space separated
-        if '\t' in line:
-            line = line.split('\t')
-        else:
-            # zeek files that are space separated are either separated by 2 or 3 spaces so we can't use python's split()
-            # using regex split, split line when you encounter more than 2 spaces in a row
-            line = split(r'\s{2,}', line)
+        line = split_zeek_tabs_line(new_line['data'])
+        log_type, parser = self.get_zeek_parser(new_line['type'], tabs=True)
 
         # Generic fields in Zeek
         self.column_values: dict = {}
@@ -684,433 +716,401 @@ class ProfilerProcess(multiprocessing.Process):
             self.column_values['uid'] = line[1]
         except IndexError:
             self.column_values['uid'] = False
-        try:
-            self.column_values['saddr'] = line[2]
-        except IndexError:
-            self.column_values['saddr'] = ''
+        self.column_values['saddr'] = get_zeek_profile_ip(log_type, line)
         try:
             self.column_values['daddr'] = line[4]
         except IndexError:
             self.column_values['daddr'] = ''
 
-        if 'conn.log' in new_line['type']:
-            self.column_values['type'] = 'conn'
-            try:
-                self.column_values['dur'] = float(line[8])
-            except (IndexError, ValueError):
-                self.column_values['dur'] = 0
-            self.column_values['endtime'] = str(
-                self.column_values['starttime']
-            ) + str(timedelta(seconds=self.column_values['dur']))
-            self.column_values['proto'] = line[6]
-            try:
-                self.column_values['appproto'] = line[7]
-            except IndexError:
-                # no service recognized
-                self.column_values['appproto'] = ''
-            try:
-                self.column_values['sport'] = line[3]
-            except IndexError:
-                self.column_values['sport'] = ''
-            self.column_values['dir'] = '->'
-            try:
-                self.column_values['dport'] = line[5]
-            except IndexError:
-                self.column_values['dport'] = ''
-            try:
-                self.column_values['state'] = line[11]
-            except IndexError:
-                self.column_values['state'] = ''
-            try:
-                self.column_values['spkts'] = float(line[16])
-            except (IndexError, ValueError):
-                self.column_values['spkts'] = 0
-            try:
-                self.column_values['dpkts'] = float(line[18])
-            except (IndexError, ValueError):
-                self.column_values['dpkts'] = 0
-            self.column_values['pkts'] = (
-                self.column_values['spkts'] + self.column_values['dpkts']
-            )
-            try:
-                self.column_values['sbytes'] = float(line[9])
-            except (IndexError, ValueError):
-                self.column_values['sbytes'] = 0
-            try:
-                self.column_values['dbytes'] = float(line[10])
-            except (IndexError, ValueError):
-                self.column_values['dbytes'] = 0
-            self.column_values['bytes'] = (
-                self.column_values['sbytes'] + self.column_values['dbytes']
-            )
-            try:
-                self.column_values['state_hist'] = line[15]
-            except IndexError:
-                self.column_values['state_hist'] = self.column_values['state']
+        if parser:
+            parser(line)
+        elif log_type:
+            # we don't parse any field of this type
+            self.column_values['type'] = log_type
 
-            try:
-                self.column_values['state_hist'] = line[15]
-            except IndexError:
-                self.column_values['state_hist'] = self.column_values['state']
+    def process_zeek_tabs_conn(self, line: list):
+        """Parses the fields of a conn.log tab separated line"""
+        self.column_values['type'] = 'conn'
+        try:
+            self.column_values['dur'] = float(line[8])
+        except (IndexError, ValueError):
+            self.column_values['dur'] = 0
+        self.column_values['proto'] = line[6]
+        try:
+            self.column_values['appproto'] = line[7]
+        except IndexError:
+            # no service recognized
+            self.column_values['appproto'] = ''
+        try:
+            self.column_values['sport'] = line[3]
+        except IndexError:
+            self.column_values['sport'] = ''
+        self.column_values['dir'] = '->'
+        try:
+            self.column_values['dport'] = line[5]
+        except IndexError:
+            self.column_values['dport'] = ''
+        try:
+            self.column_values['state'] = line[11]
+        except IndexError:
+            self.column_values['state'] = ''
+        try:
+            self.column_values['spkts'] = float(line[16])
+        except (IndexError, ValueError):
+            self.column_values['spkts'] = 0
+        try:
+            self.column_values['dpkts'] = float(line[18])
+        except (IndexError, ValueError):
+            self.column_values['dpkts'] = 0
+        self.column_values['pkts'] = (
+            self.column_values['spkts'] + self.column_values['dpkts']
+        )
+        try:
+            self.column_values['sbytes'] = float(line[9])
+        except (IndexError, ValueError):
+            self.column_values['sbytes'] = 0
+        try:
+            self.column_values['dbytes'] = float(line[10])
+        except (IndexError, ValueError):
+            self.column_values['dbytes'] = 0
+        self.column_values['bytes'] = (
+            self.column_values['sbytes'] + self.column_values['dbytes']
+        )
+        try:
+            self.column_values['state_hist'] = line[15]
+        except IndexError:
+            self.column_values['state_hist'] = self.column_values['state']
 
-            try:
-                self.column_values['smac'] = line[21]
-            except IndexError:
-                self.column_values['smac'] = ''
+        try:
+            self.column_values['smac'] = line[21]
+        except IndexError:
+            self.column_values['smac'] = ''
 
-            try:
-                self.column_values['dmac'] = line[22]
-            except IndexError:
-                self.column_values['dmac'] = ''
+        try:
+            self.column_values['dmac'] = line[22]
+        except IndexError:
+            self.column_values['dmac'] = ''
 
-        elif 'dns.log' in new_line['type']:
-            self.column_values['type'] = 'dns'
-            try:
-                self.column_values['query'] = line[9]
-            except IndexError:
-                self.column_values['query'] = ''
-            try:
-                self.column_values['qclass_name'] = line[11]
-            except IndexError:
-                self.column_values['qclass_name'] = ''
-            try:
-                self.column_values['qtype_name'] = line[13]
-            except IndexError:
-                self.column_values['qtype_name'] = ''
-            try:
-                self.column_values['rcode_name'] = line[15]
-            except IndexError:
-                self.column_values['rcode_name'] = ''
-            try:
-                self.column_values['answers'] = line[21]
-                if type(self.column_values['answers']) == str:
-                    # If the answer is only 1, Zeek gives a string
-                    # so convert to a list
-                    self.column_values['answers'] = [
-                        self.column_values['answers']
-                    ]
-            except IndexError:
-                self.column_values['answers'] = ''
-            try:
-                self.column_values['TTLs'] = line[22]
-            except IndexError:
-                self.column_values['TTLs'] = ''
-        elif 'http.log' in new_line['type']:
-            self.column_values['type'] = 'http'
-            try:
-                self.column_values['method'] = line[7]
-            except IndexError:
-                self.column_values['method'] = ''
-            try:
-                self.column_values['host'] = line[8]
-            except IndexError:
-                self.column_values['host'] = ''
-            try:
-                self.column_values['uri'] = line[9]
-            except IndexError:
-                self.column_values['uri'] = ''
-            try:
-                self.column_values['httpversion'] = line[11]
-            except IndexError:
-                self.column_values['httpversion'] = ''
-            try:
-                self.column_values['user_agent'] = line[12]
-            except IndexError:
-                self.column_values['user_agent'] = ''
-            try:
-                self.column_values['request_body_len'] = line[13]
-            except IndexError:
-                self.column_values['request_body_len'] = 0
-            try:
-                self.column_values['response_body_len'] = line[14]
-            except IndexError:
-                self.column_values['response_body_len'] = 0
-            try:
-                self.column_values['status_code'] = line[15]
-            except IndexError:
-                self.column_values['status_code'] = ''
+    def process_zeek_tabs_dns(self, line: list):
+        """Parses the fields of a dns.log tab separated line"""
+        self.column_values['type'] = 'dns'
+        try:
+            self.column_values['query'] = line[9]
+        except IndexError:
+            self.column_values['query'] = ''
+        try:
+            self.column_values['qclass_name'] = line[11]
+        except IndexError:
+            self.column_values['qclass_name'] = ''
+        try:
+            self.column_values['qtype_name'] = line[13]
+        except IndexError:
+            self.column_values['qtype_name'] = ''
+        try:
+            self.column_values['rcode_name'] = line[15]
+        except IndexError:
+            self.column_values['rcode_name'] = ''
+        try:
+            self.column_values['answers'] = line[21]
+            if type(self.column_values['answers']) == str:
+                # If the answer is only 1, Zeek gives a string
+                # so convert to a list
+                self.column_values['answers'] = [
+                    self.column_values['answers']
+                ]
+        except IndexError:
+            self.column_values['answers'] = ''
+        try:
+            self.column_values['TTLs'] = line[22]
+        except IndexError:
+            self.column_values['TTLs'] = ''
+
+    def process_zeek_tabs_http(self, line: list):
+        """Parses the fields of a http.log tab separated line"""
+        self.column_values['type'] = 'http'
+        try:
+            self.column_values['method'] = line[7]
+        except IndexError:
+            self.column_values['method'] = ''
+        try:
+            self.column_values['host'] = line[8]
+        except IndexError:
+            self.column_values['host'] = ''
+        try:
+            self.column_values['uri'] = line[9]
+        except IndexError:
+            self.column_values['uri'] = ''
+        try:
+            self.column_values['httpversion'] = line[11]
+        except IndexError:
+            self.column_values['httpversion'] = ''
+        try:
+            self.column_values['user_agent'] = line[12]
+        except IndexError:
+            self.column_values['user_agent'] = ''
+        try:
+            self.column_values['request_body_len'] = line[13]
+        except IndexError:
+            self.column_values['request_body_len'] = 0
+        try:
+            self.column_values['response_body_len'] = line[14]
+        except IndexError:
+            self.column_values['response_body_len'] = 0
+        try:
+            self.column_values['status_code'] = line[15]
+        except IndexError:
+            self.column_values['status_code'] = ''
+        try:
+            self.column_values['status_msg'] = line[16]
+        except IndexError:
+            self.column_values['status_msg'] = ''
+        try:
+            self.column_values['resp_mime_types'] = line[28]
+        except IndexError:
+            self.column_values['resp_mime_types'] = ''
+        try:
+            self.column_values['resp_fuids'] = line[26]
+        except IndexError:
+            self.column_values['resp_fuids'] = ''
+
+    def process_zeek_tabs_ssl(self, line: list):
+        """Parses the fields of a ssl.log tab separated line"""
+        self.column_values['type'] = 'ssl'
+        try:
+            self.column_values['sport'] = line[3]
+        except IndexError:
+            self.column_values['sport'] = ''
+        try:
+            self.column_values['dport'] = line[5]
+        except IndexError:
+            self.column_values['dport'] = ''
+        try:
+            self.column_values['sslversion'] = line[6]
+        except IndexError:
+            self.column_values['sslversion'] = ''
+        try:
+            self.column_values['cipher'] = line[7]
+        except IndexError:
+            self.column_values['cipher'] = ''
+        try:
+            self.column_values['curve'] = line[8]
+        except IndexError:
+            self.column_values['curve'] = ''
+        try:
+            self.column_values['server_name'] = line[9]
+        except IndexError:
+            self.column_values['server_name'] = ''
+        try:
+            self.column_values['resumed'] = line[10]
+        except IndexError:
+            self.column_values['resumed'] = ''
+        try:
+            self.column_values['established'] = line[13]
+        except IndexError:
+            self.column_values['established'] = ''
+        try:
+            self.column_values['cert_chain_fuids'] = line[14]
+        except IndexError:
+            self.column_values['cert_chain_fuids'] = ''
+        try:
+            self.column_values['client_cert_chain_fuids'] = line[15]
+        except IndexError:
+            self.column_values['client_cert_chain_fuids'] = ''
+        try:
+            self.column_values['subject'] = line[16]
+        except IndexError:
+            self.column_values['subject'] = ''
+        try:
+            self.column_values['issuer'] = line[17]
+        except IndexError:
+            self.column_values['issuer'] = ''
+        try:
+            self.column_values['validation_status'] = line[20]
+        except IndexError:
+            self.column_values['validation_status'] = ''
+
+        try:
+            self.column_values['ja3'] = line[21]
+        except IndexError:
+            self.column_values['ja3'] = ''
+        try:
+            self.column_values['ja3s'] = line[22]
+        except IndexError:
+            self.column_values['ja3s'] = ''
+
+        try:
+            self.column_values['is_DoH'] = line[23]
+        except IndexError:
+            self.column_values['is_DoH'] = ''
+
+    def process_zeek_tabs_ssh(self, line: list):
+        """Parses the fields of a ssh.log tab separated line"""
+        self.column_values['type'] = 'ssh'
+        try:
+            self.column_values['version'] = line[6]
+        except IndexError:
+            self.column_values['version'] = ''
+        # Zeek can put in column 7 the auth success if it has one
+        # or the auth attempts only. However if the auth
+        # success is there, the auth attempts are too.
+        if 'success' in line[7]:
             try:
-                self.column_values['status_msg'] = line[16]
+                self.column_values['auth_success'] = line[7]
             except IndexError:
-                self.column_values['status_msg'] = ''
+                self.column_values['auth_success'] = ''
             try:
-                self.column_values['resp_mime_types'] = line[28]
+                self.column_values['auth_attempts'] = line[8]
             except IndexError:
-                self.column_values['resp_mime_types'] = ''
+                self.column_values['auth_attempts'] = ''
             try:
-                self.column_values['resp_fuids'] = line[26]
+                self.column_values['client'] = line[10]
             except IndexError:
-                self.column_values['resp_fuids'] = ''
-
-        elif 'ssl.log' in new_line['type']:
-            self.column_values['type'] = 'ssl'
+                self.column_values['client'] = ''
             try:
-                self.column_values['sport'] = line[3]
+                self.column_values['server'] = line[11]
             except IndexError:
-                self.column_values['sport'] = ''
+                self.column_values['server'] = ''
             try:
-                self.column_values['dport'] = line[5]
+                self.column_values['cipher_alg'] = line[12]
             except IndexError:
-                self.column_values['dport'] = ''
+                self.column_values['cipher_alg'] = ''
             try:
-                self.column_values['sslversion'] = line[6]
+                self.column_values['mac_alg'] = line[13]
             except IndexError:
-                self.column_values['sslversion'] = ''
+                self.column_values['mac_alg'] = ''
             try:
-                self.column_values['cipher'] = line[7]
+                self.column_values['compression_alg'] = line[14]
             except IndexError:
-                self.column_values['cipher'] = ''
+                self.column_values['compression_alg'] = ''
             try:
-                self.column_values['curve'] = line[8]
+                self.column_values['kex_alg'] = line[15]
             except IndexError:
-                self.column_values['curve'] = ''
+                self.column_values['kex_alg'] = ''
             try:
-                self.column_values['server_name'] = line[9]
+                self.column_values['host_key_alg'] = line[16]
             except IndexError:
-                self.column_values['server_name'] = ''
+                self.column_values['host_key_alg'] = ''
             try:
-                self.column_values['resumed'] = line[10]
+                self.column_values['host_key'] = line[17]
             except IndexError:
-                self.column_values['resumed'] = ''
+                self.column_values['host_key'] = ''
+        elif 'success' not in line[7]:
+            self.column_values['auth_success'] = ''
             try:
-                self.column_values['established'] = line[13]
+                self.column_values['auth_attempts'] = line[7]
             except IndexError:
-                self.column_values['established'] = ''
+                self.column_values['auth_attempts'] = ''
             try:
-                self.column_values['cert_chain_fuids'] = line[14]
+                self.column_values['client'] = line[9]
             except IndexError:
-                self.column_values['cert_chain_fuids'] = ''
+                self.column_values['client'] = ''
             try:
-                self.column_values['client_cert_chain_fuids'] = line[15]
+                self.column_values['server'] = line[10]
             except IndexError:
-                self.column_values['client_cert_chain_fuids'] = ''
+                self.column_values['server'] = ''
             try:
-                self.column_values['subject'] = line[16]
+                self.column_values['cipher_alg'] = line[11]
             except IndexError:
-                self.column_values['subject'] = ''
+                self.column_values['cipher_alg'] = ''
             try:
-                self.column_values['issuer'] = line[17]
+                self.column_values['mac_alg'] = line[12]
             except IndexError:
-                self.column_values['issuer'] = ''
+                self.column_values['mac_alg'] = ''
             try:
-                self.column_values['validation_status'] = line[20]
+                self.column_values['compression_alg'] = line[13]
             except IndexError:
-                self.column_values['validation_status'] = ''
-
+                self.column_values['compression_alg'] = ''
             try:
-                self.column_values['ja3'] = line[21]
+                self.column_values['kex_alg'] = line[14]
             except IndexError:
-                self.column_values['ja3'] = ''
+                self.column_values['kex_alg'] = ''
             try:
-                self.column_values['ja3s'] = line[22]
+                self.column_values['host_key_alg'] = line[15]
             except IndexError:
-                self.column_values['ja3s'] = ''
-
+                self.column_values['host_key_alg'] = ''
             try:
-                self.column_values['is_DoH'] = line[23]
+                self.column_values['host_key'] = line[16]
             except IndexError:
-                self.column_values['is_DoH'] = ''
+                self.column_values['host_key'] = ''
+
+    def process_zeek_tabs_dhcp(self, line: list):
+        """Parses the fields of a dhcp.log tab separated line"""
+        self.column_values['type'] = 'dhcp'
+        #  daddr in dhcp.log is the server_addr at index 3, not 4 like most log files
+        self.column_values['daddr'] = line[3]
+        self.column_values['client_addr'] = line[2]   # the same as saddr
+        self.column_values['server_addr'] = line[3]
+        self.column_values['mac'] = line[4]   # this is the client mac
+        self.column_values['host_name'] = line[5]
+        self.column_values['daddr'] = self.column_values['server_addr']
+
+    def process_zeek_tabs_ftp(self, line: list):
+        """Parses the fields of a ftp.log tab separated line"""
+        self.column_values['type'] = 'ftp'
+        self.column_values['used_port'] = line[17]
+
+    def process_zeek_tabs_smtp(self, line: list):
+        """Parses the fields of a smtp.log tab separated line"""
+        # "ts uid id.orig_h id.orig_p id.resp_h id.resp_p trans_depth helo mailfrom
+        # rcptto date from to reply_to msg_id in_reply_to subject x_originating_ip
+        # first_received second_received last_reply path user_agent tls fuids is_webmail"
+        self.column_values['type'] = 'smtp'
+        self.column_values['last_reply'] = line[20]
+
+    def process_zeek_tabs_notice(self, line: list):
+        """Parses the fields of a notice.log tab separated line"""
+        # fields	ts	uid	id.orig_h	id.orig_p	id.resp_h	id.resp_p	fuid	file_mime_type	file_desc
+        # proto	note	msg	sub	src	dst	p	n	peer_descr	actions	suppress_for
+        self.column_values['type'] = 'notice'
+        # portscan notices don't have id.orig_h or id.resp_h fields, instead they have src and dst.
+        # the saddr is already the src field
+        if self.column_values['daddr'] == '-':
+            self.column_values['daddr'] = line[14]  #  dst field
+            if self.column_values['daddr'] == '-':
+                self.column_values['daddr'] = self.column_values['saddr']
 
-        elif 'ssh.log' in new_line['type']:
-            self.column_values['type'] = 'ssh'
+        self.column_values['dport'] = line[5]   # id.orig_p
+        if self.column_values['dport'] == '-':
             try:
-                self.column_values['version'] = line[6]
+                self.column_values['dport'] = line[15]   # p field
             except IndexError:
-                self.column_values['version'] = ''
-            # Zeek can put in column 7 the auth success if it has one
-            # or the auth attempts only. However if the auth
-            # success is there, the auth attempts are too.
-            if 'success' in line[7]:
-                try:
-                    self.column_values['auth_success'] = line[7]
-                except IndexError:
-                    self.column_values['auth_success'] = ''
-                try:
-                    self.column_values['auth_attempts'] = line[8]
-                except IndexError:
-                    self.column_values['auth_attempts'] = ''
-                try:
-                    self.column_values['client'] = line[10]
-                except IndexError:
-                    self.column_values['client'] = ''
-                try:
-                    self.column_values['server'] = line[11]
-                except IndexError:
-                    self.column_values['server'] = ''
-                try:
-                    self.column_values['cipher_alg'] = line[12]
-                except IndexError:
-                    self.column_values['cipher_alg'] = ''
-                try:
-                    self.column_values['mac_alg'] = line[13]
-                except IndexError:
-                    self.column_values['mac_alg'] = ''
-                try:
-                    self.column_values['compression_alg'] = line[14]
-                except IndexError:
-                    self.column_values['compression_alg'] = ''
-                try:
-                    self.column_values['kex_alg'] = line[15]
-                except IndexError:
-                    self.column_values['kex_alg'] = ''
-                try:
-                    self.column_values['host_key_alg'] = line[16]
-                except IndexError:
-                    self.column_values['host_key_alg'] = ''
-                try:
-                    self.column_values['host_key'] = line[17]
-                except IndexError:
-                    self.column_values['host_key'] = ''
-            elif 'success' not in line[7]:
-                self.column_values['auth_success'] = ''
-                try:
-                    self.column_values['auth_attempts'] = line[7]
-                except IndexError:
-                    self.column_values['auth_attempts'] = ''
-                try:
-                    self.column_values['client'] = line[9]
-                except IndexError:
-                    self.column_values['client'] = ''
-                try:
-                    self.column_values['server'] = line[10]
-                except IndexError:
-                    self.column_values['server'] = ''
-                try:
-                    self.column_values['cipher_alg'] = line[11]
-                except IndexError:
-                    self.column_values['cipher_alg'] = ''
-                try:
-                    self.column_values['mac_alg'] = line[12]
-                except IndexError:
-                    self.column_values['mac_alg'] = ''
-                try:
-                    self.column_values['compression_alg'] = line[13]
-                except IndexError:
-                    self.column_values['compression_alg'] = ''
-                try:
-                    self.column_values['kex_alg'] = line[14]
-                except IndexError:
-                    self.column_values['kex_alg'] = ''
-                try:
-                    self.column_values['host_key_alg'] = line[15]
-                except IndexError:
-                    self.column_values['host_key_alg'] = ''
-                try:
-                    self.column_values['host_key'] = line[16]
-                except IndexError:
-                    self.column_values['host_key'] = ''
-        elif 'irc' in new_line['type']:
-            self.column_values['type'] = 'irc'
-        elif 'long' in new_line['type']:
-            self.column_values['type'] = 'long'
-        elif 'dhcp.log' in new_line['type']:
-            self.column_values['type'] = 'dhcp'
-            #  daddr in dhcp.log is the server_addr at index 3, not 4 like most log files
-            self.column_values['daddr'] = line[3]
-            self.column_values['client_addr'] = line[2]   # the same as saddr
-            self.column_values['server_addr'] = line[3]
-            self.column_values['mac'] = line[4]   # this is the client mac
-            self.column_values['host_name'] = line[5]
-            self.column_values['saddr'] = self.column_values['client_addr']
-            self.column_values['daddr'] = self.column_values['server_addr']
-
-        elif 'dce_rpc' in new_line['type']:
-            self.column_values['type'] = 'dce_rpc'
-        elif 'dnp3' in new_line['type']:
-            self.column_values['type'] = 'dnp3'
-        elif 'ftp' in new_line['type']:
-            self.column_values['type'] = 'ftp'
-            self.column_values['used_port'] = line[17]
-        elif 'kerberos' in new_line['type']:
-            self.column_values['type'] = 'kerberos'
-        elif 'mysql' in new_line['type']:
-            self.column_values['type'] = 'mysql'
-        elif 'modbus' in new_line['type']:
-            self.column_values['type'] = 'modbus'
-        elif 'ntlm' in new_line['type']:
-            self.column_values['type'] = 'ntlm'
-        elif 'rdp' in new_line['type']:
-            self.column_values['type'] = 'rdp'
-        elif 'sip' in new_line['type']:
-            self.column_values['type'] = 'sip'
-        elif 'smb_cmd' in new_line['type']:
-            self.column_values['type'] = 'smb_cmd'
-        elif 'smb_files' in new_line['type']:
-            self.column_values['type'] = 'smb_files'
-        elif 'smb_mapping' in new_line['type']:
-            self.column_values['type'] = 'smb_mapping'
-        elif 'smtp.log' in new_line['type']:
-            # "ts uid id.orig_h id.orig_p id.resp_h id.resp_p trans_depth helo mailfrom
-            # rcptto date from to reply_to msg_id in_reply_to subject x_originating_ip
-            # first_received second_received last_reply path user_agent tls fuids is_webmail"
-            self.column_values['type'] = 'smtp'
-            self.column_values['last_reply'] = line[20]
-        elif 'socks.log' in new_line['type']:
-            self.column_values['type'] = 'socks'
-        elif 'syslog.log' in new_line['type']:
-            self.column_values['type'] = 'syslog'
-        elif 'tunnel.log' in new_line['type']:
-            self.column_values['type'] = 'tunnel'
-        elif 'notice.log' in new_line['type']:
-            # fields	ts	uid	id.orig_h	id.orig_p	id.resp_h	id.resp_p	fuid	file_mime_type	file_desc
-            # proto	note	msg	sub	src	dst	p	n	peer_descr	actions	suppress_for
-            self.column_values['type'] = 'notice'
-            # portscan notices don't have id.orig_h or id.resp_h fields, instead they have src and dst
-            if self.column_values['saddr'] == '-':
-                try:
-                    self.column_values['saddr'] = line[13]   #  src field
-                except IndexError:
-                    # line doesn't have a p field
-                    # keep it - as it is
-                    pass
-
-            if self.column_values['daddr'] == '-':
-                self.column_values['daddr'] = line[14]  #  dst field
-                if self.column_values['daddr'] == '-':
-                    self.column_values['daddr'] = self.column_values['saddr']
-
-            self.column_values['dport'] = line[5]   # id.orig_p
-            if self.column_values['dport'] == '-':
-                try:
-                    self.column_values['dport'] = line[15]   # p field
-                except IndexError:
-                    # line doesn't have a p field
-                    # keep it - as it is
-                    pass
-            self.column_values['sport'] = line[3]
-            self.column_values['note'] = line[10]
-            self.column_values['scanning_ip'] = self.column_values['saddr']
-            self.column_values['scanned_port'] = self.column_values['dport']
-            self.column_values['msg'] = line[
-                11
-            ]   # we're looking for self signed certs in this field
-        elif 'files.log' in new_line['type']:
-            """Parse the fields we're interested in in the files.log file"""
-            # the slash before files to distinguish between 'files' in the dir name and file.log
-            self.column_values.update(
-                {
-                    'type': 'files',
-                    'uid': line[4],
-                    'saddr': line[2],
-                    'daddr': line[3],  # rx_hosts
-                    'size': line[13],  # downloaded file size
-                    'md5': line[19],
-                    # used for detecting ssl certs
-                    'source': line[5],
-                    'analyzers': line[7],
-                    'sha1': line[19],
-                }
-            )
-
-        elif 'arp.log' in new_line['type']:
-            self.column_values['type'] = 'arp'
-            self.column_values['operation'] = line[1]
-            self.column_values['src_mac'] = line[2]
-            self.column_values['dst_mac'] = line[3]
-            self.column_values['saddr'] = line[4]
-            self.column_values['daddr'] = line[5]
-            self.column_values['src_hw'] = line[6]
-            self.column_values['dst_hw'] = line[7]
+                # line doesn't have a p field
+                # keep it - as it is
+                pass
+        self.column_values['sport'] = line[3]
+        self.column_values['note'] = line[10]
+        self.column_values['scanning_ip'] = self.column_values['saddr']
+        self.column_values['scanned_port'] = self.column_values['dport']
+        self.column_values['msg'] = line[
+            11
+        ]   # we're looking for self signed certs in this field
+
+    def process_zeek_tabs_files(self, line: list):
+        """Parse the fields we're interested in in the files.log file"""
+        # the slash before files to distinguish between 'files' in the dir name and file.log
+        self.column_values['type'] = 'files'
+        self.column_values.update(
+            {
+                'uid': line[4],
+                'daddr': line[3],  # rx_hosts
+                'size': line[13],  # downloaded file size
+                'md5': line[19],
+                # used for detecting ssl certs
+                'source': line[5],
+                'analyzers': line[7],
+                'sha1': line[19],
+            }
+        )
+
+    def process_zeek_tabs_arp(self, line: list):
+        """Parses the fields of an arp.log tab separated line"""
+        self.column_values['type'] = 'arp'
+        self.column_values['operation'] = line[1]
+        self.column_values['src_mac'] = line[2]
+        self.column_values['dst_mac'] = line[3]
+        self.column_values['daddr'] = line[5]
+        self.column_values['src_hw'] = line[6]
+        self.column_values['dst_hw'] = line[7]
 
     def process_zeek_input(self, new_line: dict):
         """
@@ -1122,306 +1122,281 @@ class ProfilerProcess(multiprocessing.Process):
         # all zeek lines recieved from stdin should be of type conn
         if file_type == 'stdin' and new_line.get('line_type', False) == 'zeek':
             file_type = 'conn'
-        else:
-            # if the zeek dir given to slips has 'conn' in it's name,
-            # slips thinks it's reading a conn file
-            # because we use the file path as the file 'type'
-            # to fix this, only use the file name as file 'type'
-            file_type = file_type.split('/')[-1]
-
-        # Generic fields in Zeek
-        self.column_values = {}
-        # We need to set it to empty at the beggining so any new flow has the key 'type'
-        self.column_values['type'] = ''
 
         # to set the default value to '' if ts isn't found
         ts = line.get('ts', False)
-        if ts:
-            self.column_values['starttime'] = self.get_time(ts)
-        else:
-            self.column_values['starttime'] = ''
-
-        self.column_values['uid'] = line.get('uid', False)
-        self.column_values['saddr'] = line.get('id.orig_h', '')
-        self.column_values['daddr'] = line.get('id.resp_h', '')
-
         # Handle each zeek file type separately
-        if 'conn' in file_type:
-            # {'ts': 1538080852.403669, 'uid': 'Cewh6D2USNVtfcLxZe', 'id.orig_h': '192.168.2.12', 'id.orig_p': 56343,
-            # 'id.resp_h': '192.168.2.1', 'id.resp_p': 53, 'proto': 'udp', 'service': 'dns', 'duration': 0.008364,
-            # 'orig_bytes': 30, 'resp_bytes': 94, 'conn_state': 'SF', 'missed_bytes': 0, 'history': 'Dd', 'orig_pkts': 1,
-            # 'orig_ip_bytes': 58, 'resp_pkts': 1, 'resp_ip_bytes': 122, 'orig_l2_addr': 'b8:27:eb:6a:47:b8',
-            # 'resp_l2_addr': 'a6:d1:8c:1f:ce:64', 'type': './zeek_files/conn'}
+        log_type, parser = self.get_zeek_parser(file_type)
+        # Generic fields in Zeek
+        self.column_values = {
+            # We need to set it to empty at the beggining so any new flow has the key 'type'
+            'type': '',
+            'starttime': self.get_time(ts) if ts else '',
+            'uid': line.get('uid', False),
+            # the field of the saddr depends on the type of the log
+            'saddr': get_zeek_profile_ip(log_type, line),
+            'daddr': line.get('id.resp_h', ''),
+        }
 
-            self.column_values.update(
-                {
-                    'type': 'conn',
-                    'dur': float(line.get('duration', 0)),
-                    'endtime': str(self.column_values['starttime'])
-                    + str(timedelta(seconds=float(line.get('duration', 0)))),
-                    'proto': line['proto'],
-                    'appproto': line.get('service', ''),
-                    'sport': line.get('id.orig_p', ''),
-                    'dport': line.get('id.resp_p', ''),
-                    'state': line.get('conn_state', ''),
-                    'dir': '->',
-                    'spkts': line.get('orig_pkts', 0),
-                    'dpkts': line.get('resp_pkts', 0),
-                    'sbytes': line.get('orig_bytes', 0),
-                    'dbytes': line.get('resp_bytes', 0),
-                    'pkts': line.get('orig_bytes', 0)
-                    + line.get('resp_pkts', 0),
-                    'bytes': line.get('orig_bytes', 0)
-                    + line.get('resp_bytes', 0),
-                    'state_hist': line.get(
-                        'history', line.get('conn_state', '')
-                    ),
-                    'smac': line.get('orig_l2_addr', ''),
-                    'dmac': line.get('resp_l2_addr', ''),
-                }
-            )
+        if parser:
+            return parser(line)
+        if log_type:
+            # we don't parse any field of this type
+            self.column_values['type'] = log_type
+            return True
+        return False
+
+    def process_zeek_conn(self, line: dict) -> bool:
+        """Parses the fields of a conn.log json line"""
+        # {'ts': 1538080852.403669, 'uid': 'Cewh6D2USNVtfcLxZe', 'id.orig_h': '192.168.2.12', 'id.orig_p': 56343,
+        # 'id.resp_h': '192.168.2.1', 'id.resp_p': 53, 'proto': 'udp', 'service': 'dns', 'duration': 0.008364,
+        # 'orig_bytes': 30, 'resp_bytes': 94, 'conn_state': 'SF', 'missed_bytes': 0, 'history': 'Dd', 'orig_pkts': 1,
+        # 'orig_ip_bytes': 58, 'resp_pkts': 1, 'resp_ip_bytes': 122, 'orig_l2_addr': 'b8:27:eb:6a:47:b8',
+        # 'resp_l2_addr': 'a6:d1:8c:1f:ce:64', 'type': './zeek_files/conn'}
+
+        self.column_values.update(
+            {
+                'type': 'conn',
+                'dur': float(line.get('duration', 0)),
+                'proto': line['proto'],
+                'appproto': line.get('service', ''),
+                'sport': line.get('id.orig_p', ''),
+                'dport': line.get('id.resp_p', ''),
+                'state': line.get('conn_state', ''),
+                'dir': '->',
+                'spkts': line.get('orig_pkts', 0),
+                'dpkts': line.get('resp_pkts', 0),
+                'sbytes': line.get('orig_bytes', 0),
+                'dbytes': line.get('resp_bytes', 0),
+                'pkts': line.get('orig_bytes', 0)
+                + line.get('resp_pkts', 0),
+                'bytes': line.get('orig_bytes', 0)
+                + line.get('resp_bytes', 0),
+                'state_hist': line.get(
+                    'history', line.get('conn_state', '')
+                ),
+                'smac': line.get('orig_l2_addr', ''),
+                'dmac': line.get('resp_l2_addr', ''),
+            }
+        )
+        return True
 
-        elif 'dns' in file_type:
-            # {"ts":1538080852.403669,"uid":"CtahLT38vq7vKJVBC3","id.orig_h":"192.168.2.12","id.orig_p":56343,"id.resp_h":"192.168.2.1","id.resp_p":53,"proto":"udp","trans_id":2,"rtt":0.008364,"query":"pool.ntp.org","qclass":1,"qclass_name":"C_INTERNET","qtype":1,"qtype_name":"A","rcode":0,"rcode_name":"NOERROR","AA":false,"TC":false,"RD":true,"RA":true,"Z":0,"answers":["185.117.82.70","212.237.100.250","213.251.52.107","183.177.72.201"],"TTLs":[42.0,42.0,42.0,42.0],"rejected":false}
+    def process_zeek_dns(self, line: dict) -> bool:
+        """Parses the fields of a dns.log json line"""
+        # {"ts":1538080852.403669,"uid":"CtahLT38vq7vKJVBC3","id.orig_h":"192.168.2.12","id.orig_p":56343,"id.resp_h":"192.168.2.1","id.resp_p":53,"proto":"udp","trans_id":2,"rtt":0.008364,"query":"pool.ntp.org","qclass":1,"qclass_name":"C_INTERNET","qtype":1,"qtype_name":"A","rcode":0,"rcode_name":"NOERROR","AA":false,"TC":false,"RD":true,"RA":true,"Z":0,"answers":["185.117.82.70","212.237.100.250","213.251.52.107","183.177.72.201"],"TTLs":[42.0,42.0,42.0,42.0],"rejected":false}
+        self.column_values['type'] = 'dns'
+        self.column_values.update(
+            {
+                'query': line.get('query', ''),
+                'qclass_name': line.get('qclass_name', ''),
+                'qtype_name': line.get('qtype_name', ''),
+                'rcode_name': line.get('rcode_name', ''),
+                'answers': line.get('answers', ''),
+                'TTLs': line.get('TTLs', ''),
+            }
+        )
+
+        if type(self.column_values['answers']) == str:
+            # If the answer is only 1, Zeek gives a string
+            # so convert to a list
             self.column_values.update(
-                {
-                    'type': 'dns',
-                    'query': line.get('query', ''),
-                    'qclass_name': line.get('qclass_name', ''),
-                    'qtype_name': line.get('qtype_name', ''),
-                    'rcode_name': line.get('rcode_name', ''),
-                    'answers': line.get('answers', ''),
-                    'TTLs': line.get('TTLs', ''),
-                }
+                {'answers': [self.column_values['answers']]}
             )
+        return True
 
-            if type(self.column_values['answers']) == str:
-                # If the answer is only 1, Zeek gives a string
-                # so convert to a list
-                self.column_values.update(
-                    {'answers': [self.column_values['answers']]}
-                )
-
-        elif 'http' in file_type:
-            # {"ts":158.957403,"uid":"CnNLbE2dyfy5KyqEhh","id.orig_h":"10.0.2.105","id.orig_p":49158,"id.resp_h":"64.182.208.181","id.resp_p":80,"trans_depth":1,"method":"GET","host":"icanhazip.com","uri":"/","version":"1.1","user_agent":"Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.38 (KHTML, like Gecko) Chrome/45.0.2456.99 Safari/537.38","request_body_len":0,"response_body_len":13,"status_code":200,"status_msg":"OK","tags":[],"resp_fuids":["FwraVxIOACcjkaGi3"],"resp_mime_types":["text/plain"]}
-            self.column_values.update(
-                {
-                    'type': 'http',
-                    'method': line.get('method', ''),
-                    'host': line.get('host', ''),
-                    'uri': line.get('uri', ''),
-                    'httpversion': line.get('version', 0),
-                    'user_agent': line.get('user_agent', ''),
-                    'request_body_len': line.get('request_body_len', 0),
-                    'response_body_len': line.get('response_body_len', 0),
-                    'status_code': line.get('status_code', ''),
-                    'status_msg': line.get('status_msg', ''),
-                    'resp_mime_types': line.get('resp_mime_types', ''),
-                    'resp_fuids': line.get('resp_fuids', ''),
-                }
-            )
+    def process_zeek_http(self, line: dict) -> bool:
+        """Parses the fields of a http.log json line"""
+        # {"ts":158.957403,"uid":"CnNLbE2dyfy5KyqEhh","id.orig_h":"10.0.2.105","id.orig_p":49158,"id.resp_h":"64.182.208.181","id.resp_p":80,"trans_depth":1,"method":"GET","host":"icanhazip.com","uri":"/","version":"1.1","user_agent":"Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.38 (KHTML, like Gecko) Chrome/45.0.2456.99 Safari/537.38","request_body_len":0,"response_body_len":13,"status_code":200,"status_msg":"OK","tags":[],"resp_fuids":["FwraVxIOACcjkaGi3"],"resp_mime_types":["text/plain"]}
+        self.column_values['type'] = 'http'
+        self.column_values.update(
+            {
+                'method': line.get('method', ''),
+                'host': line.get('host', ''),
+                'uri': line.get('uri', ''),
+                'httpversion': line.get('version', 0),
+                'user_agent': line.get('user_agent', ''),
+                'request_body_len': line.get('request_body_len', 0),
+                'response_body_len': line.get('response_body_len', 0),
+                'status_code': line.get('status_code', ''),
+                'status_msg': line.get('status_msg', ''),
+                'resp_mime_types': line.get('resp_mime_types', ''),
+                'resp_fuids': line.get('resp_fuids', ''),
+            }
+        )
+        return True
 
-        elif 'ssl' in file_type:
-            # {"ts":12087.045499,"uid":"CdoFDp4iW79I5ZmsT7","id.orig_h":"10.0.2.105","id.orig_p":49704,"id.resp_h":"195.211.240.166","id.resp_p":443,"version":"SSLv3","cipher":"TLS_RSA_WITH_RC4_128_SHA","resumed":false,"established":true,"cert_chain_fuids":["FhGp1L3yZXuURiPqq7"],"client_cert_chain_fuids":[],"subject":"OU=DAHUATECH,O=DAHUA,L=HANGZHOU,ST=ZHEJIANG,C=CN,CN=192.168.1.108","issuer":"O=DahuaTech,L=HangZhou,ST=ZheJiang,C=CN,CN=Product Root CA","validation_status":"unable to get local issuer certificate"}
-            # {"ts":1382354909.915615,"uid":"C7W6ZA4vI8FxJ9J0bh","id.orig_h":"147.32.83.53","id.orig_p":36567,"id.resp_h":"195.113.214.241","id.resp_p":443,"version":"TLSv12","cipher":"TLS_ECDHE_ECDSA_WITH_RC4_128_SHA","curve":"secp256r1","server_name":"id.google.com.ar","resumed":false,"established":true,"cert_chain_fuids":["FnomJz1vghKIOHtytf","FSvQff1KsaDkRtKXo4","Fif2PF48bytqq6xMDb"],"client_cert_chain_fuids":[],"subject":"CN=*.google.com,O=Google Inc,L=Mountain View,ST=California,C=US","issuer":"CN=Google Internet Authority G2,O=Google Inc,C=US","validation_status":"ok"}
-            self.column_values.update(
-                {
-                    'type': 'ssl',
-                    'sslversion': line.get('version', ''),
-                    'sport': line.get('id.orig_p', ','),
-                    'dport': line.get('id.resp_p', ','),
-                    'cipher': line.get('cipher', ''),
-                    'resumed': line.get('resumed', ''),
-                    'established': line.get('established', ''),
-                    'cert_chain_fuids': line.get('cert_chain_fuids', ''),
-                    'client_cert_chain_fuids': line.get(
-                        'client_cert_chain_fuids', ''
-                    ),
-                    'subject': line.get('subject', ''),
-                    'issuer': line.get('issuer', ''),
-                    'validation_status': line.get('validation_status', ''),
-                    'curve': line.get('curve', ''),
-                    'server_name': line.get('server_name', ''),
-                    'ja3': line.get('ja3', ''),
-                    'is_DoH': line.get('is_DoH', 'false'),
-                    'ja3s': line.get('ja3s', ''),
-                }
-            )
+    def process_zeek_ssl(self, line: dict) -> bool:
+        """Parses the fields of a ssl.log json line"""
+        # {"ts":12087.045499,"uid":"CdoFDp4iW79I5ZmsT7","id.orig_h":"10.0.2.105","id.orig_p":49704,"id.resp_h":"195.211.240.166","id.resp_p":443,"version":"SSLv3","cipher":"TLS_RSA_WITH_RC4_128_SHA","resumed":false,"established":true,"cert_chain_fuids":["FhGp1L3yZXuURiPqq7"],"client_cert_chain_fuids":[],"subject":"OU=DAHUATECH,O=DAHUA,L=HANGZHOU,ST=ZHEJIANG,C=CN,CN=192.168.1.108","issuer":"O=DahuaTech,L=HangZhou,ST=ZheJiang,C=CN,CN=Product Root CA","validation_status":"unable to get local issuer certificate"}
+        # {"ts":1382354909.915615,"uid":"C7W6ZA4vI8FxJ9J0bh","id.orig_h":"147.32.83.53","id.orig_p":36567,"id.resp_h":"195.113.214.241","id.resp_p":443,"version":"TLSv12","cipher":"TLS_ECDHE_ECDSA_WITH_RC4_128_SHA","curve":"secp256r1","server_name":"id.google.com.ar","resumed":false,"established":true,"cert_chain_fuids":["FnomJz1vghKIOHtytf","FSvQff1KsaDkRtKXo4","Fif2PF48bytqq6xMDb"],"client_cert_chain_fuids":[],"subject":"CN=*.google.com,O=Google Inc,L=Mountain View,ST=California,C=US","issuer":"CN=Google Internet Authority G2,O=Google Inc,C=US","validation_status":"ok"}
+        self.column_values['type'] = 'ssl'
+        self.column_values.update(
+            {
+                'sslversion': line.get('version', ''),
+                'sport': line.get('id.orig_p', ','),
+                'dport': line.get('id.resp_p', ','),
+                'cipher': line.get('cipher', ''),
+                'resumed': line.get('resumed', ''),
+                'established': line.get('established', ''),
+                'cert_chain_fuids': line.get('cert_chain_fuids', ''),
+                'client_cert_chain_fuids': line.get(
+                    'client_cert_chain_fuids', ''
+                ),
+                'subject': line.get('subject', ''),
+                'issuer': line.get('issuer', ''),
+                'validation_status': line.get('validation_status', ''),
+                'curve': line.get('curve', ''),
+                'server_name': line.get('server_name', ''),
+                'ja3': line.get('ja3', ''),
+                'is_DoH': line.get('is_DoH', 'false'),
+                'ja3s': line.get('ja3s', ''),
+            }
+        )
+        return True
 
-        elif 'ssh' in file_type:
-            self.column_values.update(
-                {
-                    'type': 'ssh',
-                    'version': line.get('version', ''),
-                    'auth_success': line.get('auth_success', ''),
-                    'auth_attempts': line.get('auth_attempts', ''),
-                    'client': line.get('client', ''),
-                    'server': line.get('server', ''),
-                    'cipher_alg': line.get('cipher_alg', ''),
-                    'mac_alg': line.get('mac_alg', ''),
-                    'compression_alg': line.get('compression_alg', ''),
-                    'kex_alg': line.get('kex_alg', ''),
-                    'host_key_alg': line.get('host_key_alg', ''),
-                    'host_key': line.get('host_key', ''),
-                }
-            )
+    def process_zeek_ssh(self, line: dict) -> bool:
+        """Parses the fields of a ssh.log json line"""
+        self.column_values['type'] = 'ssh'
+        self.column_values.update(
+            {
+                'version': line.get('version', ''),
+                'auth_success': line.get('auth_success', ''),
+                'auth_attempts': line.get('auth_attempts', ''),
+                'client': line.get('client', ''),
+                'server': line.get('server', ''),
+                'cipher_alg': line.get('cipher_alg', ''),
+                'mac_alg': line.get('mac_alg', ''),
+                'compression_alg': line.get('compression_alg', ''),
+                'kex_alg': line.get('kex_alg', ''),
+                'host_key_alg': line.get('host_key_alg', ''),
+                'host_key': line.get('host_key', ''),
+            }
+        )
+        return True
 
-        elif 'irc' in file_type:
-            self.column_values.update({'type': 'irc'})
-        elif 'long' in file_type:
-            self.column_values.update({'type': 'long'})
-        elif 'dhcp' in file_type:
-            self.column_values.update(
-                {
-                    'type': 'dhcp',
-                    'client_addr': line.get('client_addr', ''),
-                    'server_addr': line.get('server_addr', ''),
-                    'host_name': line.get('host_name', ''),
-                    'mac': line.get('mac', ''),  # this is the client mac
-                    'saddr': line.get('client_addr', ''),
-                    'daddr': line.get('server_addr', ''),
-                }
-            )
+    def process_zeek_dhcp(self, line: dict) -> bool:
+        """Parses the fields of a dhcp.log json line"""
+        self.column_values['type'] = 'dhcp'
+        self.column_values.update(
+            {
+                'client_addr': line.get('client_addr', ''),
+                'server_addr': line.get('server_addr', ''),
+                'host_name': line.get('host_name', ''),
+                'mac': line.get('mac', ''),  # this is the client mac
+                'daddr': line.get('server_addr', ''),
+            }
+        )
+
+        # self.column_values['domain'] = line.get('domain','')
+        # self.column_values['assigned_addr'] = line.get('assigned_addr','')
+        return True
 
-            # self.column_values['domain'] = line.get('domain','')
-            # self.column_values['assigned_addr'] = line.get('assigned_addr','')
+    def process_zeek_ftp(self, line: dict) -> bool:
+        """Parses the fields of a ftp.log json line"""
+        self.column_values['type'] = 'ftp'
+        self.column_values.update(
+            {
+                'used_port': line.get('data_channel.resp_p', False),
+            }
+        )
+        return True
 
-            # Some zeek flow don't have saddr or daddr, seen in dhcp.log and notice.log use the mac address instead
-            if (
-                self.column_values['saddr'] == ''
-                and self.column_values['daddr'] == ''
-                and line.get('mac', False)
-            ):
-                self.column_values.update({'saddr': line.get('mac', '')})
+    def process_zeek_smtp(self, line: dict) -> bool:
+        """Parses the fields of a smtp.log json line"""
+        self.column_values['type'] = 'smtp'
+        self.column_values.update({'last_reply': line.get('last_reply', '')})
+        return True
 
-        elif 'dce_rpc' in file_type:
-            self.column_values.update({'type': 'dce_rpc'})
-        elif 'dnp3' in file_type:
-            self.column_values.update({'type': 'dnp3'})
-        elif 'ftp' in file_type:
+    def process_zeek_notice(self, line: dict) -> bool:
+        """Parse the fields we're interested in in the notice.log file"""
+        # notice fields: ts - uid id.orig_h(saddr) - id.orig_p(sport) - id.resp_h(daddr) - id.resp_p(dport) - note - msg
+        self.column_values['type'] = 'notice'
+        self.column_values.update(
+            {
+                'sport': line.get('id.orig_p', ''),
+                'dport': line.get('id.resp_p', ''),
+                # self.column_values['scanned_ip'] = line.get('dst', '')
+                'note': line.get('note', ''),
+                'msg': line.get(
+                    'msg', ''
+                ),  # we,'re looking for self signed certs in this field
+                'scanned_port': line.get('p', ''),
+                'scanning_ip': line.get('src', ''),
+            }
+        )
+
+        # portscan notices don't have id.orig_h or id.resp_h fields, instead they have src and dst.
+        # the saddr is already the src field
+        if self.column_values['daddr'] == '':
+            # set daddr to src for now because the notice that contains portscan doesn't have a dst field and slips needs it to work
             self.column_values.update(
-                {
-                    'type': 'ftp',
-                    'used_port': line.get('data_channel.resp_p', False),
-                }
+                {'daddr': line.get('dst', self.column_values['saddr'])}
             )
+        return True
 
-        elif 'kerberos' in file_type:
-            self.column_values.update({'type': 'kerberos'})
-        elif 'mysql' in file_type:
-            self.column_values.update({'type': 'mysql'})
-        elif 'modbus' in file_type:
-            self.column_values.update({'type': 'modbus'})
-        elif 'ntlm' in file_type:
-            self.column_values.update({'type': 'ntlm'})
-        elif 'rdp' in file_type:
-            self.column_values.update({'type': 'rdp'})
-        elif 'sip' in file_type:
-            self.column_values.update({'type': 'sip'})
-        elif 'smb_cmd' in file_type:
-            self.column_values.update({'type': 'smb_cmd'})
-        elif 'smb_files' in file_type:
-            self.column_values.update({'type': 'smb_files'})
-        elif 'smb_mapping' in file_type:
-            self.column_values.update({'type': 'smb_mapping'})
-        elif 'smtp' in file_type:
-            self.column_values.update(
-                {'type': 'smtp', 'last_reply': line.get('last_reply', '')}
-            )
-        elif 'socks' in file_type:
-            self.column_values.update({'type': 'socks'})
-        elif 'syslog' in file_type:
-            self.column_values.update({'type': 'syslog'})
-        elif 'tunnel' in file_type:
-            self.column_values.update({'type': 'tunnel'})
-        elif 'notice' in file_type:
-            """Parse the fields we're interested in in the notice.log file"""
-            # notice fields: ts - uid id.orig_h(saddr) - id.orig_p(sport) - id.resp_h(daddr) - id.resp_p(dport) - note - msg
-            self.column_values.update(
-                {
-                    'type': 'notice',
-                    'sport': line.get('id.orig_p', ''),
-                    'dport': line.get('id.resp_p', ''),
-                    # self.column_values['scanned_ip'] = line.get('dst', '')
-                    'note': line.get('note', ''),
-                    'msg': line.get(
-                        'msg', ''
-                    ),  # we,'re looking for self signed certs in this field
-                    'scanned_port': line.get('p', ''),
-                    'scanning_ip': line.get('src', ''),
-                }
-            )
+    def process_zeek_files(self, line: dict) -> bool:
+        """Parse the fields we're interested in in the files.log file"""
+        # the slash before files to distinguish between 'files' in the dir name and file.log
+        self.column_values['type'] = 'files'
+        self.column_values.update(
+            {
+                'uid': line.get('conn_uids', [''])[0],
+                'daddr': line.get('rx_hosts', [''])[0],
+                'size': line.get('seen_bytes', ''),  # downloaded file size
+                'md5': line.get('md5', ''),
+                # used for detecting ssl certs
+                'source': line.get('source', ''),
+                'analyzers': line.get('analyzers', ''),
+                'sha1': line.get('sha1', ''),
+            }
+        )
+        return True
 
-            # portscan notices don't have id.orig_h or id.resp_h fields, instead they have src and dst
-            if self.column_values['saddr'] == '':
-                self.column_values.update({'saddr': line.get('src', '')})
-            if self.column_values['daddr'] == '':
-                # set daddr to src for now because the notice that contains portscan doesn't have a dst field and slips needs it to work
-                self.column_values.update(
-                    {'daddr': line.get('dst', self.column_values['saddr'])}
-                )
+    def process_zeek_arp(self, line: dict) -> bool:
+        """Parses the fields of an arp.log json line"""
+        self.column_values['type'] = 'arp'
+        self.column_values.update(
+            {
+                'src_mac': line.get('src_mac', ''),
+                'dst_mac': line.get('dst_mac', ''),
+                'daddr': line.get('resp_h', ''),
+                'dst_hw': line.get('resp_hw', ''),
+                'src_hw': line.get('orig_hw', ''),
+                'operation': line.get('operation', ''),
+            }
+        )
+        return True
 
-        elif 'files.log' in file_type:
-            """Parse the fields we're interested in in the files.log file"""
-            # the slash before files to distinguish between 'files' in the dir name and file.log
-            self.column_values.update(
-                {
-                    'type': 'files',
-                    'uid': line.get('conn_uids', [''])[0],
-                    'saddr': line.get('tx_hosts', [''])[0],
-                    'daddr': line.get('rx_hosts', [''])[0],
-                    'size': line.get('seen_bytes', ''),  # downloaded file size
-                    'md5': line.get('md5', ''),
-                    # used for detecting ssl certs
-                    'source': line.get('source', ''),
-                    'analyzers': line.get('analyzers', ''),
-                    'sha1': line.get('sha1', ''),
-                }
-            )
+    def process_zeek_known_services(self, line: dict) -> bool:
+        """Parses the fields of a known_services.log json line"""
+        self.column_values['type'] = 'known_services'
+        self.column_values.update(
+            {
+                # this file doesn't have a daddr field, but we need it in add_flow_to_profile
+                'daddr': '0.0.0.0',
+                'port_num': line.get('port_num', ''),
+                'port_proto': line.get('port_proto', ''),
+                'service': line.get('service', ''),
+            }
+        )
+        return True
 
-        elif 'arp' in file_type:
-            self.column_values.update(
-                {
-                    'type': 'arp',
-                    'src_mac': line.get('src_mac', ''),
-                    'dst_mac': line.get('dst_mac', ''),
-                    'saddr': line.get('orig_h', ''),
-                    'daddr': line.get('resp_h', ''),
-                    'dst_hw': line.get('resp_hw', ''),
-                    'src_hw': line.get('orig_hw', ''),
-                    'operation': line.get('operation', ''),
-                }
-            )
-        elif 'known_services' in file_type:
-            self.column_values.update(
-                {
-                    'type': 'known_services',
-                    'saddr': line.get('host', ''),
-                    # this file doesn't have a daddr field, but we need it in add_flow_to_profile
-                    'daddr': '0.0.0.0',
-                    'port_num': line.get('port_num', ''),
-                    'port_proto': line.get('port_proto', ''),
-                    'service': line.get('service', ''),
-                }
-            )
-        elif 'software' in file_type:
-            software_type = line.get('software_type', '')
-            # store info about everything except http:broswer
-            # we're already reading browser UA from http.log
-            if software_type == 'HTTP::BROWSER':
-                return True
-            self.column_values.update(
-                {
-                    'type': 'software',
-                    'saddr': line.get('host', ''),
-                    'software_type': software_type,
-                    'unparsed_version': line.get('unparsed_version', ''),
-                    'version.major': line.get('version.major', ''),
-                    'version.minor': line.get('version.minor', ''),
-                }
-            )
-        else:
-            return False
+    def process_zeek_software(self, line: dict) -> bool:
+        """Parses the fields of a software.log json line"""
+        software_type = line.get('software_type', '')
+        # store info about everything except http:broswer
+        # we're already reading browser UA from http.log
+        if software_type == 'HTTP::BROWSER':
+            return True
+        self.column_values['type'] = 'software'
+        self.column_values.update(
+            {
+                'software_type': software_type,
+                'unparsed_version': line.get('unparsed_version', ''),
+                'version.major': line.get('version.major', ''),
+                'version.minor': line.get('version.minor', ''),
+            }
+        )
         return True
 
     def process_argus_input(self, new_line):
@@ -2031,7 +2006,6 @@ class ProfilerProcess(multiprocessing.Process):
                 allbytes = self.column_values['bytes']
                 spkts = self.column_values['spkts']
                 sbytes = self.column_values['sbytes']
-                endtime = self.column_values['endtime']
                 appproto = self.column_values['appproto']
                 direction = self.column_values['dir']
                 dpkts = self.column_values['dpkts']
@@ -2045,16 +2019,11 @@ class ProfilerProcess(multiprocessing.Process):
                     self.publish_to_new_MAC(dmac, self.daddr)
 
             elif 'dns' in flow_type:
-                query = self.column_values['query']
-                qclass_name = self.column_values['qclass_name']
-                qtype_name = self.column_values['qtype_name']
-                rcode_name = self.column_values['rcode_name']
                 answers = self.column_values['answers']
                 if type(answers) == str:
                     # If the answer is only 1, Zeek gives a string
                     # so convert to a list
-                    answers = [answers]
-                ttls = self.column_values['TTLs']
+                    self.column_values['answers'] = [answers]
             elif 'dhcp' in flow_type:
                 # client mac addr and client_addr is optional in zeek, so sometimes it may not be there
                 client_addr = self.column_values.get('client_addr', False)
@@ -2166,116 +2135,34 @@ class ProfilerProcess(multiprocessing.Process):
                     )
                     # Add the flow with all the fields interpreted
                     __database__.add_flow(
-                        profileid=profileid,
-                        twid=twid,
-                        stime=starttime,
-                        dur=dur,
+                        self.column_values,
+                        profileid,
+                        twid,
+                        starttime,
+                        label=self.label,
                         saddr=str(saddr_as_obj),
-                        sport=sport,
                         daddr=str(daddr_as_obj),
-                        dport=dport,
-                        proto=proto,
-                        state=state,
-                        pkts=pkts,
-                        allbytes=allbytes,
-                        spkts=spkts,
-                        sbytes=sbytes,
-                        appproto=appproto,
-                        uid=uid,
-                        label=self.label,
-                        flow_type=flow_type,
                     )
 
                 elif 'dns' in flow_type:
                     __database__.add_out_dns(
-                        profileid,
-                        twid,
-                        starttime,
-                        flow_type,
-                        uid,
-                        query,
-                        qclass_name,
-                        qtype_name,
-                        rcode_name,
-                        answers,
-                        ttls,
+                        self.column_values, profileid, twid, starttime
                     )
                 elif flow_type == 'http':
-
                     __database__.add_out_http(
-                        profileid,
-                        twid,
-                        starttime,
-                        flow_type,
-                        uid,
-                        self.column_values['method'],
-                        self.column_values['host'],
-                        self.column_values['uri'],
-                        self.column_values['httpversion'],
-                        self.column_values['user_agent'],
-                        self.column_values['request_body_len'],
-                        self.column_values['response_body_len'],
-                        self.column_values['status_code'],
-                        self.column_values['status_msg'],
-                        self.column_values['resp_mime_types'],
-                        self.column_values['resp_fuids'],
+                        self.column_values, profileid, twid, starttime
                     )
                 elif flow_type == 'ssl':
                     __database__.add_out_ssl(
-                        profileid,
-                        twid,
-                        starttime,
-                        daddr_as_obj,
-                        self.column_values['dport'],
-                        flow_type,
-                        uid,
-                        self.column_values['sslversion'],
-                        self.column_values['cipher'],
-                        self.column_values['resumed'],
-                        self.column_values['established'],
-                        self.column_values['cert_chain_fuids'],
-                        self.column_values['client_cert_chain_fuids'],
-                        self.column_values['subject'],
-                        self.column_values['issuer'],
-                        self.column_values['validation_status'],
-                        self.column_values['curve'],
-                        self.column_values['server_name'],
-                        self.column_values['ja3'],
-                        self.column_values['ja3s'],
-                        self.column_values['is_DoH'],
+                        self.column_values, profileid, twid, starttime
                     )
                 elif flow_type == 'ssh':
                     __database__.add_out_ssh(
-                        profileid,
-                        twid,
-                        starttime,
-                        flow_type,
-                        uid,
-                        self.column_values['version'],
-                        self.column_values['auth_attempts'],
-                        self.column_values['auth_success'],
-                        self.column_values['client'],
-                        self.column_values['server'],
-                        self.column_values['cipher_alg'],
-                        self.column_values['mac_alg'],
-                        self.column_values['compression_alg'],
-                        self.column_values['kex_alg'],
-                        self.column_values['host_key_alg'],
-                        self.column_values['host_key'],
+                        self.column_values, profileid, twid, starttime
                     )
                 elif flow_type == 'notice':
                     __database__.add_out_notice(
-                        profileid,
-                        twid,
-                        starttime,
-                        self.column_values['daddr'],
-                        self.column_values['sport'],
-                        self.column_values['dport'],
-                        self.column_values['note'],
-                        self.column_values['msg'],
-                        self.column_values['scanned_port'],
-                        self.column_values['scanning_ip'],
-                        self.column_values['uid'],
+                        self.column_values, profileid, twid, starttime
                     )
                 elif flow_type == 'ftp':
                     used_port = self.column_values['used_port']
@@ -2353,14 +2240,15 @@ class ProfilerProcess(multiprocessing.Process):
 
                     # Add the flow with all the fields interpreted
                     __database__.add_flow(
-                        profileid=profileid,
-                        twid=twid,
-                        stime=starttime,
-                        dur='0',
+                        self.column_values,
+                        profileid,
+                        twid,
+                        starttime,
                         saddr=str(saddr_as_obj),
                         daddr=str(daddr_as_obj),
+                        dur='0',
                         proto='ARP',
-                        uid=uid,
+                        flow_type='',
                     )
 
             def store_features_going_in(profileid, twid, starttime):
@@ -2418,24 +2306,16 @@ class ProfilerProcess(multiprocessing.Process):
                         port_type,
                     )
                     # Add the flow with all the fields interpreted
+                    # without its type, flowalerts only checks the flows going out
                     __database__.add_flow(
-                        profileid=profileid,
-                        twid=twid,
-                        stime=starttime,
-                        dur=dur,
+                        self.column_values,
+                        profileid,
+                        twid,
+                        starttime,
+                        label=self.label,
                         saddr=str(saddr_as_obj),
-                        sport=sport,
                         daddr=str(daddr_as_obj),
-                        dport=dport,
-                        proto=proto,
-                        state=state,
-                        pkts=pkts,
-                        allbytes=allbytes,
-                        spkts=spkts,
-                        sbytes=sbytes,
-                        appproto=appproto,
-                        uid=uid,
-                        label=self.label,
+                        flow_type='',
                     )
                     # No dns check going in. Probably ok.
 
@@ -2835,6 +2715,37 @@ class ProfilerProcess(multiprocessing.Process):
             self.print('{}'.format(inst), 0, 1)
             self.print('{}'.format(traceback.format_exc()), 0, 1)
 
+    def update_tws_index(self, profileid):
+        """Reads all the TWs of the given profile from the db and caches them in self.tws_index"""
+        starts, twids = [], []
+        for twid, start in __database__.getTWsfromProfile(profileid):
+            # getTWsfromProfile returns the tws sorted by start time
+            starts.append(float(start))
+            twids.append(twid)
+        self.tws_index[profileid] = (starts, twids)
+        self.tws_index.move_to_end(profileid)
+        if len(self.tws_index) > self.tws_index_size:
+            self.tws_index.popitem(last=False)
+
+    def get_cached_timewindow(self, flowtime, profileid):
+        """
+        Returns the id of the cached TW of this profile that includes the given flowtime
+        or False if we don't know it and the db should be checked.
+        TWs are never modified once created, so a TW found here is always right even if
+        another profiler added TWs to this profile after we cached it
+        """
+        try:
+            starts, twids = self.tws_index[profileid]
+        except KeyError:
+            return False
+        self.tws_index.move_to_end(profileid)
+        flowtime = float(flowtime)
+        # the index of the last TW that starts before or at flowtime
+        idx = bisect.bisect_right(starts, flowtime) - 1
+        if idx < 0 or flowtime >= starts[idx] + self.width:
+            return False
+        return twids[idx]
+
     def get_timewindow(self, flowtime, profileid):
         """ "
         This function should get the id of the TW in the database where the flow belong.
@@ -2853,6 +2764,8 @@ class ProfilerProcess(multiprocessing.Process):
                     # profileid is None if we're dealing with a profile
                     # outside of home_network when this param is given
                     return False
+                if twid := self.get_cached_timewindow(flowtime, profileid):
+                    return twid
                 [
                     (lasttwid, lasttw_start_time)
                 ] = __database__.getLastTWforProfile(profileid)
@@ -2925,7 +2838,6 @@ class ProfilerProcess(multiprocessing.Process):
                     if data:
                         # We found a TW where this flow belongs to
                         (twid, tw_start_time) = data
-                        return twid
                     else:
                         # There was no TW that included the time of this flow, so create them in the past
                         # How many new TW we need in the past?
@@ -2979,6 +2891,8 @@ class ProfilerProcess(multiprocessing.Process):
                 # Add this TW, of this profile, to the DB
                 twid = __database__.addNewTW(profileid, startoftw)
                 # self.print("First TW ({}) created for profile {}.".format(twid, profileid), 0, 1)
+            # the TWs of this profile changed or weren't cached yet
+            self.update_tws_index(profileid)
             return twid
         except Exception as e:
             self.print('Error in get_timewindow().', 0, 1)
@@ -2986,16 +2900,85 @@ class ProfilerProcess(multiprocessing.Process):
 
     def shutdown_gracefully(self):
         # can't use self.name because multiprocessing library adds the child number to the name so it's not const
-        __database__.publish('finished_modules', 'ProfilerProcess')
+        __database__.publish('finished_modules', self.process_name)
+
+    def process_line(self, line):
+        """
+        Parses the given line according to the input type and adds it to the profile
+        """
+        if not self.input_type:
+            # Find the type of input received
+            # This line will be discarded because
+            self.define_type(line)
+            # We should do this before checking the type of input so we don't lose the first line of input
+
+        # What type of input do we have?
+        if not self.input_type:
+            # the above define_type can't define the type of input
+            self.print("Can't determine input type.", 5, 6)
+
+        elif self.input_type == 'zeek':
+            # self.print('Zeek line')
+            self.process_zeek_input(line)
+            # Add the flow to the profile
+            self.add_flow_to_profile()
+        elif (
+            self.input_type == 'argus'
+            or self.input_type == 'argus-tabs'
+        ):
+            # self.print('Argus line')
+            # Argus puts the definition of the columns on the first line only
+            # So read the first line and define the columns
+            try:
+                # argus from stdin
+                if '-f' in sys.argv and 'argus' in sys.argv:
+                    self.define_columns(
+                        {
+                            'data': "StartTime,Dur,Proto,SrcAddr,Sport,"
+                                    "Dir,"
+                                    "DstAddr,Dport,State,sTos,dTos,TotPkts,"
+                                    "TotBytes,SrcBytes,SrcPkts,Label"
+                        }
+                    )
+                _ = self.column_idx['starttime']
+                # Yes
+                # Quickly process all lines
+                self.process_argus_input(line)
+                # Add the flow to the profile
+                self.add_flow_to_profile()
+            except AttributeError:
+                # No. Define columns. Do not add this line to profile, its only headers
+                self.define_columns(line)
+            except KeyError:
+                # When the columns are not there. Not sure if it works
+                self.define_columns(line)
+        elif self.input_type == 'suricata':
+            # self.print('Suricata line')
+            self.process_suricata_input(line)
+            # Add the flow to the profile
+            self.add_flow_to_profile()
+        elif self.input_type == 'zeek-tabs':
+            # self.print('Zeek-tabs line')
+            self.process_zeek_tabs_input(line)
+            # Add the flow to the profile
+            self.add_flow_to_profile()
+        elif self.input_type == 'nfdump':
+            self.process_nfdump_input(line)
+            self.add_flow_to_profile()
+        else:
+            self.print("Can't recognize input file type.")
 
     def run(self):
+        # send the flows using the shared memory ring buffer if it's enabled in slips.conf
+        # before dropping the privileges because it's owned by the user that started slips
+        __database__.open_flow_ring_buffer_writer(self.worker_id)
         utils.drop_root_privs()
         rec_lines = 0
         # Main loop function
         while True:
             try:
-                line = self.inputqueue.get()
-                if 'stop' in line:
+                lines = self.inputqueue.get()
+                if 'stop' in lines:
                     # if timewindows are not updated for a long time (see at logsProcess.py),
                     # we will stop slips automatically.The 'stop_process' line is sent from logsProcess.py.
                     self.shutdown_gracefully()
@@ -3009,72 +2992,21 @@ class ProfilerProcess(multiprocessing.Process):
                     )
                     return True
 
-                # Received new input data
-                # Extract the columns smartly
-                self.print('< Received Line: {}'.format(line), 2, 0)
-                rec_lines += 1
-
-                if not self.input_type:
-                    # Find the type of input received
-                    # This line will be discarded because
-                    self.define_type(line)
-                    # We should do this before checking the type of input so we don't lose the first line of input
-
-                # What type of input do we have?
-                if not self.input_type:
-                    # the above define_type can't define the type of input
-                    self.print("Can't determine input type.", 5, 6)
-
-                elif self.input_type == 'zeek':
-                    # self.print('Zeek line')
-                    self.process_zeek_input(line)
-                    # Add the flow to the profile
-                    self.add_flow_to_profile()
-                elif (
-                    self.input_type == 'argus'
-                    or self.input_type == 'argus-tabs'
-                ):
-                    # self.print('Argus line')
-                    # Argus puts the definition of the columns on the first line only
-                    # So read the first line and define the columns
+                # inputProcess sends a list of lines when profiler_batch_size is > 1 in slips.conf
+                if type(lines) != list:
+                    lines = [lines]
+
+                for line in lines:
+                    # Received new input data
+                    # Extract the columns smartly
+                    self.print('< Received Line: {}'.format(line), 2, 0)
+                    rec_lines += 1
+                    # send all the redis writes of this flow at once
+                    __database__.start_pipeline()
                     try:
-                        # argus from stdin
-                        if '-f' in sys.argv and 'argus' in sys.argv:
-                            self.define_columns(
-                                {
-                                    'data': "StartTime,Dur,Proto,SrcAddr,Sport,"
-                                            "Dir,"
-                                            "DstAddr,Dport,State,sTos,dTos,TotPkts,"
-                                            "TotBytes,SrcBytes,SrcPkts,Label"
-                                }
-                            )
-                        _ = self.column_idx['starttime']
-                        # Yes
-                        # Quickly process all lines
-                        self.process_argus_input(line)
-                        # Add the flow to the profile
-                        self.add_flow_to_profile()
-                    except AttributeError:
-                        # No. Define columns. Do not add this line to profile, its only headers
-                        self.define_columns(line)
-                    except KeyError:
-                        # When the columns are not there. Not sure if it works
-                        self.define_columns(line)
-                elif self.input_type == 'suricata':
-                    # self.print('Suricata line')
-                    self.process_suricata_input(line)
-                    # Add the flow to the profile
-                    self.add_flow_to_profile()
-                elif self.input_type == 'zeek-tabs':
-                    # self.print('Zeek-tabs line')
-                    self.process_zeek_tabs_input(line)
-                    # Add the flow to the profile
-                    self.add_flow_to_profile()
-                elif self.input_type == 'nfdump':
-                    self.process_nfdump_input(line)
-                    self.add_flow_to_profile()
-                else:
-                    self.print("Can't recognize input file type.")
+                        self.process_line(line)
+                    finally:
+                        __database__.execute_pipeline()
 
                 # listen on this channel in case whitelist.conf is changed, we need to process the new changes
                 message = self.c1.get_message(timeout=self.timeout)
@@ -1,6 +1,8 @@
 import json
 import configparser
 from .database import __database__
+from slips_files.common.ip_ranges import IPRangesArray
+from slips_files.common.slips_utils import utils
 import ipaddress
 import validators
 import requests
@@ -13,6 +15,10 @@ class Whitelist:
         self.outputqueue = outputqueue
         self.config = config
         self.read_configuration()
+        # the whitelist is compiled by compile_whitelist() the first time a flow is checked
+        self.is_compiled = False
+        # {org: IPRangesArray} of the orgs we checked evidence about
+        self.orgs_ranges = {}
 
     def print(self, text, verbose=1, debug=0):
         """
@@ -47,244 +53,185 @@ class Whitelist:
         ):
             self.whitelist_path = 'whitelist.conf'
 
-    def is_whitelisted_asn(self, ip, org):
-        ip_data = __database__.getIPData(ip)
-        try:
-            ip_asn = ip_data['asn']['asnorg']
+    def get_directions(self, from_: str) -> tuple:
+        """
+        Returns the directions of a whitelisted IoC
+        :param from_: the direction in whitelist.conf, src, dst or both
+        """
+        return tuple(
+            direction
+            for direction in ('src', 'dst')
+            if direction in from_ or 'both' in from_
+        )
+
+    def compile_whitelist(self):
+        """
+        Compiles the whitelist stored in the db into the sets and indexes used by
+        is_whitelisted_flow(), so checking a flow doesn't read the whitelist from the db.
+        Only the IPs, domains and orgs that ignore flows are compiled,
+        the mac addresses are compiled regardless of what they ignore
+        """
+        # the following are {direction: IoCs whitelisted in this direction}
+        self.flow_ips = {'src': set(), 'dst': set()}
+        # the 'flow' domains are compared with the domains of the flow itself in both directions
+        self.flow_domains = {'flow': set(), 'src': set(), 'dst': set()}
+        self.flow_macs = {'src': set(), 'dst': set()}
+        self.orgs = {'src': [], 'dst': []}
+        # the IP ranges of all the orgs whitelisted in this direction
+        self.org_ranges = {'src': IPRangesArray(), 'dst': IPRangesArray()}
+        self.org_asns = {'src': set(), 'dst': set()}
+        self.org_domains = {'src': set(), 'dst': set()}
+        # the org domains and their parent domains, to match flow domains that org domains are subdomains of
+        self.org_parent_domains = {'src': set(), 'dst': set()}
+
+        for ip, ip_info in __database__.get_whitelist('IPs').items():
+            if self.ignores_flows(ip_info['what_to_ignore']):
+                for direction in self.get_directions(ip_info['from']):
+                    self.flow_ips[direction].add(ip)
+
+        for domain, domain_info in __database__.get_whitelist('domains').items():
+            if self.ignores_flows(domain_info['what_to_ignore']):
+                self.flow_domains['flow'].add(domain)
+                for direction in self.get_directions(domain_info['from']):
+                    self.flow_domains[direction].add(domain)
+
+        for org, org_info in __database__.get_whitelist('organizations').items():
+            if not self.ignores_flows(org_info['what_to_ignore']):
+                continue
+            org_subnets = json.loads(__database__.get_org_info(org, 'IPs'))
             org_asn = json.loads(__database__.get_org_info(org, 'asn'))
-            if (
-                ip_asn
-                and ip_asn != 'Unknown'
-                and (org.lower() in ip_asn.lower() or ip_asn in org_asn)
-            ):
-                # this ip belongs to a whitelisted org, ignore flow
-                # self.print(f"The ASN {ip_asn} of IP {column_values['daddr']} "
-                #            f"is in the values of org {org}. Whitelisted.")
-                return True
-        except (KeyError, TypeError):
-            # No asn data for src ip
-            pass
+            org_domains = json.loads(__database__.get_org_info(org, 'domains'))
+            for direction in self.get_directions(org_info['from']):
+                self.orgs[direction].append(org)
+                self.org_ranges[direction].update(org_subnets)
+                self.org_asns[direction].update(org_asn)
+                for org_domain in org_domains:
+                    self.org_domains[direction].add(org_domain)
+                    self.org_parent_domains[direction].update(
+                        utils.get_domain_and_parents(org_domain)
+                    )
 
-    def is_whitelisted_flow(self, column_values) -> bool:
+        for mac, mac_info in __database__.get_whitelist('mac').items():
+            for direction in self.get_directions(mac_info['from']):
+                self.flow_macs[direction].add(mac)
+
+        self.is_compiled = True
+
+    def get_org_ranges(self, org: str) -> IPRangesArray:
         """
-        Checks if the src IP or dst IP or domain or organization of this flow is whitelisted.
+        Returns the IP ranges of the given org, they're read from the db
+        once and kept in memory as long as the org has ranges
         """
+        if org in self.orgs_ranges:
+            return self.orgs_ranges[org]
+        org_ranges = IPRangesArray(
+            json.loads(__database__.get_org_info(org, 'IPs'))
+        )
+        if len(org_ranges):
+            self.orgs_ranges[org] = org_ranges
+        return org_ranges
 
-        if whitelisted_domains := __database__.get_whitelist('domains'):
-            ssl_domain = column_values.get('server_name', '')  # ssl.log
-            # Domain names are stored in different zeek files using different names.
-            # Try to get the domain from each file.            domains_to_check = [ssl_domain]
-            domains_to_check = [ssl_domain]
-            http_domain = column_values.get('host', '')  # http.log
-            domains_to_check.append(http_domain)
-            notice_domain = column_values.get('sub', '').replace(
-                'CN=', ''
-            )  # in notice.log
-            domains_to_check.append(notice_domain)
-
-            (
-                domains_to_check_dst,
-                domains_to_check_src,
-            ) = self.get_domains_of_flow(column_values)
+    def ignores_flows(self, what_to_ignore: str) -> bool:
+        """
+        :param what_to_ignore: the IgnoreType in whitelist.conf, flows, alerts or both
+        """
+        return 'flows' in what_to_ignore or 'both' in what_to_ignore
 
-            try:
-                # self.print(f"DNS of dst IP {column_values['daddr']}: {__database__.get_dns_resolution(column_values['daddr'])}")
-                dst_dns_domains = __database__.get_dns_resolution(
-                    column_values['daddr']
-                )
-                dst_dns_domains = dst_dns_domains.get('domains', [])
-                for dns_domain in dst_dns_domains:
-                    domains_to_check_dst.append(dns_domain)
-            except (KeyError, TypeError):
-                pass
+    def is_subdomain_of(self, domain: str, domains: set) -> bool:
+        """Checks if the given domain or any of its parent domains is in the given set"""
+        if not domains or not domain:
+            return False
+        for parent in utils.get_domain_and_parents(domain):
+            if parent in domains:
+                return True
+        return False
 
-            # self.print(f'Domains to check from flow: {domains_to_check}, {domains_to_check_dst} {domains_to_check_src}')
-            # Go through each whitelisted domain and check if what arrived is there
-            for domain in list(whitelisted_domains.keys()):
-                what_to_ignore = whitelisted_domains[domain]['what_to_ignore']
-                # Here we iterate over all the domains to check so we can find
-                # subdomains. If slack.com was whitelisted, then test.slack.com
-                # should be ignored too. But not 'slack.com.test'
-                for domain_to_check in domains_to_check:
-                    main_domain = domain_to_check[-len(domain) :]
-                    if domain in main_domain:
-                        # We can ignore flows or alerts, what is it?
-                        if (
-                            'flows' in what_to_ignore
-                            or 'both' in what_to_ignore
-                        ):
-                            # self.print(f'Whitelisting the domain {domain_to_check} due to whitelist of {domain}')
-                            return True
+    def is_whitelisted_asn(self, ip_data: dict, direction: str) -> bool:
+        """
+        Checks if the ASN of an IP belongs to an org whitelisted in the given direction
+        :param ip_data: the info of the IP in IPsInfo
+        """
+        try:
+            ip_asn = ip_data['asn']['asnorg']
+        except (KeyError, TypeError):
+            # No asn data for this ip
+            return False
+        if not ip_asn or ip_asn == 'Unknown':
+            return False
+        if ip_asn in self.org_asns[direction]:
+            return True
+        ip_asn = ip_asn.lower()
+        for org in self.orgs[direction]:
+            if org.lower() in ip_asn:
+                return True
+        return False
 
-                # do we wanna whitelist flows coming from or going to this domain or both?
-                from_ = whitelisted_domains[domain]['from']
-
-                # Now check the related domains of the src IP
-                if 'src' in from_ or 'both' in from_:
-                    for domain_to_check in domains_to_check_src:
-                        main_domain = domain_to_check[-len(domain) :]
-                        if domain in main_domain:
-                            # We can ignore flows or alerts, what is it?
-                            if (
-                                'flows' in what_to_ignore
-                                or 'both' in what_to_ignore
-                            ):
-                                # self.print(f"Whitelisting the domain {domain_to_check} because is related to domain {domain} of src IP {column_values['saddr']}")
-                                return True
+    def is_whitelisted_org_domain(self, domain: str, direction: str) -> bool:
+        """Checks if the given domain belongs to an org whitelisted in the given direction"""
+        if not domain:
+            return False
+        for org in self.orgs[direction]:
+            if org in domain:
+                # self.print(f"The domain of this flow ({domain}) belongs to the domains of {org}")
+                return True
+        # if org has org.com, and the flow domain is xyz.org.com whitelist it
+        # if org has xyz.org.com, and the flow domain is org.com whitelist it
+        return (
+            self.is_subdomain_of(domain, self.org_domains[direction])
+            or domain in self.org_parent_domains[direction]
+        )
 
-                # Now check the related domains of the dst IP
-                if 'dst' in from_ or 'both' in from_:
-                    for domain_to_check in domains_to_check_dst:
-                        main_domain = domain_to_check[-len(domain) :]
-                        if domain in main_domain:
-                            # We can ignore flows or alerts, what is it?
-                            if (
-                                'flows' in what_to_ignore
-                                or 'both' in what_to_ignore
-                            ):
-                                # self.print(f"Whitelisting the domain {domain_to_check} because is related"
-                                #            f" to domain {domain} of dst IP {column_values['daddr']}")
-                                return True
+    def is_whitelisted_flow(self, column_values) -> bool:
+        """
+        Checks if the src IP or dst IP or domain or organization of this flow is whitelisted.
+        column_values: the dict of the flow parsed by the profiler
+        The whitelist is compiled by compile_whitelist(), the db is only read for the
+        domains and ASN of the IPs of the flow if there are domains or orgs whitelisted in that direction
+        """
+        if not self.is_compiled:
+            self.compile_whitelist()
 
         saddr = column_values['saddr']
         daddr = column_values['daddr']
 
-        if whitelisted_IPs := __database__.get_whitelist('IPs'):
-            # self.print('Check the IPs')
-            # Check if the IPs are whitelisted
-            ips_to_whitelist = list(whitelisted_IPs.keys())
-
-            if saddr in ips_to_whitelist:
-                # The flow has the src IP to whitelist
-                from_ = whitelisted_IPs[saddr]['from']
-                what_to_ignore = whitelisted_IPs[saddr]['what_to_ignore']
-                if ('src' in from_ or 'both' in from_) and (
-                        'flows' in what_to_ignore or 'both' in what_to_ignore
-                ):
-                    # self.print(f"Whitelisting the src IP {column_values['saddr']}")
-                    return True
+        if saddr in self.flow_ips['src'] or daddr in self.flow_ips['dst']:
+            # self.print(f"Whitelisting the IPs {saddr} {daddr}")
+            return True
 
-            if daddr in ips_to_whitelist:   # should be if and not elif
-                # The flow has the dst IP to whitelist
-                from_ = whitelisted_IPs[daddr]['from']
-                what_to_ignore = whitelisted_IPs[daddr]['what_to_ignore']
-                if ('dst' in from_ or 'both' in from_) and (
-                    'flows' in what_to_ignore or 'both' in what_to_ignore
-                ):
-                    # self.print(f"Whitelisting the dst IP {column_values['daddr']}")
+        if self.flow_domains['flow']:
+            # Domain names are stored in different zeek files using different names.
+            # Try to get the domain from each file.
+            domains_to_check = (
+                column_values.get('server_name', ''),  # ssl.log
+                column_values.get('host', ''),  # http.log
+                column_values.get('sub', '').replace('CN=', ''),  # in notice.log
+            )
+            for domain in domains_to_check:
+                # If slack.com was whitelisted, then test.slack.com
+                # should be ignored too. But not 'slack.com.test'
+                if self.is_subdomain_of(domain, self.flow_domains['flow']):
                     return True
 
-        if whitelisted_orgs := __database__.get_whitelist('organizations'):
-            # self.print('Check if the organization is whitelisted')
-            # Check if IP belongs to a whitelisted organization range
-            # Check if the ASN of this IP is any of these organizations
-
-            for org in whitelisted_orgs:
-                from_ = whitelisted_orgs[org]['from']  # src or dst or both
-                what_to_ignore = whitelisted_orgs[org][
-                    'what_to_ignore'
-                ]  # flows, alerts or both
-                # self.print(f'Checking {org}, from:{from_} type {what_to_ignore}')
-
-                # get the domains of this flow
-                (
-                    domains_to_check_dst,
-                    domains_to_check_src,
-                ) = self.get_domains_of_flow(column_values)
-
-                if 'flows' in what_to_ignore or 'both' in what_to_ignore:
-                    # We want to block flows from this org. get the domains of this flow based on the direction.
-                    if 'both' in from_:
-                        domains_to_check = (
-                            domains_to_check_src + domains_to_check_dst
-                        )
-                    elif 'src' in from_:
-                        domains_to_check = domains_to_check_src
-                    elif 'dst' in from_:
-                        domains_to_check = domains_to_check_dst
-                    # get the ips of this org
-                    org_subnets = json.loads(
-                        __database__.get_org_info(org, 'IPs')
-                    )
-
-                    if 'src' in from_ or 'both' in from_:
-                        # Method 1 Check if src IP belongs to a whitelisted organization range
-                        for network in org_subnets:
-                            try:
-                                ip = ipaddress.ip_address(saddr)
-                                if ip in ipaddress.ip_network(network):
-                                    # self.print(f"The src IP {saddr} is in the range {network} or org {org}. Whitelisted.")
-                                    return True
-                            except ValueError:
-                                # Some flows don't have IPs, but mac address or just - in some cases
-                                return False
-
-                        # Method 2 Check if the ASN of this src IP is any of these organizations
-                        if self.is_whitelisted_asn(saddr, org):
-                            # this ip belongs to a whitelisted org, ignore flow
-                            # self.print(f"The src IP {saddr} belong to {org}. Whitelisted because of ASN.")
-                            return True
-
-                        # Method 3 Check if the domains of this flow belong to this org
-                        org_domains = json.loads(
-                            __database__.get_org_info(org, 'domains')
-                        )
-                        # domains to check are usually 1 or 2 domains
-                        for flow_domain in domains_to_check:
-                            if org in flow_domain:
-                                # self.print(f"The domain of this flow ({flow_domain}) belongs to the domains of {org}")
-                                return True
-
-                            flow_TLD = flow_domain.split('.')[-1]
-                            for org_domain in org_domains:
-                                org_domain_TLD = org_domain.split('.')[-1]
-                                # make sure the 2 domains have the same same top level domain
-                                if flow_TLD != org_domain_TLD:
-                                    continue
-
-                                # match subdomains too
-                                # if org has org.com, and the flow_domain is xyz.org.com whitelist it
-                                if org_domain in flow_domain:
-                                    # self.print(f"The src domain of this flow ({flow_domain}) is "
-                                    #            f"a subdomain of {org} domain: {org_domain}")
-                                    return True
-                                # if org has xyz.org.com, and the flow_domain is org.com whitelist it
-                                if flow_domain in org_domain:
-                                    # self.print(f"The domain of {org} ({org_domain}) is a subdomain of "
-                                    #       f"this flow domain ({flow_domain})")
-                                    return True
-
-                    if 'dst' in from_ or 'both' in from_:
-                        # Method 1 Check if dst IP belongs to a whitelisted organization range
-                        for network in org_subnets:
-                            try:
-                                ip = ipaddress.ip_address(
-                                    column_values['daddr']
-                                )
-                                if ip in ipaddress.ip_network(network):
-                                    # self.print(f"The dst IP {column_values['daddr']} "
-                                    #            f"is in the range {network} or org {org}. Whitelisted.")
-                                    return True
-                            except ValueError:
-                                # Some flows don't have IPs, but mac address or just - in some cases
-                                return False
-
-                        # Method 2 Check if the ASN of this dst IP is any of these organizations
-                        if self.is_whitelisted_asn(daddr, org):
-                            # this ip belongs to a whitelisted org, ignore flow
-                            return True
+        for direction, ip in (('src', saddr), ('dst', daddr)):
+            if ip in self.org_ranges[direction]:
+                # self.print(f"The {direction} IP {ip} is in the range of a whitelisted org")
+                return True
+            if not self.flow_domains[direction] and not self.orgs[direction]:
+                # nothing else to check, don't read the info of this ip
+                continue
+            ip_data = __database__.getIPData(ip)
+            if self.is_whitelisted_asn(ip_data, direction):
+                # self.print(f"The {direction} IP {ip} belongs to a whitelisted org because of its ASN")
+                return True
+            # Now check the related domains of this IP
+            for domain in self.get_domains_of_ip(ip, ip_data):
+                if self.is_subdomain_of(
+                    domain, self.flow_domains[direction]
+                ) or self.is_whitelisted_org_domain(domain, direction):
+                    # self.print(f"Whitelisting the domain {domain} because is related to the {direction} IP {ip}")
+                    return True
 
-                        # Method 3 Check if the domains of this flow belong to this org
-                        for domain in org_domains:
-                            # domains to check are usually 1 or 2 domains
-                            for flow_domain in domains_to_check:
-                                # match subdomains too
-                                if domain in flow_domain:
-                                    # self.print(f"The dst domain of this flow ({flow_domain}) is "
-                                    #            f"a subdomain of {org} domain: {domain}")
-                                    return True
-
-        if whitelisted_mac := __database__.get_whitelist('mac'):
+        if self.flow_macs['src'] or self.flow_macs['dst']:
             # try to get the mac address of the current flow
             src_mac = column_values.get('src_mac', False)
             if not src_mac:
@@ -294,20 +241,14 @@ class Whitelist:
                     f'profile_{saddr}'
                 )[0]
 
-            if src_mac and src_mac in list(whitelisted_mac.keys()):
-                # the src mac of this flow is whitelisted, but which direction?
-                from_ = whitelisted_mac[src_mac]['from']
-                if 'src' in from_ or 'both' in from_:
-                    # self.print(f"The source MAC of this flow {src_mac} is whitelisted")
-                    return True
+            if src_mac and src_mac in self.flow_macs['src']:
+                # self.print(f"The source MAC of this flow {src_mac} is whitelisted")
+                return True
 
             dst_mac = column_values.get('dst_mac', False)
-            if dst_mac and dst_mac in list(whitelisted_mac.keys()):
-                # the dst mac of this flow is whitelisted, but which direction?
-                from_ = whitelisted_mac[dst_mac]['from']
-                if 'dst' in from_ or 'both' in from_:
-                    # self.print(f"The dst MAC of this flow {dst_mac} is whitelisted")
-                    return True
+            if dst_mac and dst_mac in self.flow_macs['dst']:
+                # self.print(f"The dst MAC of this flow {dst_mac} is whitelisted")
+                return True
 
         return False
 
@@ -452,6 +393,7 @@ class Whitelist:
         __database__.set_whitelist('domains', whitelisted_domains)
         __database__.set_whitelist('organizations', whitelisted_orgs)
         __database__.set_whitelist('mac', whitelisted_mac)
+        self.compile_whitelist()
 
         return line_number
 
@@ -537,40 +479,21 @@ class Whitelist:
         except (FileNotFoundError, IOError):
             return False
 
-    def get_domains_of_flow(self, column_values):
-        """Returns the domains of each ip (src and dst) that appeard in this flow"""
-        # These separate lists, hold the domains that we should only check if they are SRC or DST. Not both
-        domains_to_check_src = []
-        domains_to_check_dst = []
-        try:
-            # self.print(f"IPData of src IP {column_values['saddr']}: {__database__.getIPData(column_values['saddr'])}")
-            ip_data = __database__.getIPData(column_values['saddr'])
-            if ip_data:
-                sni_info = ip_data.get('SNI', [{}])[0]
-                if sni_info:
-                    domains_to_check_src.append(sni_info.get('server_name'))
-        except (KeyError, TypeError):
-            pass
-        try:
-            # self.print(f"DNS of src IP {column_values['saddr']}: {__database__.get_dns_resolution(column_values['saddr'])}")
-            src_dns_domains = __database__.get_dns_resolution(
-                column_values['saddr']
-            )
-            src_dns_domains = src_dns_domains.get('domains', [])
-            for dns_domain in src_dns_domains:
-                domains_to_check_src.append(dns_domain)
-        except (KeyError, TypeError):
-            pass
+    def get_domains_of_ip(self, ip, ip_data) -> list:
+        """
+        Returns the SNI and the DNS resolutions of the given ip
+        :param ip_data: the info of the IP in IPsInfo
+        """
+        domains = []
         try:
-            # self.print(f"IPData of dst IP {column_values['daddr']}: {__database__.getIPData(column_values['daddr'])}")
-            ip_data = __database__.getIPData(column_values['daddr'])
-            if ip_data:
-                sni_info = ip_data.get('SNI', [{}])[0]
-                if sni_info:
-                    domains_to_check_dst.append(sni_info.get('server_name'))
-        except (KeyError, TypeError):
+            sni_info = ip_data.get('SNI', [{}])[0]
+            if sni_info:
+                domains.append(sni_info.get('server_name'))
+        except (KeyError, TypeError, AttributeError):
             pass
-        return domains_to_check_dst, domains_to_check_src
+        dns_resolution = __database__.get_dns_resolution(ip)
+        domains.extend(dns_resolution.get('domains', []))
+        return domains
 
     def is_whitelisted_evidence(
         self, srcip, data, type_detection, description
@@ -793,18 +716,10 @@ class Whitelist:
 
                     # Method 2 using the organization's list of ips
                     # ip doesn't have asn info, search in the list of organization IPs
-                    try:
-                        org_subnets = json.loads(whitelisted_orgs[org]['IPs'])
-                        ip = ipaddress.ip_address(ip)
-                        for network in org_subnets:
-                            # check if ip belongs to this network
-                            if ip in ipaddress.ip_network(network):
-                                # self.print(f'Whitelisting evidence sent by {srcip} about {ip}, due to {ip} being in the range of {org}. {data} in {description}')
-                                return True
-                    except (KeyError, TypeError):
-                        # comes here if the whitelisted org doesn't have info in slips/organizations_info (not a famous org)
-                        # and ip doesn't have asn info.
-                        pass
+                    # the org won't have ranges if it doesn't have info in slips/organizations_info (not a famous org)
+                    if ip in self.get_org_ranges(org):
+                        # self.print(f'Whitelisting evidence sent by {srcip} about {ip}, due to {ip} being in the range of {org}. {data} in {description}')
+                        return True
                 if data_type == 'domain':
                     flow_domain = data
                     flow_TLD = flow_domain.split('.')[-1]
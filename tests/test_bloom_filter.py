@@ -0,0 +1,12 @@
+from ..slips_files.common.bloom_filter import BloomFilter
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter(1000)
+    bloom_filter.update(f'192.168.1.{i}' for i in range(256))
+    assert len(bloom_filter) == 256
+    # no false negatives
+    assert all(f'192.168.1.{i}' in bloom_filter for i in range(256))
+    false_positives = sum(f'10.0.{i}.1' in bloom_filter for i in range(256))
+    assert false_positives < 10
+    assert not bloom_filter.is_full()
@@ -45,27 +45,25 @@ def test_add_flow(outputQueue):
     sbytes = 20
     appproto = 'dhcp'
     uid = '1234'
-    flow_type = ''
+    flow = {
+        'type': 'conn',
+        'uid': uid,
+        'dur': dur,
+        'saddr': str(saddr_as_obj),
+        'sport': sport,
+        'daddr': str(daddr_as_obj),
+        'dport': dport,
+        'proto': proto,
+        'state': state,
+        'pkts': pkts,
+        'bytes': allbytes,
+        'spkts': spkts,
+        'sbytes': sbytes,
+        'appproto': appproto,
+    }
+    # stored without its type like the flows going in
     assert (
-        database.add_flow(
-            profileid=profileid,
-            twid=twid,
-            stime=starttime,
-            dur=dur,
-            saddr=str(saddr_as_obj),
-            sport=sport,
-            daddr=str(daddr_as_obj),
-            dport=dport,
-            proto=proto,
-            state=state,
-            pkts=pkts,
-            allbytes=allbytes,
-            spkts=spkts,
-            sbytes=sbytes,
-            appproto=appproto,
-            uid=uid,
-            flow_type=flow_type,
-        )
+        database.add_flow(flow, profileid, twid, starttime, flow_type='')
         == True
     )
     assert (
@@ -192,26 +190,26 @@ def test_setEvidence(outputQueue):
         uid=uid,
     )
 
-    added_evidence = database.r.hget('evidence' + profileid, twid)
-    added_evidence2 = database.r.hget(profileid + '_' + twid, 'Evidence')
-    assert added_evidence2 == added_evidence
+    added_evidence = database.r.hget(
+        database.get_evidence_key(profileid, twid), description
+    )
+    assert json.loads(added_evidence)['type_evidence'] == type_evidence
 
-    added_evidence = json.loads(added_evidence)
+    tw_evidence = json.loads(database.getEvidenceForTW(profileid, twid))
     current_evidence_key = 'SSH Successful to IP :8.8.8.8. From IP 192.168.1.1'
-    #  note that added_evidence may have evidence from other unit tests
-    assert current_evidence_key in added_evidence.keys()
+    #  note that tw_evidence may have evidence from other unit tests
+    assert current_evidence_key in tw_evidence.keys()
 
 
 def test_deleteEvidence(outputQueue):
     database = create_db_instace(outputQueue)
     description = 'SSH Successful to IP :8.8.8.8. From IP 192.168.1.1'
     database.deleteEvidence(profileid, twid, description)
-    added_evidence = json.loads(database.r.hget('evidence' + profileid, twid))
-    added_evidence2 = json.loads(
-        database.r.hget(profileid + '_' + twid, 'Evidence')
+    assert not database.r.hexists(
+        database.get_evidence_key(profileid, twid), description
     )
-    assert 'SSHSuccessful-by-192.168.1.1' not in added_evidence
-    assert 'SSHSuccessful-by-192.168.1.1' not in added_evidence2
+    tw_evidence = database.getEvidenceForTW(profileid, twid)
+    assert not tw_evidence or description not in json.loads(tw_evidence)
 
 
 def test_module_labels(outputQueue):
@@ -299,3 +297,78 @@ def test_get_the_other_ip_version(database):
     # the other ip version is ipv6
     other_ip = json.loads(database.get_the_other_ip_version(profileid))
     assert other_ip[0] == ipv6
+
+
+def test_add_tuple(database):
+    tupleid = '8.8.8.8-53-udp'
+    database.add_tuple(
+        profileid, twid, tupleid, ('1', (False, 1.0)), 'Client', 1.0, 'uid1'
+    )
+    database.add_tuple(
+        profileid, twid, tupleid, ('a', (1.0, 2.0)), 'Client', 2.0, 'uid2'
+    )
+    tuples = json.loads(
+        database.get_tuples_from_profile_tw(profileid, twid, 'OutTuples')
+    )
+    assert tuples[tupleid] == ['1a', [1.0, 2.0]]
+    # the letters and timestamps are the same when read from the cache
+    assert list(
+        database.getT2ForProfileTW(profileid, twid, tupleid, 'OutTuples')
+    ) == [1.0, 2.0]
+    database.tuples_cache.clear()
+    assert database.getT2ForProfileTW(
+        profileid, twid, tupleid, 'OutTuples'
+    ) == [1.0, 2.0]
+
+
+def test_is_new_ti_request(database):
+    # other tests may have sent requests using the same db
+    database.ti_requests_sent.clear()
+    assert database.is_new_ti_request(profileid, twid, '8.8.8.8', 'dstip')
+    # the same ip in the same tw isn't sent again
+    assert not database.is_new_ti_request(profileid, twid, '8.8.8.8', 'dstip')
+    assert database.is_new_ti_request(profileid, 'timewindow2', '8.8.8.8', 'dstip')
+    assert database.is_new_ti_request(profileid, twid, '8.8.8.8', 'srcip')
+    # the msgs with new IoCs are only for the TI module
+    database.add_ips_to_IoC({'8.8.8.8': '{"source": "test"}'})
+    assert not database.is_new_ti_request(profileid, twid, '8.8.8.8', 'dstip')
+    # it's sent again after the feed finished adding its IoCs
+    database.publish_ioc_updated('test')
+    assert database.is_new_ti_request(profileid, twid, '8.8.8.8', 'dstip')
+    database.delete_ips_from_IoC_ips(['8.8.8.8'])
+
+
+def test_get_dns_resolution(database):
+    database.set_dns_resolution(
+        'example.com', ['93.184.216.34'], 1, 'uid', 'A', '192.168.1.1'
+    )
+    assert database.get_dns_resolution('93.184.216.34')['domains'] == ['example.com']
+    # ips without resolutions are cached too
+    assert database.get_dns_resolution('1.1.1.1') == {}
+    # another process resolves the same ip
+    database.r.hset(
+        'DNSresolution', '1.1.1.1', json.dumps({'domains': ['one.one.one.one']})
+    )
+    database.publish('dns_resolution_updated', json.dumps(['1.1.1.1']))
+    assert database.get_dns_resolution('1.1.1.1')['domains'] == ['one.one.one.one']
+
+
+def test_channels_dispatcher(database):
+    from slips_files.common.abstracts import ChannelsDispatcher
+
+    received = []
+    dispatcher = ChannelsDispatcher(
+        {
+            'new_ip': lambda msg: received.append(('new_ip', msg['data'])),
+            'new_MAC': lambda msg: received.append(('new_MAC', msg['data'])),
+        }
+    )
+    database.publish('new_ip', '8.8.8.8')
+    database.publish('new_MAC', 'aa:bb:cc:dd:ee:ff')
+    # the first 2 msgs are the subscription confirmations
+    for _ in range(4):
+        assert dispatcher.dispatch()
+    # msgs of both channels are handled in the order they were published
+    assert received == [('new_ip', '8.8.8.8'), ('new_MAC', 'aa:bb:cc:dd:ee:ff')]
+    database.publish('new_ip', 'stop_process')
+    assert not dispatcher.dispatch()
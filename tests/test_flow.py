@@ -0,0 +1,38 @@
+from ..slips_files.common.flow import flow_to_db_json
+import json
+
+
+def test_flow_to_db_json():
+    flow = {
+        'type': 'conn',
+        'uid': 'CAeDWs37BipkfP21u8',
+        'saddr': '192.168.1.1',
+        'daddr': '8.8.8.8',
+        'dport': 53,
+        'state': 'SF',
+        'bytes': 100,
+    }
+    stored = json.loads(
+        flow_to_db_json(flow, ts=5, state='Established', label='normal')
+    )
+    # the keys are the ones of the db, in the order they're stored
+    assert list(stored) == [
+        'ts', 'dur', 'saddr', 'sport', 'daddr', 'dport', 'proto',
+        'origstate', 'state', 'pkts', 'allbytes', 'spkts', 'sbytes',
+        'appproto', 'label', 'flow_type', 'module_labels',
+    ]
+    assert stored['ts'] == 5
+    assert stored['origstate'] == 'SF'
+    assert stored['state'] == 'Established'
+    assert stored['allbytes'] == 100
+    assert stored['flow_type'] == 'conn'
+    # columns that the flow doesn't have are stored empty
+    assert stored['sport'] == ''
+    assert stored['module_labels'] == ''
+    assert 'uid' not in stored
+
+    flow = {'type': 'http', 'uid': 'CAeDWs37BipkfP21u8', 'httpversion': '1.1'}
+    stored = json.loads(flow_to_db_json(flow, stime=5))
+    assert stored['version'] == '1.1'
+    assert stored['stime'] == 5
+    assert stored['host'] == ''
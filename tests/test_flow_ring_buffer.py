@@ -0,0 +1,99 @@
+from ..slips_files.common.flow_ring_buffer import (
+    FlowRingBuffer,
+    FlowRingBufferSubscriber,
+)
+import os
+import time
+
+
+def create_ring_buffer_instance(size=100, max_wait=10):
+    """Create a ring buffer named after this process so tests don't share it"""
+    return FlowRingBuffer(
+        f'slips_test_flows_{os.getpid()}', size=size, create=True, max_wait=max_wait
+    )
+
+
+def test_write_and_read():
+    ring_buffer = create_ring_buffer_instance()
+    try:
+        ring_buffer.register_reader(0)
+        ring_buffer.register_reader(1)
+        assert ring_buffer.read(0) is None
+        # the messages wrap around the end of the buffer many times
+        for i in range(100):
+            ring_buffer.write(f'flow {i}')
+            assert ring_buffer.read(0) == f'flow {i}'
+            assert ring_buffer.read(1) == f'flow {i}'
+        assert ring_buffer.read(0) is None
+    finally:
+        ring_buffer.unlink()
+
+
+def test_stuck_reader():
+    ring_buffer = create_ring_buffer_instance(max_wait=0.1)
+    try:
+        ring_buffer.register_reader(0)
+        # the writer stops waiting for the reader when the buffer is full
+        for i in range(20):
+            ring_buffer.write(f'flow {i}')
+        # the reader knows it lost flows and continues from the latest one
+        assert ring_buffer.read(0) is False
+        ring_buffer.write('flow 20')
+        assert ring_buffer.read(0) == 'flow 20'
+    finally:
+        ring_buffer.unlink()
+
+
+class EmptyPubsub:
+    """pubsub without msgs, the subscriber only reads the ring buffer"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_message(self, timeout=0):
+        self.calls += 1
+        time.sleep(timeout)
+        return None
+
+    def close(self):
+        pass
+
+
+def test_subscriber_reports_lost_flows():
+    ring_buffer = create_ring_buffer_instance(max_wait=0.1)
+    printed = []
+    try:
+        subscriber = FlowRingBufferSubscriber(
+            'new_flow',
+            EmptyPubsub(),
+            [ring_buffer],
+            0,
+            print=lambda text, *args: printed.append(text),
+        )
+        for i in range(20):
+            ring_buffer.write(f'flow {i}')
+        # the flows the subscriber lost are skipped and reported
+        assert subscriber.get_message() is None
+        assert subscriber.lost == 1
+        assert len(printed) == 1
+        ring_buffer.write('flow 20')
+        assert subscriber.get_message()['data'] == 'flow 20'
+    finally:
+        ring_buffer.unlink()
+
+
+def test_idle_subscriber():
+    ring_buffer = create_ring_buffer_instance()
+    pubsub = EmptyPubsub()
+    try:
+        subscriber = FlowRingBufferSubscriber('new_flow', pubsub, [ring_buffer], 0)
+        assert subscriber.get_message(timeout=0.5) is None
+        # it waits on the channel longer every time there are no flows instead of polling every ms
+        assert pubsub.calls < 20
+        assert subscriber.idle_wait == subscriber.max_idle_wait
+        # the flows are read right away after waiting
+        ring_buffer.write('flow 0')
+        assert subscriber.get_message()['data'] == 'flow 0'
+        assert subscriber.idle_wait == subscriber.min_idle_wait
+    finally:
+        ring_buffer.unlink()
@@ -1,7 +1,9 @@
 """Unit test for modules/flowalerts/flowalerts.py"""
 from ..modules.flowalerts.flowalerts import Module
+from ..modules.flowalerts.timer_scheduler import TimerScheduler
 import configparser
 import json
+import time
 from numpy import arange
 
 # dummy params used for testing
@@ -33,16 +35,8 @@ def test_check_long_connection(database, outputQueue):
     flowalerts = create_flowalerts_instance(outputQueue)
     # less than the threshold
     dur = '1400'  # in seconds
-    database.add_flow(
-        profileid=profileid,
-        twid=twid,
-        stime=timestamp,
-        dur=dur,
-        saddr=profileid.split('_'),
-        daddr=daddr,
-        uid=uid,
-        flow_type='conn',
-    )
+    flow = {'type': 'conn', 'uid': uid, 'dur': dur, 'saddr': saddr, 'daddr': daddr}
+    database.add_flow(flow, profileid, twid, timestamp)
 
     flowalerts.check_long_connection(
         dur, daddr, saddr, profileid, twid, uid, timestamp
@@ -53,16 +47,8 @@ def test_check_long_connection(database, outputQueue):
 
     # more than the threshold
     dur = 1600  # in seconds
-    database.add_flow(
-        profileid=profileid,
-        twid=twid,
-        stime=timestamp,
-        dur=dur,
-        saddr=profileid.split('_'),
-        daddr=daddr,
-        uid=uid,
-        flow_type='conn',
-    )
+    flow = {'type': 'conn', 'uid': uid, 'dur': dur, 'saddr': saddr, 'daddr': daddr}
+    database.add_flow(flow, profileid, twid, timestamp)
 
     flowalerts.check_long_connection(
         dur, daddr, saddr, profileid, twid, uid, timestamp
@@ -159,3 +145,43 @@ def test_detect_young_domains(outputQueue, database):
         )
         == True
     )
+
+
+def test_reconnections(outputQueue, database):
+    flowalerts = create_flowalerts_instance(outputQueue)
+    # a tw that no other test uses
+    twid = 'timewindow20'
+    key = f'{saddr}-{daddr}'
+    for reconnections in range(1, 4):
+        assert flowalerts.add_reconnection(profileid, twid, key) == reconnections
+    # the reconnections aren't stored in the db until they're flushed
+    assert database.getReconnectionsForTW(profileid, twid) == {}
+    flowalerts.flush_reconnections()
+    assert database.getReconnectionsForTW(profileid, twid) == {key: 3}
+    flowalerts.add_reconnection(profileid, twid, key)
+    # closing the tw stores its reconnections and removes them from memory
+    flowalerts.handle_tw_closed({'data': f'{profileid}_{twid}'})
+    assert database.getReconnectionsForTW(profileid, twid) == {key: 4}
+    assert (profileid, twid) not in flowalerts.reconnections
+    # counting continues from the stored reconnections
+    assert flowalerts.add_reconnection(profileid, twid, key) == 5
+
+
+def test_timer_scheduler():
+    printed = []
+    scheduler = TimerScheduler(lambda text, *args: printed.append(text))
+    scheduler.start()
+    executed = []
+    # a task that fails is reported and doesn't stop the scheduler
+    scheduler.schedule(0, int, ['not a number'])
+    scheduler.schedule(0.2, executed.append, ['second'])
+    scheduler.schedule(0.1, executed.append, ['first'])
+    scheduler.schedule(60, executed.append, ['pending'])
+    time.sleep(0.5)
+    assert executed == ['first', 'second']
+    # the pending tasks run when the scheduler is shut down
+    scheduler.shutdown()
+    scheduler.join(timeout=5)
+    assert executed == ['first', 'second', 'pending']
+    assert not scheduler.is_alive()
+    assert 'Problem running int in the timer scheduler' in printed
@@ -123,3 +123,46 @@ def test_handle_suricata(
         outputQueue, profilerQueue, input_information, input_type
     )
     assert inputProcess.handle_suricata() == True
+
+
+@pytest.mark.parametrize(
+    'line,expected_ip',
+    [
+        (
+            {
+                'type': 'dataset/sample_zeek_files/conn.log',
+                'data': {'id.orig_h': '192.168.1.1', 'id.resp_h': '1.1.1.1'},
+            },
+            '192.168.1.1',
+        ),
+        (
+            {
+                'type': 'dataset/sample_zeek_files/dhcp.log',
+                'data': {'client_addr': '10.0.2.15', 'server_addr': '10.0.2.2'},
+            },
+            '10.0.2.15',
+        ),
+        (
+            {
+                'type': 'dataset/sample_zeek_files/files.log',
+                'data': {'tx_hosts': ['147.32.80.7'], 'rx_hosts': ['10.0.2.15']},
+            },
+            '147.32.80.7',
+        ),
+        (
+            # portscan notices don't have id.orig_h
+            {
+                'type': 'dataset/sample_zeek_files-2/notice.log',
+                'data': '1601998373.487779\t-\t-\t-\t-\t-\t-\t-\t-\ttcp\tScan::Address_Scan\t'
+                'msg\tremote\t147.32.83.156\t-\t23\t-\n',
+            },
+            '147.32.83.156',
+        ),
+    ],
+)
+def test_get_profile_ip(outputQueue, profilerQueue, line, expected_ip):
+    inputProcess = create_inputProcess_instance(
+        outputQueue, profilerQueue, 'dataset/sample_zeek_files', 'zeek_folder'
+    )
+    # the lines are sent to the profiler of the ip the profiler uses for their profile
+    assert inputProcess.get_profile_ip(line) == expected_ip
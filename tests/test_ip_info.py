@@ -48,6 +48,12 @@ def test_get_cached_asn(database):
     ASN_info = create_ASN_Info_instance()
     database.set_asn_cache('AS123', '192.168.1.0/24')
     assert ASN_info.get_cached_asn('192.168.1.1') == 'AS123'
+    database.set_asn_cache('AS123', '10.0.0.0/8')
+    # all the ranges of an asn are loaded in new instances
+    ASN_info = create_ASN_Info_instance()
+    assert ASN_info.get_cached_asn('192.168.1.1') == 'AS123'
+    assert ASN_info.get_cached_asn('10.1.1.1') == 'AS123'
+    assert ASN_info.get_cached_asn('8.8.8.8') is None
 
 
 # RDNS unit tests
@@ -0,0 +1,84 @@
+from ..slips_files.common.ip_ranges import IPRangesIndex, IPRangesArray
+import ipaddress
+import pytest
+
+
+def create_ip_ranges_instance():
+    ip_ranges = IPRangesIndex()
+    ip_ranges.update(
+        {
+            '10.0.0.0/8': 'big',
+            '10.1.0.0/16': 'medium',
+            '10.1.1.0/24': 'small',
+            '2001:db8::/32': 'ipv6',
+            'not a range': 'invalid',
+        }
+    )
+    return ip_ranges
+
+
+@pytest.mark.parametrize(
+    'ip,expected_value',
+    [
+        ('10.1.1.5', 'small'),
+        ('10.1.2.5', 'medium'),
+        ('10.2.0.1', 'big'),
+        ('11.0.0.1', None),
+        ('2001:db8::1', 'ipv6'),
+        ('2001:db9::1', None),
+        (ipaddress.ip_address('10.1.1.5'), 'small'),
+        ('invalid ip', None),
+    ],
+)
+def test_lookup(ip, expected_value):
+    ip_ranges = create_ip_ranges_instance()
+    assert ip_ranges.lookup(ip) == expected_value
+
+
+def test_remove():
+    ip_ranges = create_ip_ranges_instance()
+    assert len(ip_ranges) == 4
+    ip_ranges.remove('10.1.1.0/24')
+    assert ip_ranges.lookup('10.1.1.5') == 'medium'
+    assert len(ip_ranges) == 3
+
+
+def create_ip_ranges_array_instance():
+    return IPRangesArray(
+        [
+            '10.0.0.0/8',
+            '10.1.0.0/16',
+            '11.0.0.0/8',
+            '192.168.1.0/24',
+            '2001:db8::/32',
+            'not a range',
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    'ip,expected_value',
+    [
+        ('10.1.1.5', True),
+        ('11.255.255.255', True),
+        ('12.0.0.0', False),
+        ('192.168.1.255', True),
+        ('192.168.2.0', False),
+        ('9.255.255.255', False),
+        ('2001:db8::1', True),
+        ('2001:db9::1', False),
+        (ipaddress.ip_address('192.168.1.1'), True),
+        ('invalid ip', False),
+    ],
+)
+def test_ip_ranges_array_contains(ip, expected_value):
+    ip_ranges = create_ip_ranges_array_instance()
+    assert (ip in ip_ranges) == expected_value
+
+
+def test_ip_ranges_array_batch_contains():
+    ip_ranges = create_ip_ranges_array_instance()
+    # 10.0.0.0/8 and 11.0.0.0/8 are merged, 10.1.0.0/16 is inside them
+    assert len(ip_ranges) == 3
+    ips = ['10.1.1.5', '2001:db8::1', 'invalid ip', '8.8.8.8', '2001:db9::1']
+    assert ip_ranges.contains(ips).tolist() == [True, True, False, False, False]
@@ -49,6 +49,25 @@ def test_read_whitelist(outputQueue, inputQueue, database):
     assert 'microsoft' in database.get_whitelist('organizations').keys()
 
 
+@pytest.mark.parametrize(
+    'flow,expected_value',
+    [
+        # apple.com is whitelisted, so are its subdomains
+        ({'saddr': '192.168.1.1', 'daddr': '1.1.1.1', 'host': 'www.apple.com'}, True),
+        ({'saddr': '192.168.1.1', 'daddr': '1.1.1.1', 'host': 'notapple.com'}, False),
+        # this ip is whitelisted for alerts only
+        ({'saddr': '192.168.1.1', 'daddr': '91.121.83.118'}, False),
+        # the ip is in the range of microsoft
+        ({'saddr': '192.168.1.1', 'daddr': '52.96.38.1'}, True),
+    ],
+)
+def test_is_whitelisted_flow(outputQueue, database, flow, expected_value):
+    whitelist = create_whitelist_instance(outputQueue)
+    whitelist.read_orgs_info()
+    whitelist.read_whitelist()
+    assert whitelist.is_whitelisted_flow(flow) == expected_value
+
+
 @pytest.mark.parametrize('org,asn', [('google', 'AS6432')])
 def test_load_org_asn(org, outputQueue, inputQueue, asn):
     whitelist = create_whitelist_instance(outputQueue)
@@ -206,3 +225,26 @@ def test_add_flow_to_profile(outputQueue, inputQueue, file, type_, database):
             database.get_altflow_from_uid(profileid, twid, uid) != None
         )
     assert added_flow != None
+
+
+def test_get_timewindow(outputQueue, inputQueue, database):
+    profilerProcess = create_profilerProcess_instance(outputQueue, inputQueue)
+    profilerProcess.width = 3600
+    # a profile that no other test adds tws to
+    profileid = 'profile_192.168.1.250'
+    database.addProfile(profileid, 1000.0, 3600)
+    assert profilerProcess.get_timewindow(1000.0, profileid) == 'timewindow1'
+    assert profilerProcess.get_timewindow(9000.0, profileid) == 'timewindow3'
+    # the tws of this profile are cached now
+    assert profilerProcess.get_cached_timewindow(5000.0, profileid) == 'timewindow2'
+    assert profilerProcess.get_cached_timewindow(20000.0, profileid) == False
+    # older flows
+    assert profilerProcess.get_timewindow(500.0, profileid) == 'timewindow0'
+    assert profilerProcess.get_cached_timewindow(500.0, profileid) == 'timewindow0'
+
+    # the least recently used profiles are removed from the index
+    profilerProcess.tws_index_size = 1
+    other_profileid = 'profile_192.168.1.251'
+    database.addProfile(other_profileid, 1000.0, 3600)
+    profilerProcess.get_timewindow(1000.0, other_profileid)
+    assert profilerProcess.get_cached_timewindow(500.0, profileid) == False
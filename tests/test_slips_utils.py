@@ -15,3 +15,18 @@ def test_get_hash_from_file():
         utils.get_hash_from_file('modules/template/__init__.py')
         == '2d12747a3369505a4d3b722a0422f8ffc8af5514355cdb0eb18178ea7071b8d0'
     )
+
+
+def test_flow_msg():
+    utils = create_utils_instance()
+    flow = '{"saddr": "192.168.1.1", "appproto": "line1\\nline2"}'
+    msg = utils.encode_flow_msg(
+        'profile_192.168.1.1', 'timewindow1', 1.5, 'uid|1\n', flow
+    )
+    assert utils.decode_flow_msg(msg) == {
+        'profileid': 'profile_192.168.1.1',
+        'twid': 'timewindow1',
+        'stime': 1.5,
+        'uid': 'uid|1\n',
+        'flow': {'saddr': '192.168.1.1', 'appproto': 'line1\nline2'},
+    }
@@ -32,3 +32,49 @@ def test_check_local_ti_files(outputQueue):
     threatintel = create_threatintel_instance(outputQueue)
     dir_ = threatintel.path_to_local_threat_intelligence_data
     assert threatintel.check_local_ti_files(dir_) == True
+
+
+def test_search_domain_in_IoC(outputQueue, database):
+    threatintel = create_threatintel_instance(outputQueue)
+    database.add_domains_to_IoC({'malicious.com': '{"source": "test"}'})
+    threatintel.malicious_domains = threatintel.build_bloom_filter(
+        database.get_Domains_in_IoC()
+    )
+    assert threatintel.is_in_malicious_domains('images.malicious.com')
+    # parent domains match, substrings don't
+    assert not threatintel.is_in_malicious_domains('notmalicious.com')
+    assert database.search_Domain_in_IoC('malicious.com') == (
+        '{"source": "test"}',
+        False,
+    )
+    assert database.search_Domain_in_IoC('images.malicious.com') == (
+        '{"source": "test"}',
+        True,
+    )
+    assert database.search_Domain_in_IoC('notmalicious.com') == (False, False)
+
+
+def test_search_IP_in_IoC(outputQueue, database):
+    threatintel = create_threatintel_instance(outputQueue)
+    database.add_ips_to_IoC({'1.2.3.4': '{"source": "test"}'})
+    threatintel.malicious_ips = threatintel.build_bloom_filter(
+        database.get_IPs_in_IoC()
+    )
+    assert threatintel.search_IP_in_IoC('1.2.3.4') == '{"source": "test"}'
+    assert '1.2.3.4' in threatintel.recent_malicious_ips
+    assert threatintel.search_IP_in_IoC('1.2.3.5') == False
+
+
+def test_deleted_ioc_ips(outputQueue, database):
+    threatintel = create_threatintel_instance(outputQueue)
+    database.add_ips_to_IoC({'1.2.3.6': '{"source": "test"}'})
+    threatintel.malicious_ips = threatintel.build_bloom_filter(
+        database.get_IPs_in_IoC()
+    )
+    assert threatintel.search_IP_in_IoC('1.2.3.6') == '{"source": "test"}'
+    database.delete_ips_from_IoC_ips(['1.2.3.6'])
+    # the msg published by delete_ips_from_IoC_ips()
+    threatintel.handle_deleted_ioc_ips({'data': '["1.2.3.6"]'})
+    # it's still in the bloom filter, but not in the recent malicious ips
+    assert '1.2.3.6' not in threatintel.recent_malicious_ips
+    assert not threatintel.search_IP_in_IoC('1.2.3.6')
@@ -103,3 +103,86 @@ def test_read_ports_info(outputQueue, database):
     org = json.loads(database.get_organization_of_port('65432/tcp'))
     assert 'org_name' in org
     assert org['org_name'] == 'Apple'
+
+
+def test_parse_ti_feed(outputQueue, database, tmp_path):
+    update_manager = create_update_manager_instance(outputQueue)
+    # store the iocs in chunks of 2
+    update_manager.ioc_chunk_size = 2
+    link = 'https://example.com/test_feed.csv'
+    update_manager.url_feeds[link] = {'threat_level': 'high', 'tags': 'test'}
+    feed = tmp_path / 'test_feed.csv'
+    feed.write_text(
+        '# ip,description\n'
+        '8.8.4.4,the line used for detecting the columns\n'
+        '1.2.3.4,first\n'
+        'evil.example.com,second\n'
+        '5.6.7.0/24,third\n'
+        '1.2.3.4,duplicate\n'
+        '10.0.0.1,private\n'
+    )
+    assert update_manager.parse_ti_feed(link, str(feed)) == True
+    # the first description of a duplicate ioc is kept
+    ip_info = json.loads(database.search_IP_in_IoC('1.2.3.4'))
+    assert ip_info['description'] == 'first'
+    assert ip_info['source'] == 'test_feed.csv'
+    assert database.search_Domain_in_IoC('evil.example.com')[0] != False
+    assert '5.6.7.0/24' in database.get_malicious_ip_ranges()
+    # the score of the ip is the threat level of the feed
+    assert database.getIPData('1.2.3.4')['score'] == 0.8
+    assert database.search_IP_in_IoC('10.0.0.1') == False
+
+
+@pytest.mark.parametrize('parsing_order', [(0, 1), (1, 0)])
+def test_ioc_in_multiple_feeds(outputQueue, database, tmp_path, parsing_order):
+    update_manager = create_update_manager_instance(outputQueue)
+    feeds = []
+    for feed_name in ('test_first_feed.csv', 'test_second_feed.csv'):
+        link = f'https://example.com/{feed_name}'
+        update_manager.url_feeds[link] = {'threat_level': 'high', 'tags': 'test'}
+        feed = tmp_path / feed_name
+        feed.write_text(
+            '# ip,description\n'
+            '8.8.4.4,the line used for detecting the columns\n'
+            f'9.8.7.6,{feed_name}\n'
+        )
+        feeds.append((link, str(feed)))
+    for feed in parsing_order:
+        assert update_manager.parse_ti_feed(*feeds[feed]) == True
+    # the ioc has the info of the last feed in ti_files, no matter which one was parsed first
+    ip_info = json.loads(database.search_IP_in_IoC('9.8.7.6'))
+    assert ip_info['source'] == 'test_second_feed.csv'
+    database.delete_ips_from_IoC_ips(['9.8.7.6'])
+
+
+def test_update_feed_snapshot(outputQueue, database, tmp_path):
+    update_manager = create_update_manager_instance(outputQueue)
+    link = 'https://example.com/test_snapshot.csv'
+    update_manager.url_feeds[link] = {'threat_level': 'high', 'tags': 'test'}
+    feed = tmp_path / 'test_snapshot.csv'
+    feed.write_text(
+        '# ip,description\n'
+        '8.8.4.4,the line used for detecting the columns\n'
+        '1.2.3.4,removed\n'
+        'evil.example.com,kept\n'
+    )
+    assert update_manager.parse_ti_feed(link, str(feed)) == True
+    assert database.get_TI_feed_snapshot('test_snapshot.csv') == {
+        '1.2.3.4',
+        'evil.example.com',
+    }
+    # only the iocs that are no longer in the feed are deleted
+    feed.write_text(
+        '# ip,description\n'
+        '8.8.4.4,the line used for detecting the columns\n'
+        'evil.example.com,kept\n'
+        '5.6.7.8,added\n'
+    )
+    assert update_manager.parse_ti_feed(link, str(feed)) == True
+    assert database.search_IP_in_IoC('1.2.3.4') == False
+    assert database.search_IP_in_IoC('5.6.7.8') != False
+    assert database.search_Domain_in_IoC('evil.example.com')[0] != False
+    assert database.get_TI_feed_snapshot('test_snapshot.csv') == {
+        '5.6.7.8',
+        'evil.example.com',
+    }